@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+import zlib
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+import functools
+
+from . import VERSION
+from .tools import find_executable, get_tool_name, tool_required
+from .config import Config
+from .profiling import count, profile
+
+logger = logging.getLogger(__name__)
+
+# Config attributes that can change the result of a comparison. Anything
+# else (eg. limits only applied by the presenters) is not part of its key.
+COMPARISON_CONFIG = (
+    'compute_visual_diffs',
+    'exclude_commands',
+    'exclude_directory_metadata',
+    'excludes',
+    'force_details',
+    'fuzzy_threshold',
+    'max_container_depth',
+    'max_diff_block_lines_saved',
+    'max_diff_input_lines',
+    'new_file',
+    'prune_identical_subtrees',
+    'use_dbgsym',
+)
+
+# Stands in for the path of the input in cached command output.
+PATH_PLACEHOLDER = b'\0diffoscope-path\0'
+
+# Without --cache-dir, the output of commands run on files that are compared
+# against several others (see --against) is kept in memory, up to this size.
+MEMORY_CACHE_MAX_SIZE = 2 ** 28  # 256 MiB
+
+
+class DiskCache(object):
+    """
+    A directory of compressed values addressed by (hex) key. Entries that
+    have not been used for `max_age` seconds expire and, once the cache grows
+    beyond `max_size` bytes, the least-recently used entries are removed
+    until it is back under 3/4 of that.
+    """
+
+    _sizes = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path, max_size, max_age):
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def get(self, key):
+        path = self._path(key)
+
+        try:
+            with open(path, 'rb') as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime > self.max_age:
+                    raise KeyError(key)
+                val = zlib.decompress(f.read())
+        except FileNotFoundError:
+            raise KeyError(key)
+
+        # Record the access; atime is not reliable on many filesystems.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return val
+
+    def set(self, key, val):
+        path = self._path(key)
+        val = zlib.compress(val)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write atomically so concurrent readers never see a partial entry.
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), delete=False
+        ) as f:
+            f.write(val)
+        os.replace(f.name, path)
+
+        with self._lock:
+            try:
+                size = self._sizes[self.path] + len(val)
+            except KeyError:
+                # First write to this cache by this process; take the
+                # opportunity to expire any old entries.
+                size = self.evict(self.max_size)
+            if size > self.max_size:
+                size = self.evict(self.max_size * 3 // 4)
+            self._sizes[self.path] = size
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, target):
+        entries = sorted(self._entries())
+        size = sum(x[1] for x in entries)
+        expired = (time.time() - self.max_age) * 1e9
+
+        for mtime, x, path in entries:
+            if size <= target and mtime >= expired:
+                break
+            logger.debug("Evicting %s from cache", path)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= x
+
+        return size
+
+    def _path(self, key):
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.path):
+            for x in filenames:
+                path = os.path.join(dirpath, x)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime_ns, st.st_size, path
+
+
+class MemoryCache(object):
+    """
+    An in-memory counterpart to DiskCache. Once it holds `max_size` bytes,
+    new values are simply not stored; everything in it is expected to be
+    used again.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return zlib.decompress(self._entries[key])
+
+    def set(self, key, val):
+        val = zlib.compress(val)
+        with self._lock:
+            if key in self._entries or self.size + len(val) > self.max_size:
+                return
+            self._entries[key] = val
+            self.size += len(val)
+
+    def delete(self, key):
+        with self._lock:
+            val = self._entries.pop(key, None)
+            if val is not None:
+                self.size -= len(val)
+
+
+_MEMORY_CACHE = MemoryCache(MEMORY_CACHE_MAX_SIZE)
+_SHARED_PATHS = set()
+
+
+def get_cache():
+    if Config().cache_dir is None:
+        return _MEMORY_CACHE
+
+    return DiskCache(
+        Config().cache_dir, Config().cache_max_size, Config().cache_max_age
+    )
+
+
+def share_command_output(path):
+    """
+    Reuse the output of commands run on `path`, even without --cache-dir, as
+    it is about to be compared against several other files.
+    """
+
+    _SHARED_PATHS.add(path)
+
+
+def make_key(*args):
+    h = hashlib.sha256()
+    for x in args:
+        h.update(repr(x).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def comparison_key(file1, file2, source=None):
+    """
+    Returns a key identifying the comparison of `file1` against `file2`, or
+    None if its result should not be cached.
+    """
+
+    if Config().cache_dir is None:
+        return None
+
+    config = [(x, getattr(Config(), x)) for x in COMPARISON_CONFIG]
+
+    with profile('cache', 'hashing input'):
+        try:
+            digests = file1.digest, file2.digest
+        except (OSError, TypeError):
+            return None
+
+    return make_key(
+        'comparison',
+        digests,
+        (file1.__class__.__name__, file2.__class__.__name__),
+        (file1.name, file2.name, source),
+        config,
+        get_environment(),
+    )
+
+
+def command_key(command):
+    """
+    Returns a key identifying the output of running `command`, or None if it
+    should not be cached.
+    """
+
+    if Config().cache_dir is None and command.path not in _SHARED_PATHS:
+        return None
+
+    with profile('cache', 'hashing input'):
+        try:
+            digest = file_digest(command.path)
+        except (OSError, TypeError):
+            return None
+
+    return make_key(
+        'command',
+        digest,
+        command.__class__.__qualname__,
+        command.shell_cmdline(),
+        command.env(),
+        tool_fingerprint(command.cmdline()[0]),
+        VERSION,
+    )
+
+
+def load_comparison(key):
+    """
+    Returns the cached Difference (or None) for `key`, raising KeyError if
+    it is not in the cache.
+    """
+
+    return _load('comparison', key)
+
+
+def store_comparison(key, difference):
+    _store(key, difference)
+
+
+def load_command(key, path):
+    """
+    Returns the cached (stdout, stderr, returncode) of a command that was run
+    on a file with the same contents as `path`, raising KeyError if it is
+    not in the cache.
+    """
+
+    stdout, stderr, returncode = _load('command', key)
+
+    # The output may well refer to the input by name.
+    stdout = stdout.replace(PATH_PLACEHOLDER, os.fsencode(path))
+    stderr = stderr.replace(PATH_PLACEHOLDER.decode('utf-8'), path)
+
+    return stdout, stderr, returncode
+
+
+def store_command(key, path, stdout, stderr, returncode):
+    stdout = stdout.replace(os.fsencode(path), PATH_PLACEHOLDER)
+    stderr = stderr.replace(path, PATH_PLACEHOLDER.decode('utf-8'))
+
+    _store(key, (stdout, stderr, returncode))
+
+
+def _load(kind, key):
+    cache = get_cache()
+
+    try:
+        with profile('cache', 'load'):
+            val = pickle.loads(cache.get(key))
+    except KeyError:
+        count('cache', '{} miss'.format(kind))
+        raise
+    except Exception:
+        logger.exception("Ignoring corrupt cache entry %s", key)
+        cache.delete(key)
+        count('cache', '{} miss'.format(kind))
+        raise KeyError(key)
+
+    count('cache', '{} hit'.format(kind))
+
+    return val
+
+
+def _store(key, val):
+    try:
+        with profile('cache', 'store'):
+            get_cache().set(key, pickle.dumps(val, pickle.HIGHEST_PROTOCOL))
+    except (OSError, pickle.PicklingError):
+        logger.exception("Unable to store %s in cache", key)
+
+
+def file_digest(path):
+    st = os.stat(path)
+    return _file_digest(path, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=1024)
+def _file_digest(path, *stat):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(2 ** 16), b''):
+            h.update(buf)
+    return h.hexdigest()
+
+
+def tool_fingerprint(name):
+    """
+    Running each tool to query its version would be too slow, so we use the
+    size and modification time of its executable as a proxy.
+    """
+
+    path = find_executable(get_tool_name(name))
+    if path is None:
+        return None
+
+    st = os.stat(path)
+
+    return path, st.st_size, st.st_mtime_ns
+
+
+@functools.lru_cache()
+def get_environment():
+    """
+    Identify the versions of diffoscope, Python and any external tools that
+    could have been used to produce a cached comparison.
+    """
+
+    from .comparators import ComparatorManager
+
+    # Comparators are otherwise imported lazily, so ensure the list of tools
+    # does not depend on what we happened to have compared so far.
+    ComparatorManager().load_all()
+
+    tools = [
+        (x, tool_fingerprint(x))
+        for x in sorted(getattr(tool_required, 'all', ()))
+    ]
+
+    return VERSION, sys.version, tools
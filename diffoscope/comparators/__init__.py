@@ -20,6 +20,7 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import sys
+import heapq
 import logging
 import importlib
 import traceback
@@ -115,40 +116,129 @@ class ComparatorManager(object):
             self.reload()
 
     def reload(self):
-        self.classes = []
+        # Comparators are only imported once they might recognise a file
+        # (see get_classes) so just forget about any we have already.
+        self._loaded = {}
+        self._indices = {}
+        self._index = None
 
-        for xs in self.COMPARATORS:
-            errors = []
-            for x in xs:
-                package, klass_name = x.rsplit('.', 1)
+    @property
+    def classes(self):
+        """
+        The comparator classes that have been imported so far.
+        """
 
-                try:
-                    mod = importlib.import_module(
-                        'diffoscope.comparators.{}'.format(package)
-                    )
-                except ImportError as e:
-                    errors.append((x, e))
-                    continue
-
-                self.classes.append(getattr(mod, klass_name))
-                break
-            else:  # noqa
-                logger.error(
-                    "Could not import {}{}".format(
-                        "any of " if len(xs) > 1 else '', ', '.join(xs)
-                    )
+        return [self._loaded[x] for x in sorted(self._loaded)]
+
+    def get_classes(self, file, fallback=False):
+        """
+        Yield, in order, the comparator classes that could recognise `file`
+        (or that it is already an instance of), importing them as required.
+        """
+
+        candidates = self.get_index().lookup(file).candidates(fallback)
+
+        instances = {
+            self._indices[x] for x in type(file).__mro__ if x in self._indices
+        }
+        if instances:
+            candidates = heapq.merge(candidates, sorted(instances))
+
+        for idx in candidates:
+            yield self.load(idx)
+
+    def get_index(self):
+        from .utils.manifest import Index
+
+        if self._index is None:
+            self._index = Index(
+                {
+                    idx: self.get_gates(idx)
+                    for idx in range(len(self.COMPARATORS))
+                }
+            )
+
+        return self._index
+
+    def get_gates(self, idx):
+        from .manifest import MANIFEST
+        from .utils.manifest import describe
+
+        if idx in self._loaded:
+            attrs = describe(self._loaded[idx])[1]
+            return None if attrs is None else [attrs]
+
+        gates = []
+        for x in self.COMPARATORS[idx]:
+            try:
+                _, attrs = MANIFEST[x]
+            except KeyError:
+                attrs = None
+            if attrs is None:
+                return None
+            gates.append(attrs)
+
+        return gates
+
+    def load(self, idx):
+        try:
+            return self._loaded[idx]
+        except KeyError:
+            pass
+
+        xs = self.COMPARATORS[idx]
+        errors = []
+        for x in xs:
+            package, klass_name = x.rsplit('.', 1)
+
+            try:
+                mod = importlib.import_module(
+                    'diffoscope.comparators.{}'.format(package)
+                )
+            except ImportError as e:
+                errors.append((x, e))
+                continue
+
+            logger.debug("Loaded comparator %s", x)
+            gates = self.get_gates(idx)
+            self._loaded[idx] = getattr(mod, klass_name)
+            self._indices[self._loaded[idx]] = idx
+            if self.get_gates(idx) != gates:
+                # We know more about this comparator now.
+                self._index = None
+            break
+        else:  # noqa
+            logger.error(
+                "Could not import {}{}".format(
+                    "any of " if len(xs) > 1 else '', ', '.join(xs)
                 )
-                for x in errors:
-                    logger.error("Original error for %s:", x[0])
-                    sys.stderr.buffer.write(line_eraser())
-                    traceback.print_exception(None, x[1], x[1].__traceback__)
-                sys.exit(2)
+            )
+            for x in errors:
+                logger.error("Original error for %s:", x[0])
+                sys.stderr.buffer.write(line_eraser())
+                traceback.print_exception(None, x[1], x[1].__traceback__)
+            sys.exit(2)
 
-        logger.debug("Loaded %d comparator classes", len(self.classes))
+        return self._loaded[idx]
+
+    def load_all(self):
+        for idx in range(len(self.COMPARATORS)):
+            self.load(idx)
+
+        logger.debug("Loaded %d comparator classes", len(self._loaded))
 
     def get_descriptions(self):
-        for x in self.classes:
-            try:
-                yield x.DESCRIPTION
-            except AttributeError:
-                pass
+        from .manifest import MANIFEST
+
+        for idx, xs in enumerate(self.COMPARATORS):
+            if idx in self._loaded:
+                description = getattr(self._loaded[idx], 'DESCRIPTION', None)
+            else:
+                try:
+                    description = next(
+                        MANIFEST[x][0] for x in xs if x in MANIFEST
+                    )
+                except StopIteration:
+                    description = getattr(self.load(idx), 'DESCRIPTION', None)
+            if description is not None:
+                yield description
@@ -26,7 +26,7 @@ from diffoscope.difference import Difference
 
 from .utils.file import File
 from .utils.command import Command
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_members
 
 logger = logging.getLogger(__name__)
 
@@ -70,10 +70,10 @@ class ArFile(File):
                 ArSymbolTableDumper, self.path, other.path
             ),
             Difference.from_text_readers(
-                list_libarchive(self.path),
-                list_libarchive(other.path),
-                self.path,
-                other.path,
+                list_members(self),
+                list_members(other),
+                self.name,
+                other.name,
                 source="file list",
             ),
         ]
@@ -66,6 +66,7 @@ class BinwalkFileContainer(Archive):
 class BinwalkFile(File):
     FILE_TYPE_RE = re.compile(r'\bcpio archive\b')
     CONTAINER_CLASS = BinwalkFileContainer
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
 
     @classmethod
     def recognizes(cls, file):
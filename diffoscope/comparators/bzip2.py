@@ -18,38 +18,32 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
+import bz2
 import logging
-import subprocess
 
 from diffoscope.tools import tool_required
 
 from .utils.file import File
-from .utils.archive import Archive
+from .utils.archive import CompressedContainer
 
 logger = logging.getLogger(__name__)
 
 
-class Bzip2Container(Archive):
-    def open_archive(self):
-        return self
-
-    def close_archive(self):
-        pass
-
+class Bzip2Container(CompressedContainer):
     def get_member_names(self):
         return [self.get_compressed_content_name('.bz2')]
 
     @tool_required('bzip2')
+    def decompress_cmdline(self):
+        return ["bzip2", "--decompress", "--stdout", self.source.path]
+
+    def open_decompressed(self):
+        return bz2.open(self.source.path)
+
     def extract(self, member_name, dest_dir):
         dest_path = self.get_path_name(dest_dir)
         logger.debug('bzip2 extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["bzip2", "--decompress", "--stdout", self.source.path],
-                shell=False,
-                stdout=fp,
-                stderr=subprocess.PIPE,
-            )
+        self.decompress_to(dest_path)
         return dest_path
 
 
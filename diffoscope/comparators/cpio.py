@@ -23,7 +23,7 @@ import re
 from diffoscope.difference import Difference
 
 from .utils.file import File
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_members
 
 
 class CpioFile(File):
@@ -34,10 +34,10 @@ class CpioFile(File):
     def compare_details(self, other, source=None):
         return [
             Difference.from_text_readers(
-                list_libarchive(self.path),
-                list_libarchive(other.path),
-                self.path,
-                other.path,
+                list_members(self),
+                list_members(other),
+                self.name,
+                other.name,
                 source="file list",
             )
         ]
@@ -28,7 +28,7 @@ from .tar import TarContainer
 from .utils.compare import compare_files
 from .utils.file import File
 from .utils.archive import ArchiveMember
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_members
 from .utils.specialize import specialize
 
 try:
@@ -146,10 +146,10 @@ class DebFile(File):
     def compare_details(self, other, source=None):
         return [
             Difference.from_text_readers(
-                list_libarchive(self.path),
-                list_libarchive(other.path),
-                self.path,
-                other.path,
+                list_members(self),
+                list_members(other),
+                self.name,
+                other.name,
                 source="file list",
             )
         ]
@@ -245,10 +245,10 @@ class DebDataTarFile(File):
     def compare_details(self, other, source=None):
         return [
             Difference.from_text_readers(
-                list_libarchive(self.path, ignore_errors=True),
-                list_libarchive(other.path, ignore_errors=True),
-                self.path,
-                other.path,
+                list_members(self, ignore_errors=True),
+                list_members(other, ignore_errors=True),
+                self.name,
+                other.name,
                 source="file list",
             )
         ]
@@ -166,6 +166,7 @@ class DebControlFile(File):
 class DotChangesFile(DebControlFile):
     DESCRIPTION = "Debian .changes files"
     FILE_EXTENSION_SUFFIX = '.changes'
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
 
     @classmethod
     def recognizes(cls, file):
@@ -209,6 +210,7 @@ class DotChangesFile(DebControlFile):
 class DotDscFile(DebControlFile):
     DESCRIPTION = "Debian source packages (.dsc)"
     FILE_EXTENSION_SUFFIX = '.dsc'
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
 
     @classmethod
     def recognizes(cls, file):
@@ -262,6 +264,7 @@ class DotBuildinfoFile(DebControlFile):
     DESCRIPTION = "Debian .buildinfo files"
     CONTAINER_CLASS = DotBuildinfoContainer
     FILE_EXTENSION_SUFFIX = '.buildinfo'
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
 
     @classmethod
     def recognizes(cls, file):
@@ -21,7 +21,10 @@ import os
 import stat
 import logging
 
-from diffoscope.tempfiles import get_named_temporary_file
+from diffoscope.tempfiles import (
+    get_named_temporary_file,
+    release_temporary_file,
+)
 from diffoscope.difference import Difference
 
 from .binary import FilesystemFile
@@ -65,7 +68,7 @@ class Device(File):
 
     def cleanup(self):
         if hasattr(self, '_placeholder'):
-            os.remove(self._placeholder)
+            release_temporary_file(self._placeholder)
             del self._placeholder
         super().cleanup()
 
@@ -19,41 +19,211 @@
 
 import os
 import re
+import grp
+import pwd
+import stat
+import time
+import struct
+import hashlib
 import logging
+import functools
 import subprocess
 import collections
-import itertools
+import concurrent.futures
+
+try:
+    import fcntl
+except ImportError:  # noqa
+    fcntl = None
 
 from diffoscope.exc import RequiredToolNotFound
 from diffoscope.tools import tool_required
 from diffoscope.config import Config
+from diffoscope.excludes import command_excluded
 from diffoscope.progress import Progress
 from diffoscope.difference import Difference
 
 from .binary import FilesystemFile
 from .utils.command import Command
-from .utils.container import Container
+from .utils.container import Container, starmap_jobs
 
 logger = logging.getLogger(__name__)
 
 
-def list_files(path):
-    path = os.path.realpath(path)
-    all_files = []
-    for root, dirs, names in os.walk(path):
-        all_files.extend(
-            [os.path.join(root[len(path) + 1 :], dir) for dir in dirs]
-        )
-        all_files.extend(
-            [os.path.join(root[len(path) + 1 :], name) for name in names]
+class DirectoryIndex(object):
+    """
+    The results of scanning a directory tree. These are shared with the
+    indices of its subdirectories so that listing the tree, enumerating the
+    members of each directory and measuring their sizes only scans each
+    directory once.
+    """
+
+    def __init__(self, path, cache=None, hashes=None):
+        self.path = path
+        self.cache = {} if cache is None else cache
+        self.hashes = {} if hashes is None else hashes
+
+    def subdirectory(self, name):
+        return DirectoryIndex(
+            os.path.join(self.path, name), self.cache, self.hashes
         )
-    all_files.sort()
-    return all_files
+
+    def scandir(self, name=''):
+        """
+        Returns a dict mapping the names in subdirectory `name` to the result
+        of lstat()-ing them (or None if that failed).
+        """
+
+        path = os.path.join(self.path, name) if name else self.path
+        try:
+            return self.cache[path]
+        except KeyError:
+            pass
+
+        entries = {}
+        try:
+            for entry in os.scandir(path or '.'):
+                try:
+                    entries[entry.name] = entry.stat(follow_symlinks=False)
+                except OSError:
+                    entries[entry.name] = None
+        except OSError:
+            pass
+
+        self.cache[path] = entries
+        return entries
+
+    def lstat(self, name):
+        dirname, basename = os.path.split(name)
+        return self.scandir(dirname).get(basename)
+
+    def is_directory(self, name):
+        st = self.lstat(name)
+        return st is not None and stat.S_ISDIR(st.st_mode)
+
+    def list_files(self, name=''):
+        """
+        Returns the paths of everything below subdirectory `name`, relative
+        to it, without following symlinks.
+        """
+
+        result = []
+        for x, st in self.scandir(name).items():
+            result.append(x)
+            if st is not None and stat.S_ISDIR(st.st_mode):
+                prefix = x + os.sep
+                result.extend(
+                    prefix + y for y in self.list_files(os.path.join(name, x))
+                )
+        return result
+
+    def tree_hash(self, name='', metadata=False):
+        """
+        Returns a hash of `name` and, if it is a directory, of the names and
+        hashes of everything inside it (ie. a Merkle tree), including their
+        metadata if `metadata` is set. Returns None if any of it could not be
+        read.
+        """
+
+        path = os.path.join(self.path, name) if name else self.path
+        if path not in self.hashes:
+            self.hash_tree(metadata)
+        return self.hashes.get(path)
+
+    def hash_tree(self, metadata):
+        names = [''] + self.list_files()
+
+        def fn(name):
+            path = os.path.join(self.path, name) if name else self.path
+            try:
+                st = self.lstat(name) if name else os.lstat(path)
+            except OSError:
+                return path, None
+            return path, hash_entry(path, st, metadata)
+
+        # Reading the files dominates, and hashlib releases the GIL while
+        # hashing them.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1
+        ) as executor:
+            hashes = dict(executor.map(fn, names))
+
+        # list_files() lists each directory before its contents, so this
+        # visits every directory after everything inside it.
+        for name in reversed(names):
+            path = os.path.join(self.path, name) if name else self.path
+            h = hashes[path]
+            if h is not None and path in self.cache:
+                for x in sorted(self.cache[path]):
+                    y = self.hashes.get(os.path.join(path, x))
+                    if y is None:
+                        h = None
+                        break
+                    h = hashlib.sha256(
+                        h + x.encode('utf-8', 'surrogateescape') + b'\0' + y
+                    ).digest()
+            self.hashes[path] = h
+
+
+def hash_entry(path, st, metadata):
+    """
+    Returns a hash of the type and content of `path` (but not of anything
+    inside it if it is a directory) and, if `metadata` is set, of the
+    metadata that compare_meta() would compare.
+    """
+
+    if st is None:
+        return None
+
+    h = hashlib.sha256(b'%d\0' % stat.S_IFMT(st.st_mode))
+
+    try:
+        if stat.S_ISREG(st.st_mode):
+            with open(path, 'rb') as f:
+                for buf in iter(lambda: f.read(1 << 20), b''):
+                    h.update(buf)
+        elif stat.S_ISLNK(st.st_mode):
+            h.update(os.fsencode(os.readlink(path)))
+        elif stat.S_ISCHR(st.st_mode) or stat.S_ISBLK(st.st_mode):
+            h.update(b'%d' % st.st_rdev)
+
+        if metadata:
+            h.update(b'\0')
+            h.update(native_stat(path).encode('utf-8'))
+            if not stat.S_ISLNK(st.st_mode):
+                h.update(native_getfacl(path).encode('utf-8'))
+                h.update(native_lsattr(path).encode('utf-8'))
+                h.update((xattrs(path) or '').encode('utf-8'))
+    except OSError:
+        return None
+
+    return h.digest()
+
+
+def identical_subtrees(index1, index2, name=''):
+    """
+    Whether, with --prune-identical-subtrees, `name` in `index1` and `index2`
+    can be skipped as nothing inside them (nor, if it is being compared, their
+    metadata) differs.
+    """
+
+    if not Config().prune_identical_subtrees or Config().force_details:
+        return False
+
+    metadata = Config().exclude_directory_metadata not in ('yes', 'recursive')
+    if metadata and not NATIVE_METADATA:
+        return False
+
+    hash1 = index1.tree_hash(name, metadata)
+
+    return hash1 is not None and hash1 == index2.tree_hash(name, metadata)
 
 
 if os.uname()[0] == 'FreeBSD':
 
     class Stat(Command):
+        CACHEABLE = False
+
         @tool_required('stat')
         def cmdline(self):
             return [
@@ -69,15 +239,20 @@ if os.uname()[0] == 'FreeBSD':
 else:
 
     class Stat(Command):
+        CACHEABLE = False
+
         @tool_required('stat')
         def cmdline(self):
             return ['stat', self.path]
 
         FILE_RE = re.compile(r'^\s*File:.*$')
-        DEVICE_RE = re.compile(r'Device: [0-9a-f]+h/[0-9]+d\s+')
+        DEVICE_RE = re.compile(
+            r'Device: ([0-9a-f]+h/[0-9]+d|[0-9]+,[0-9]+)\s+'
+        )
         INODE_RE = re.compile(r'Inode: [0-9]+\s+')
         ACCESS_TIME_RE = re.compile(r'^Access: [0-9]{4}-[0-9]{2}-[0-9]{2}.*$')
         CHANGE_TIME_RE = re.compile(r'^Change: [0-9]{4}-[0-9]{2}-[0-9]{2}.*$')
+        BIRTH_TIME_RE = re.compile(r'^ Birth: .*$')
 
         def filter(self, line):
             line = line.decode('utf-8')
@@ -86,16 +261,12 @@ else:
             line = Stat.INODE_RE.sub('', line)
             line = Stat.ACCESS_TIME_RE.sub('', line)
             line = Stat.CHANGE_TIME_RE.sub('', line)
+            line = Stat.BIRTH_TIME_RE.sub('', line)
             return line.encode('utf-8')
 
 
 @tool_required('lsattr')
 def lsattr(path):
-    """
-    NB. Difficult to replace with in-Python version. See
-    <https://stackoverflow.com/questions/35501249/python-get-linux-file-immutable-attribute/38092961#38092961>
-    """
-
     try:
         output = subprocess.check_output(
             ['lsattr', '-d', path], shell=False, stderr=subprocess.STDOUT
@@ -108,6 +279,8 @@ def lsattr(path):
 
 
 class Getfacl(Command):
+    CACHEABLE = False
+
     @tool_required('getfacl')
     def cmdline(self):
         osname = os.uname()[0]
@@ -116,32 +289,311 @@ class Getfacl(Command):
         return ['getfacl', '-p', '-c', self.path]
 
 
-def xattr(path1, path2):
+# On Linux, the metadata that we would otherwise obtain by running stat(1),
+# getfacl(1) and lsattr(1) for every file is read directly from lstat(2),
+# the POSIX ACL extended attributes and the FS_IOC_GETFLAGS ioctl, formatting
+# it as those tools would. The tools are still run on other platforms.
+NATIVE_METADATA = os.uname()[0] == 'Linux' and fcntl is not None
+
+FILE_TYPES = (
+    (stat.S_ISDIR, 'directory'),
+    (stat.S_ISLNK, 'symbolic link'),
+    (stat.S_ISCHR, 'character special file'),
+    (stat.S_ISBLK, 'block special file'),
+    (stat.S_ISFIFO, 'fifo'),
+    (stat.S_ISSOCK, 'socket'),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def user_name(uid):
     try:
-        import xattr as xattr_
-    except ImportError:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def group_name(gid):
+    try:
+        return grp.getgrgid(gid).gr_name
+    except KeyError:
+        return None
+
+
+def format_time(ns):
+    sec, ns = divmod(ns, 1000000000)
+    t = time.localtime(sec)
+    return '{}.{:09d} {}'.format(
+        time.strftime('%Y-%m-%d %H:%M:%S', t), ns, time.strftime('%z', t)
+    )
+
+
+def native_stat(path):
+    """
+    The output of `stat path` as filtered by Stat.filter (ie. without the
+    name, device, inode, access, change or birth times).
+    """
+
+    st = os.lstat(path)
+
+    for fn, file_type in FILE_TYPES:
+        if fn(st.st_mode):
+            break
+    else:
+        file_type = 'regular file' if st.st_size else 'regular empty file'
+
+    links = 'Links: {}'.format(st.st_nlink)
+    if stat.S_ISCHR(st.st_mode) or stat.S_ISBLK(st.st_mode):
+        links = 'Links: {:<5} Device type: {},{}'.format(
+            st.st_nlink, os.major(st.st_rdev), os.minor(st.st_rdev)
+        )
+
+    lines = [
+        '',
+        '  Size: {:<10}\tBlocks: {:<10} IO Block: {:<6} {}'.format(
+            st.st_size, st.st_blocks, st.st_blksize, file_type
+        ),
+        links,
+        'Access: ({:04o}/{})  Uid: ({:>5}/{:>8})   Gid: ({:>5}/{:>8})'.format(
+            stat.S_IMODE(st.st_mode),
+            stat.filemode(st.st_mode),
+            st.st_uid,
+            user_name(st.st_uid) or 'UNKNOWN',
+            st.st_gid,
+            group_name(st.st_gid) or 'UNKNOWN',
+        ),
+        '',
+        'Modify: {}'.format(format_time(st.st_mtime_ns)),
+        '',
+        '',
+    ]
+
+    return ''.join('{}\n'.format(x) for x in lines)
+
+
+# See acl_ea.h in the Linux kernel
+ACL_EA_VERSION = 0x0002
+ACL_USER_OBJ = 0x01
+ACL_USER = 0x02
+ACL_GROUP_OBJ = 0x04
+ACL_GROUP = 0x08
+ACL_MASK = 0x10
+ACL_OTHER = 0x20
+
+ACL_TAGS = {
+    ACL_USER_OBJ: 'user',
+    ACL_USER: 'user',
+    ACL_GROUP_OBJ: 'group',
+    ACL_GROUP: 'group',
+    ACL_MASK: 'mask',
+    ACL_OTHER: 'other',
+}
+
+
+def acl_entries(path, name):
+    """
+    Returns the (tag, perm, id) entries of the POSIX ACL stored in the
+    extended attribute `name` of `path`, or None if there isn't one.
+    """
+
+    try:
+        val = os.getxattr(path, name)
+    except OSError:
+        return None
+
+    if len(val) < 4 or struct.unpack_from('<I', val)[0] != ACL_EA_VERSION:
         return None
 
-    # Support the case where the python3-xattr package is installed but
-    # python3-pyxattr is not; python3-xattr has an xattr class that can be used
-    # like a dict.
+    return [
+        struct.unpack_from('<HHI', val, offset)
+        for offset in range(4, len(val) - 7, 8)
+    ]
+
+
+def format_acl(entries, prefix=''):
+    def perms(x):
+        return ''.join(y if x & z else '-' for y, z in zip('rwx', (4, 2, 1)))
+
+    mask = None
+    for tag, perm, _ in entries:
+        if tag == ACL_MASK:
+            mask = perm
+
+    lines = []
+    for tag, perm, id_ in entries:
+        qualifier = ''
+        if tag == ACL_USER:
+            qualifier = user_name(id_) or str(id_)
+        elif tag == ACL_GROUP:
+            qualifier = group_name(id_) or str(id_)
+
+        line = '{}{}:{}:{}'.format(
+            prefix, ACL_TAGS.get(tag, '?'), qualifier, perms(perm)
+        )
+
+        # Like getfacl(1), line up comments on the permissions that the mask
+        # withholds.
+        if (
+            mask is not None
+            and tag in (ACL_USER, ACL_GROUP_OBJ, ACL_GROUP)
+            and perm & ~mask
+        ):
+            line += '\t' * max(1, (32 - len(line) + 7) // 8)
+            line += '#effective:{}'.format(perms(perm & mask))
+
+        lines.append(line)
+
+    return lines
+
+
+def native_getfacl(path):
+    """
+    The output of `getfacl -p -c path`.
+    """
+
+    access = acl_entries(path, 'system.posix_acl_access')
+    if access is None:
+        # Without an ACL, getfacl(1) describes the permission bits.
+        mode = os.stat(path).st_mode
+        access = [
+            (ACL_USER_OBJ, (mode >> 6) & 7, 0),
+            (ACL_GROUP_OBJ, (mode >> 3) & 7, 0),
+            (ACL_OTHER, mode & 7, 0),
+        ]
+
+    lines = format_acl(access)
+
+    if os.path.isdir(path):
+        default = acl_entries(path, 'system.posix_acl_default')
+        if default:
+            lines.extend(format_acl(default, prefix='default:'))
+
+    return ''.join('{}\n'.format(x) for x in lines) + '\n'
+
+
+# The flags as they are displayed by lsattr(1); see lib/e2p/pf.c in
+# e2fsprogs.
+FS_FLAGS = (
+    (0x00000001, 's'),  # FS_SECRM_FL
+    (0x00000002, 'u'),  # FS_UNRM_FL
+    (0x00000008, 'S'),  # FS_SYNC_FL
+    (0x00010000, 'D'),  # FS_DIRSYNC_FL
+    (0x00000010, 'i'),  # FS_IMMUTABLE_FL
+    (0x00000020, 'a'),  # FS_APPEND_FL
+    (0x00000040, 'd'),  # FS_NODUMP_FL
+    (0x00000080, 'A'),  # FS_NOATIME_FL
+    (0x00000004, 'c'),  # FS_COMPR_FL
+    (0x00000800, 'E'),  # FS_ENCRYPT_FL
+    (0x00004000, 'j'),  # FS_JOURNAL_DATA_FL
+    (0x00001000, 'I'),  # FS_INDEX_FL
+    (0x00008000, 't'),  # FS_NOTAIL_FL
+    (0x00020000, 'T'),  # FS_TOPDIR_FL
+    (0x00080000, 'e'),  # FS_EXTENT_FL
+    (0x00800000, 'C'),  # FS_NOCOW_FL
+    (0x02000000, 'x'),  # FS_DAX_FL
+    (0x40000000, 'F'),  # FS_CASEFOLD_FL
+    (0x10000000, 'N'),  # FS_INLINE_DATA_FL
+    (0x20000000, 'P'),  # FS_PROJINHERIT_FL
+    (0x00100000, 'V'),  # FS_VERITY_FL
+    (0x00000400, 'm'),  # FS_NOCOMP_FL
+)
+
+# _IOR('f', 1, long)
+FS_IOC_GETFLAGS = (2 << 30) | (struct.calcsize('l') << 16) | (0x66 << 8) | 1
+
+
+def native_lsattr(path):
+    """
+    The flags column of `lsattr -d path`.
+    """
+
+    # Like lsattr(1), only ask regular files and directories.
+    try:
+        mode = os.stat(path).st_mode
+        if not (stat.S_ISREG(mode) or stat.S_ISDIR(mode)):
+            return ''
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return ''
+
     try:
-        get_all = xattr_.get_all
-    except AttributeError:
+        buf = fcntl.ioctl(fd, FS_IOC_GETFLAGS, bytes(struct.calcsize('l')))
+    except OSError:
+        # filesystem doesn't support flags
+        return ''
+    finally:
+        os.close(fd)
+
+    flags = struct.unpack_from('I', buf)[0]
+
+    return ''.join(y if flags & x else '-' for x, y in FS_FLAGS)
+
+
+def native_difference(fn, path1, path2, source):
+    if command_excluded(source):
+        return None
+
+    return Difference.from_text(
+        fn(path1), fn(path2), path1, path2, source=source
+    )
+
+
+def xattrs(path):
+    """
+    Returns the extended attributes of `path` as text, or None if they cannot
+    be read.
+    """
+
+    if hasattr(os, 'listxattr'):
 
         def get_all(x):
-            return xattr_.xattr(x).items()
+            try:
+                names = os.listxattr(x)
+            except OSError:
+                return
+            for name in names:
+                try:
+                    val = os.getxattr(x, name)
+                except OSError:
+                    continue
+                yield name.encode('utf-8', 'surrogateescape'), val
+
+    else:
+        try:
+            import xattr as xattr_
+        except ImportError:
+            return None
 
-    def fn(x):
-        return '\n'.join(
-            '{}: {}'.format(
-                k.decode('utf-8', 'ignore'), v.decode('utf-8', 'ignore')
-            )
-            for k, v in get_all(x)
+        # Support the case where the python3-xattr package is installed but
+        # python3-pyxattr is not; python3-xattr has an xattr class that can
+        # be used like a dict.
+        try:
+            get_all = xattr_.get_all
+        except AttributeError:
+
+            def get_all(x):
+                return xattr_.xattr(x).items()
+
+    return '\n'.join(
+        '{}: {}'.format(
+            k.decode('utf-8', 'ignore'), v.decode('utf-8', 'ignore')
         )
+        for k, v in get_all(path)
+    )
+
+
+def xattr(path1, path2):
+    xattrs1 = xattrs(path1)
+    if xattrs1 is None:
+        return None
 
     return Difference.from_text(
-        fn(path1), fn(path2), path1, path2, source='extended file attributes'
+        xattrs1,
+        xattrs(path2),
+        path1,
+        path2,
+        source='extended file attributes',
     )
 
 
@@ -159,21 +611,35 @@ def compare_meta(path1, path2):
     if not os.path.exists(path1) or not os.path.exists(path2):
         return differences
 
-    try:
-        differences.append(Difference.from_command(Stat, path1, path2))
-    except RequiredToolNotFound:
-        logger.error("Unable to find 'stat'! Is PATH wrong?")
+    if NATIVE_METADATA:
+        differences.append(
+            native_difference(native_stat, path1, path2, 'stat {}')
+        )
+    else:
+        try:
+            differences.append(Difference.from_command(Stat, path1, path2))
+        except RequiredToolNotFound:
+            logger.error("Unable to find 'stat'! Is PATH wrong?")
     if os.path.islink(path1) or os.path.islink(path2):
         return [d for d in differences if d is not None]
-    try:
-        differences.append(Difference.from_command(Getfacl, path1, path2))
-    except RequiredToolNotFound:
-        logger.info(
-            "Unable to find 'getfacl', some directory metadata differences might not be noticed."
+    if NATIVE_METADATA:
+        differences.append(
+            native_difference(native_getfacl, path1, path2, 'getfacl -p -c {}')
         )
+    else:
+        try:
+            differences.append(Difference.from_command(Getfacl, path1, path2))
+        except RequiredToolNotFound:
+            logger.info(
+                "Unable to find 'getfacl', some directory metadata differences might not be noticed."
+            )
     try:
-        lsattr1 = lsattr(path1)
-        lsattr2 = lsattr(path2)
+        if NATIVE_METADATA:
+            lsattr1 = native_lsattr(path1)
+            lsattr2 = native_lsattr(path2)
+        else:
+            lsattr1 = lsattr(path1)
+            lsattr2 = lsattr(path2)
         differences.append(
             Difference.from_text(
                 lsattr1, lsattr2, path1, path2, source='lsattr'
@@ -204,8 +670,9 @@ class Directory(object):
 
 
 class FilesystemDirectory(Directory):
-    def __init__(self, path):
+    def __init__(self, path, index=None):
         self._path = path
+        self._index = index
 
     @property
     def path(self):
@@ -221,19 +688,34 @@ class FilesystemDirectory(Directory):
             self._as_container = DirectoryContainer(self)
         return self._as_container
 
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = DirectoryIndex(self._path)
+        return self._index
+
     def is_directory(self):
         return True
 
+    def release(self):
+        # Our members have already been released as they were compared (see
+        # DirectoryContainer.compare), so this only drops their objects.
+        if hasattr(self, '_as_container') and not self._as_container.shared:
+            del self._as_container
+
     def has_same_content_as(self, other):
         # no shortcut
         return False
 
     def compare(self, other, source=None):
+        if identical_subtrees(self.index, other.index):
+            return None
+
         differences = []
 
         listing_diff = Difference.from_text(
-            '\n'.join(list_files(self.path)),
-            '\n'.join(list_files(other.path)),
+            '\n'.join(sorted(self.index.list_files())),
+            '\n'.join(sorted(other.index.list_files())),
             self.path,
             other.path,
             source='file list',
@@ -243,9 +725,7 @@ class FilesystemDirectory(Directory):
 
         differences.extend(compare_meta(self.name, other.name))
 
-        my_container = DirectoryContainer(self)
-        other_container = DirectoryContainer(other)
-        differences.extend(my_container.compare(other_container))
+        differences.extend(self.as_container.compare(other.as_container))
 
         if not differences:
             return None
@@ -257,18 +737,28 @@ class FilesystemDirectory(Directory):
 
 class DirectoryContainer(Container):
     def get_member_names(self):
-        return sorted(os.listdir(self.source.path or '.'))
+        return sorted(self.source.index.scandir())
 
     def get_member(self, member_name):
         member_path = os.path.join(self.source.path, member_name)
 
-        if not os.path.islink(member_path) and os.path.isdir(member_path):
-            return FilesystemDirectory(member_path)
+        if self.source.index.is_directory(member_name):
+            directory = FilesystemDirectory(
+                member_path, self.source.index.subdirectory(member_name)
+            )
+            directory.as_container.shared = self.shared
+            return directory
 
         return FilesystemFile(
             os.path.join(self.source.path, member_name), container=self
         )
 
+    def get_member_size(self, member):
+        st = self.source.index.lstat(os.path.basename(member.name))
+        if st is None:
+            return super().get_member_size(member)
+        return st.st_size
+
     def comparisons(self, other):
         my_members = collections.OrderedDict(self.get_adjusted_members_sizes())
         other_members = collections.OrderedDict(
@@ -284,6 +774,10 @@ class DirectoryContainer(Container):
                 my_file, my_size = my_members[name]
                 other_file, other_size = other_members[name]
                 p.begin_step(my_size + other_size, msg=name)
+                if identical_subtrees(
+                    self.source.index, other.source.index, name
+                ):
+                    continue
                 yield my_file, other_file, name
 
     def compare(self, other, source=None):
@@ -296,8 +790,10 @@ class DirectoryContainer(Container):
                 inner_difference = Difference(None, file1.path, file2.path)
             if inner_difference:
                 inner_difference.add_details(meta_differences)
+            file1.release()
+            file2.release()
             return inner_difference
 
         return filter(
-            None, itertools.starmap(compare_pair, self.comparisons(other))
+            None, starmap_jobs(compare_pair, self.comparisons(other))
         )
@@ -326,6 +326,8 @@ class ElfSection(File):
     def fuzzy_hash(self):
         return None
 
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
+
     @classmethod
     def recognizes(cls, file):
         # No file should be recognized as an elf section
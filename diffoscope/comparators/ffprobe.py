@@ -27,20 +27,13 @@ from .utils.command import Command
 
 
 class Ffprobe(Command):
+    MERGE_STDERR = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.flag = False
 
-    def start(self):
-        super().start()
-
-        self.stderr = ''
-
-    @property
-    def stdout(self):
-        return self._process.stderr.splitlines(True)
-
     @tool_required('ffprobe')
     def cmdline(self):
         return ('ffprobe', self.path)
@@ -93,13 +93,11 @@ class FsImageFile(File):
     def recognizes(cls, file):
         # Avoid DOS / MBR file type as it generate a lot of false positives,
         # manually check "System identifier string" instead
-        with open(file.path, 'rb') as f:
-            f.seek(54)
-            if f.read(8) in (b'FAT12   ', b'FAT16   '):
-                return True
-            f.seek(82)
-            if f.read(8) == b'FAT32   ':
-                return True
+        header = file.read_header(90)
+        if header[54:62] in (b'FAT12   ', b'FAT16   '):
+            return True
+        if header[82:90] == b'FAT32   ':
+            return True
         return super().recognizes(file)
 
     def compare_details(self, other, source=None):
@@ -18,39 +18,33 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
+import gzip
 import logging
-import subprocess
 
 from diffoscope.tools import tool_required
 
 
 from .utils.file import File
-from .utils.archive import Archive
+from .utils.archive import CompressedContainer
 
 logger = logging.getLogger(__name__)
 
 
-class GzipContainer(Archive):
-    def open_archive(self):
-        return self
-
-    def close_archive(self):
-        pass
-
+class GzipContainer(CompressedContainer):
     def get_member_names(self):
         return [self.get_compressed_content_name('.gz')]
 
     @tool_required('gzip')
+    def decompress_cmdline(self):
+        return ["gzip", "--decompress", "--stdout", self.source.path]
+
+    def open_decompressed(self):
+        return gzip.open(self.source.path)
+
     def extract(self, member_name, dest_dir):
         dest_path = self.get_path_name(dest_dir)
         logger.debug('gzip extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["gzip", "--decompress", "--stdout", self.source.path],
-                shell=False,
-                stdout=fp,
-                stderr=None,
-            )
+        self.decompress_to(dest_path)
         return dest_path
 
 
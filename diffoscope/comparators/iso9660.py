@@ -89,11 +89,7 @@ class Iso9660File(File):
         # Sometimes CDs put things like MBRs at the front which is an expected
         # part of the ISO9660 standard, but file(1)/libmagic doesn't detect
         # this. <https://en.wikipedia.org/wiki/ISO_9660#Specifications>.
-        with open(file.path, 'rb') as f:
-            f.seek(32769)
-            return f.read(5) == b'CD001'
-
-        return False
+        return file.read_header(32774)[32769:] == b'CD001'
 
     def compare_details(self, other, source=None):
         differences = []
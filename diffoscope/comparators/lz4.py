@@ -20,37 +20,37 @@
 import re
 import os.path
 import logging
-import subprocess
 
 from diffoscope.tools import tool_required
 
 from .utils.file import File
-from .utils.archive import Archive
-
-logger = logging.getLogger(__name__)
+from .utils.archive import CompressedContainer
 
+try:
+    import lz4.frame
+except ImportError:  # noqa
+    lz4 = None
 
-class Lz4Container(Archive):
-    def open_archive(self):
-        return self
+logger = logging.getLogger(__name__)
 
-    def close_archive(self):
-        pass
 
+class Lz4Container(CompressedContainer):
     def get_member_names(self):
         return [self.get_compressed_content_name('.lz4')]
 
     @tool_required('lz4')
+    def decompress_cmdline(self):
+        return ["lz4", "-d", "-c", self.source.path]
+
+    def open_decompressed(self):
+        if lz4 is None:
+            return None
+        return lz4.frame.open(self.source.path)
+
     def extract(self, member_name, dest_dir):
         dest_path = os.path.join(dest_dir, member_name)
         logger.debug('lz4 extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["lz4", "-d", "-c", self.source.path],
-                shell=False,
-                stdout=fp,
-                stderr=None,
-            )
+        self.decompress_to(dest_path)
         return dest_path
 
 
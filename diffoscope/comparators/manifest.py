@@ -0,0 +1,435 @@
+# Generated by diffoscope.comparators.utils.manifest; do not edit.
+
+MANIFEST = {
+    'directory.Directory': (
+        'directories',
+        None,
+    ),
+    'missing_file.MissingFile': (
+        None,
+        None,
+    ),
+    'symlink.Symlink': (
+        'symlinks',
+        None,
+    ),
+    'device.Device': (
+        'character/block devices',
+        None,
+    ),
+    'debian_fallback.DotChangesFile': (
+        'text files',
+        {
+            'FILE_EXTENSION_SUFFIX': '.changes',
+            'FILE_TYPE_RE': ('\\btext\\b', 0),
+        },
+    ),
+    'debian_fallback.DotDscFile': (
+        'text files',
+        {
+            'FILE_EXTENSION_SUFFIX': '.dsc',
+            'FILE_TYPE_RE': ('\\btext\\b', 0),
+        },
+    ),
+    'debian_fallback.DotBuildinfoFile': (
+        'text files',
+        {
+            'FILE_EXTENSION_SUFFIX': '.buildinfo',
+            'FILE_TYPE_RE': ('\\btext\\b', 0),
+        },
+    ),
+    'deb.Md5sumsFile': (
+        None,
+        None,
+    ),
+    'deb.DebDataTarFile': (
+        None,
+        None,
+    ),
+    'elf.ElfSection': (
+        None,
+        {
+            'ENABLE_FALLBACK_RECOGONIZES': False,
+        },
+    ),
+    'binwalk.BinwalkFile': (
+        None,
+        {
+            'ENABLE_FALLBACK_RECOGONIZES': False,
+            'FILE_TYPE_RE': ('\\bcpio archive\\b', 0),
+        },
+    ),
+    'ps.PsFile': (
+        'PostScript documents',
+        {
+            'FILE_TYPE_RE': ('^PostScript document\\b', 0),
+        },
+    ),
+    'javascript.JavaScriptFile': (
+        'JavaScript files',
+        {
+            'FILE_EXTENSION_SUFFIX': '.js',
+        },
+    ),
+    'json.JSONFile': (
+        'JSON files',
+        None,
+    ),
+    'xml.XMLFile': (
+        'XML files',
+        {
+            'ENABLE_FALLBACK_RECOGONIZES': False,
+            'FILE_EXTENSION_SUFFIX': '.xml',
+        },
+    ),
+    'text.TextFile': (
+        'text files',
+        {
+            'FILE_TYPE_RE': ('\\btext\\b', 0),
+        },
+    ),
+    'bzip2.Bzip2File': (
+        'bzip2 archives',
+        {
+            'FILE_TYPE_RE': ('^bzip2 compressed data\\b', 0),
+        },
+    ),
+    'cpio.CpioFile': (
+        'cpio archives',
+        {
+            'FILE_TYPE_RE': ('\\bcpio archive\\b', 0),
+        },
+    ),
+    'deb.DebFile': (
+        None,
+        {
+            'FILE_TYPE_RE': ('^Debian binary package', 0),
+        },
+    ),
+    'dex.DexFile': (
+        'Dalvik .dex files',
+        {
+            'FILE_TYPE_RE': ('^Dalvik dex file .*\\b', 0),
+        },
+    ),
+    'elf.ElfFile': (
+        'ELF binaries',
+        {
+            'FILE_TYPE_RE': ('^ELF ', 0),
+        },
+    ),
+    'macho.MachoFile': (
+        'MacOS binaries',
+        {
+            'FILE_TYPE_RE': ('^Mach-O ', 0),
+        },
+    ),
+    'fsimage.FsImageFile': (
+        'ext2/ext3/ext4/btrfs/fat filesystems',
+        None,
+    ),
+    'elf.StaticLibFile': (
+        'statically-linked binaries',
+        {
+            'ENABLE_FALLBACK_RECOGONIZES': False,
+            'FILE_EXTENSION_SUFFIX': '.a',
+            'FILE_TYPE_RE': ('\\bar archive\\b', 0),
+        },
+    ),
+    'llvm.LlvmBitCodeFile': (
+        'LLVM IR bitcode files',
+        {
+            'FILE_TYPE_RE': ('^LLVM IR bitcode', 0),
+        },
+    ),
+    'sqlite.Sqlite3Database': (
+        'SQLite databases',
+        {
+            'FILE_TYPE_RE': ('^SQLite 3.x database', 0),
+        },
+    ),
+    'wasm.WasmFile': (
+        'WebAssembly binary module',
+        {
+            'ENABLE_FALLBACK_RECOGONIZES': False,
+            'FILE_EXTENSION_SUFFIX': '.wasm',
+        },
+    ),
+    'fonts.TtfFile': (
+        'TrueType font files',
+        {
+            'FILE_TYPE_RE': ('^(TrueType|OpenType) font data', 2),
+        },
+    ),
+    'fontconfig.FontconfigCacheFile': (
+        'FreeDesktop Fontconfig cache files',
+        {
+            'FILE_EXTENSION_SUFFIX': '-le64.cache-4',
+            'FILE_TYPE_HEADER_PREFIX': b'\x04\xfc',
+        },
+    ),
+    'gettext.MoFile': (
+        'Gettext message catalogues',
+        {
+            'FILE_TYPE_RE': ('^GNU message catalog\\b', 0),
+        },
+    ),
+    'ipk.IpkFile': (
+        'OpenWRT package archives (.ipk)',
+        {
+            'FALLBACK_FILE_EXTENSION_SUFFIX': '.gz',
+            'FALLBACK_FILE_TYPE_HEADER_PREFIX': b'\x1f\x8b',
+            'FILE_EXTENSION_SUFFIX': '.ipk',
+            'FILE_TYPE_RE': ('^gzip compressed data\\b', 0),
+        },
+    ),
+    'rust.RustObjectFile': (
+        'Rust object files (.deflate)',
+        {
+            'FILE_EXTENSION_SUFFIX': '.deflate',
+            'FILE_TYPE_HEADER_PREFIX': b'RUST_OBJECT\x01\x00\x00\x00',
+        },
+    ),
+    'ffprobe.FfprobeFile': (
+        'Multimedia metadata',
+        {
+            'FILE_TYPE_RE': ('^Audio file', 0),
+        },
+    ),
+    'gnumeric.GnumericFile': (
+        'Gnumeric spreadsheets',
+        {
+            'FILE_EXTENSION_SUFFIX': '.gnumeric',
+        },
+    ),
+    'gzip.GzipFile': (
+        'Gzipped files',
+        {
+            'FALLBACK_FILE_EXTENSION_SUFFIX': '.gz',
+            'FALLBACK_FILE_TYPE_HEADER_PREFIX': b'\x1f\x8b',
+            'FILE_TYPE_RE': ('^gzip compressed data\\b', 0),
+        },
+    ),
+    'haskell.HiFile': (
+        'GHC Haskell .hi files',
+        None,
+    ),
+    'icc.IccFile': (
+        'ColorSync colour profiles (.icc)',
+        {
+            'FILE_TYPE_RE': ('\\bColorSync (ICC|color) [Pp]rofile', 0),
+        },
+    ),
+    'iso9660.Iso9660File': (
+        'ISO 9660 CD images',
+        None,
+    ),
+    'java.ClassFile': (
+        'Java .class files',
+        {
+            'FILE_TYPE_RE': ('^compiled Java class data\\b', 0),
+        },
+    ),
+    'lz4.Lz4File': (
+        'LZ4 compressed files',
+        {
+            'FALLBACK_FILE_EXTENSION_SUFFIX': '.lz4',
+            'FALLBACK_FILE_TYPE_HEADER_PREFIX': b'\x04"M\x18',
+            'FILE_TYPE_RE': ('^LZ4 compressed data \\([^\\)]+\\)$', 0),
+        },
+    ),
+    'mono.MonoExeFile': (
+        "Mono 'Portable Executable' files",
+        {
+            'FILE_TYPE_RE': ('\\bPE[0-9]+\\b.*\\bMono\\b', 0),
+        },
+    ),
+    'pdf.PdfFile': (
+        'PDF documents',
+        {
+            'FILE_TYPE_RE': ('^PDF document\\b', 0),
+        },
+    ),
+    'png.PngFile': (
+        'PNG images',
+        {
+            'FILE_TYPE_RE': ('^PNG image data\\b', 0),
+        },
+    ),
+    'ppu.PpuFile': (
+        'FreePascal files (.ppu)',
+        {
+            'ENABLE_FALLBACK_RECOGONIZES': False,
+            'FILE_EXTENSION_SUFFIX': '.ppu',
+        },
+    ),
+    'rdata.RdbFile': (
+        'GNU R database files (.rdb)',
+        {
+            'FILE_EXTENSION_SUFFIX': '.rdb',
+        },
+    ),
+    'rdata.RdsFile': (
+        'GNU R Rscript files (.rds)',
+        None,
+    ),
+    'rpm_fallback.RpmFile': (
+        None,
+        {
+            'FILE_TYPE_RE': ('^RPM\\s', 0),
+        },
+    ),
+    'squashfs.SquashfsFile': (
+        'SquashFS filesystems',
+        {
+            'FILE_TYPE_RE': ('^Squashfs filesystem\\b', 0),
+        },
+    ),
+    'ar.ArFile': (
+        'ar(1) archives',
+        {
+            'FILE_TYPE_RE': ('\\bar archive\\b', 0),
+        },
+    ),
+    'tar.TarFile': (
+        'tape archives (.tar)',
+        {
+            'FILE_TYPE_RE': ('\\btar archive\\b', 0),
+        },
+    ),
+    'xz.XzFile': (
+        'XZ compressed files',
+        {
+            'FALLBACK_FILE_EXTENSION_SUFFIX': '.xz',
+            'FALLBACK_FILE_TYPE_HEADER_PREFIX': b'\xfd7zXZ\x00',
+            'FILE_TYPE_RE': ('^XZ compressed data$', 0),
+        },
+    ),
+    'apk.ApkFile': (
+        'Android APK files',
+        {
+            'FILE_EXTENSION_SUFFIX': '.apk',
+            'FILE_TYPE_HEADER_PREFIX': b'PK\x03\x04',
+            'FILE_TYPE_RE': ('^(Java|Zip) archive data.*\\b', 0),
+        },
+    ),
+    'odt.OdtFile': (
+        'OpenOffice .odt files',
+        {
+            'FILE_TYPE_RE': ('^OpenDocument Text\\b', 0),
+        },
+    ),
+    'ocaml.OcamlInterfaceFile': (
+        'OCaml interface files',
+        {
+            'FILE_TYPE_RE': ('^OCaml interface file ', 0),
+        },
+    ),
+    'docx.DocxFile': (
+        'Microsoft Word .docx files',
+        {
+            'FILE_TYPE_RE': ('^Microsoft Word 2007+\\b', 0),
+        },
+    ),
+    'zip.MozillaZipFile': (
+        None,
+        None,
+    ),
+    'zip.ZipFile': (
+        None,
+        {
+            'FILE_TYPE_RE': (
+                '^(Zip archive|Java archive|EPUB document|OpenDocument (Text|Spreadsheet|Presentation|Drawing|Formula|Template|Text Template)|Google Chrome extension)\\b',
+                0,
+            ),
+        },
+    ),
+    'image.JPEGImageFile': (
+        'JPEG images',
+        {
+            'FILE_TYPE_RE': ('\\bJPEG image data\\b', 0),
+        },
+    ),
+    'image.ICOImageFile': (
+        'Microsoft Windows icon files',
+        {
+            'FILE_TYPE_RE': ('\\bMS Windows icon resource\\b', 0),
+        },
+    ),
+    'cbfs.CbfsFile': (
+        'Coreboot CBFS filesystem images',
+        None,
+    ),
+    'git.GitIndexFile': (
+        'Git repositories',
+        {
+            'FILE_TYPE_RE': ('^Git index', 0),
+        },
+    ),
+    'android.AndroidBootImgFile': (
+        'Android boot images',
+        {
+            'FILE_TYPE_RE': ('^Android bootimg\\b', 0),
+        },
+    ),
+    'openssh.PublicKeyFile': (
+        'OpenSSH public keys',
+        {
+            'FILE_TYPE_RE': ('^OpenSSH \\S+ public key', 0),
+        },
+    ),
+    'gif.GifFile': (
+        'GIF image files',
+        {
+            'FILE_TYPE_RE': ('^GIF image data\\b', 0),
+        },
+    ),
+    'pcap.PcapFile': (
+        'tcpdump capture files (.pcap)',
+        {
+            'FILE_TYPE_RE': ('^(tcpdump|pcap) capture file\\b', 0),
+        },
+    ),
+    'pgp.PgpFile': (
+        'PGP signed/encrypted messages',
+        {
+            'FILE_TYPE_RE': ('^PGP message\\b', 0),
+        },
+    ),
+    'pgp.PgpSignature': (
+        'PGP signatures',
+        {
+            'FILE_TYPE_RE': ('^PGP signature\\b', 0),
+        },
+    ),
+    'kbx.KbxFile': (
+        'GPG keybox databases',
+        {
+            'FILE_TYPE_RE': ('^GPG keybox database\\b', 0),
+        },
+    ),
+    'dtb.DeviceTreeFile': (
+        'Device Tree Compiler blob files',
+        {
+            'FILE_TYPE_RE': ('^Device Tree Blob', 0),
+        },
+    ),
+    'ogg.OggFile': (
+        'Ogg Vorbis audio files',
+        {
+            'FILE_TYPE_RE': ('^Ogg data', 0),
+        },
+    ),
+    'xsb.XsbFile': (
+        'XML binary schemas (.xsb)',
+        {
+            'FILE_EXTENSION_SUFFIX': '.xsb',
+        },
+    ),
+    'berkeley_db.BerkeleyDBFile': (
+        'Berkeley DB database files',
+        {
+            'FILE_TYPE_RE': ('^Berkeley DB ', 0),
+        },
+    ),
+}
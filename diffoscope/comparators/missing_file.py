@@ -69,6 +69,10 @@ class MissingFile(File):
     def is_device(self):
         return False
 
+    def release(self):
+        # We have no temporary data of our own (nor a container).
+        pass
+
     def compare(self, other, source=None):
         # So now that comparators are all object-oriented, we don't have any
         # clue on how to perform a meaningful comparison right here. So we are
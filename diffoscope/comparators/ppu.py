@@ -63,6 +63,7 @@ class Ppudump(Command):
 class PpuFile(File):
     DESCRIPTION = "FreePascal files (.ppu)"
     FILE_EXTENSION_SUFFIX = '.ppu'
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
 
     @classmethod
     def recognizes(cls, file):
@@ -20,7 +20,10 @@
 import os
 import logging
 
-from diffoscope.tempfiles import get_named_temporary_file
+from diffoscope.tempfiles import (
+    get_named_temporary_file,
+    release_temporary_file,
+)
 from diffoscope.difference import Difference
 
 from .utils.file import File
@@ -53,10 +56,7 @@ class Symlink(File):
 
     def cleanup(self):
         if hasattr(self, '_placeholder'):
-            try:
-                os.remove(self._placeholder)
-            except FileNotFoundError:
-                pass
+            release_temporary_file(self._placeholder)
             del self._placeholder
         super().cleanup()
 
@@ -19,14 +19,22 @@
 
 import os
 import abc
+import shutil
 import logging
+import contextlib
+import subprocess
 
 from diffoscope.profiling import profile
-from diffoscope.tempfiles import get_temporary_directory
+from diffoscope.tempfiles import (
+    get_temporary_directory,
+    release_temporary_directory,
+    release_temporary_file,
+    track_temporary_file,
+)
 
 from ..missing_file import MissingFile
 
-from .file import File
+from .file import File, SMALL_FILE_THRESHOLD
 from .container import Container
 
 logger = logging.getLogger(__name__)
@@ -95,21 +103,34 @@ class ArchiveMember(File):
             )
             assert self._temp_dir is None
             self._temp_dir = get_temporary_directory()
-            with profile('container_extract', self.container):
-                self._path = self.container.extract(
-                    self._name, self._temp_dir.name
-                )
+            try:
+                with profile('container_extract', self.container):
+                    path = self.container.extract(
+                        self._name, self._temp_dir.name
+                    )
+                # Counts towards, and so enforces, --max-temp-size.
+                if path.startswith(self._temp_dir.name + os.sep):
+                    track_temporary_file(path)
+            except BaseException:
+                release_temporary_directory(self._temp_dir)
+                self._temp_dir = None
+                raise
+            self._path = path
         return self._path
 
+    def is_extracted_to_temp_dir(self):
+        # Some containers unpack everything up front and return a path into
+        # that instead.
+        return self._path.startswith(self._temp_dir.name + os.sep)
+
     def cleanup(self):
-        if self._path is not None:
-            self._path = None
         if self._temp_dir is not None:
-            try:
-                self._temp_dir.cleanup()
-            except FileNotFoundError:
-                pass
+            if self._path is not None and self.is_extracted_to_temp_dir():
+                release_temporary_file(self._path)
+            release_temporary_directory(self._temp_dir)
             self._temp_dir = None
+        if self._path is not None:
+            self._path = None
         super().cleanup()
 
     def is_directory(self):
@@ -122,6 +143,243 @@ class ArchiveMember(File):
         return False
 
 
+class CompressedContainer(Archive, metaclass=abc.ABCMeta):
+    """
+    A file compressed with eg. gzip(1), whose only member is its decompressed
+    content (see DecompressedMember).
+    """
+
+    def open_archive(self):
+        return self
+
+    def close_archive(self):
+        pass
+
+    def get_member(self, member_name):
+        return DecompressedMember(self, member_name)
+
+    def get_member_size(self, member):
+        # Only used to report progress, so the compressed size will do rather
+        # than decompressing everything up front.
+        return os.path.getsize(self.source.path)
+
+    @abc.abstractmethod
+    def decompress_cmdline(self):
+        raise NotImplementedError()
+
+    def open_decompressed(self):
+        """
+        Returns a file object that decompresses us in-process (eg. using the
+        gzip module) or None if this is not possible, in which case
+        decompress_cmdline() is run instead.
+        """
+
+        return None
+
+    @contextlib.contextmanager
+    def decompress(self):
+        """
+        Yields a file object from which our decompressed content can be read
+        without writing it to disk.
+        """
+
+        f = self.open_decompressed()
+        if f is None:
+            with self.run_decompressor() as f:
+                yield f
+            return
+
+        with FallbackReader(f, self.run_decompressor) as f:
+            yield f
+
+    def decompress_to(self, dest_path):
+        with open(dest_path, 'wb') as fp, self.decompress() as f:
+            shutil.copyfileobj(f, fp)
+
+    @contextlib.contextmanager
+    def run_decompressor(self):
+        cmdline = self.decompress_cmdline()
+        p = subprocess.Popen(
+            cmdline,
+            shell=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            yield p.stdout
+
+            # We may not have needed to read everything, but if we did,
+            # ensure that it was all there.
+            if not p.stdout.read(1) and p.wait() != 0:
+                raise subprocess.CalledProcessError(p.returncode, cmdline)
+        finally:
+            p.stdout.close()
+            if p.poll() is None:
+                p.kill()
+            p.wait()
+
+
+class FallbackReader(object):
+    """
+    Reads from `f`, a file object that decompresses in-process, switching to
+    the output of `fallback()` (from the same offset) if that fails, eg. as
+    the compressed data is not quite standard but the external tool copes.
+    """
+
+    def __init__(self, f, fallback):
+        self.f = f
+        self.fallback = fallback
+        self.offset = 0
+        self.stack = contextlib.ExitStack()
+        self.stack.enter_context(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.stack.__exit__(*exc_info)
+
+    def read(self, size=-1):
+        try:
+            buf = self.f.read(size)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+
+            logger.debug("Unable to decompress in-process: %s", e)
+            self.f = self.stack.enter_context(self.fallback())
+            self.fallback = None
+
+            remaining = self.offset
+            while remaining > 0:
+                skipped = self.f.read(min(remaining, SMALL_FILE_THRESHOLD))
+                if not skipped:
+                    break
+                remaining -= len(skipped)
+
+            buf = self.f.read(size)
+
+        self.offset += len(buf)
+        return buf
+
+
+class HeaderReader(object):
+    """
+    Reads from `f`, keeping (up to) the first `size` bytes in `header`.
+    """
+
+    def __init__(self, f, size):
+        self.f = f
+        self.size = size
+        self.header = b''
+
+    def read(self, size=-1):
+        buf = self.f.read(size)
+        if len(self.header) < self.size:
+            self.header += buf[: self.size - len(self.header)]
+        return buf
+
+    def fill(self):
+        """
+        Read on until we have the entire header.
+        """
+
+        while len(self.header) < self.size:
+            if not self.read(self.size - len(self.header)):
+                break
+
+
+class DecompressedMember(ArchiveMember):
+    """
+    The decompressed content of a file such as foo.tar.gz. This is only
+    written to disk if our path is needed; otherwise we are compared, hashed
+    and identified by decompressing on the fly, keeping the start of our
+    content (see HeaderReader) so that this is done in as few passes as
+    possible. LibarchiveContainer reads `compressed_path` directly.
+    """
+
+    # How much of our content is kept to identify us (libmagic reads no more
+    # than this by default) and for read_header().
+    HEADER_SIZE = 2 ** 20  # 1 MiB
+
+    @property
+    def compressed_path(self):
+        return self.container.source.path
+
+    def is_extracted(self):
+        return self._path is not None
+
+    def read_header(self, size):
+        if self.is_extracted():
+            return super().read_header(size)
+
+        if size > self.HEADER_SIZE:
+            with self.container.decompress() as f:
+                return f.read(size)
+
+        return self._get_header()[:size]
+
+    def _get_header(self):
+        if not hasattr(self, '_header'):
+            with self.container.decompress() as f:
+                reader = HeaderReader(f, self.HEADER_SIZE)
+                reader.fill()
+            self._header = reader.header
+        return self._header
+
+    def _identify(self):
+        if self.is_extracted():
+            return super()._identify()
+
+        self._magic_file_type = File.guess_buffer_type(self._get_header())
+
+    def _hash(self):
+        if self.is_extracted():
+            return super()._hash()
+
+        with self.container.decompress() as f:
+            reader = HeaderReader(f, self.HEADER_SIZE)
+            self._hash_file(reader)
+        self._header = reader.header
+
+    def has_same_content_as(self, other):
+        if (
+            not isinstance(other, DecompressedMember)
+            or self.is_extracted()
+            or other.is_extracted()
+        ):
+            return super().has_same_content_as(other)
+
+        if hasattr(self, '_digest') and hasattr(other, '_digest'):
+            return self._digest == other._digest
+
+        with profile('command', 'cmp (decompressed)'):
+            with self.container.decompress() as file1:
+                with other.container.decompress() as file2:
+                    reader1 = HeaderReader(file1, self.HEADER_SIZE)
+                    reader2 = HeaderReader(file2, other.HEADER_SIZE)
+                    result = compare_streams(reader1, reader2)
+
+                    # Should we differ, we will be identified next.
+                    reader1.fill()
+                    reader2.fill()
+
+        self._header = reader1.header
+        other._header = reader2.header
+
+        return result
+
+
+def compare_streams(file1, file2):
+    while True:
+        buf1 = file1.read(SMALL_FILE_THRESHOLD)
+        buf2 = file2.read(SMALL_FILE_THRESHOLD)
+        if buf1 != buf2:
+            return False
+        if not buf1:
+            return True
+
+
 class MissingArchiveLikeObject(object):
     def getnames(self):
         return []
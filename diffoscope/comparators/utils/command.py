@@ -18,24 +18,50 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import abc
-import logging
 import shlex
+import logging
+import threading
 import subprocess
 
+from diffoscope.cache import command_key, load_command, store_command
+
 logger = logging.getLogger(__name__)
 
 
 class Command(object, metaclass=abc.ABCMeta):
     MAX_STDERR_LINES = 50
 
+    # Some tools (eg. ffprobe) write their interesting output to stderr.
+    MERGE_STDERR = False
+
+    # Whether the output depends only on the contents of the file at `path`
+    # (and the command line) so that it may be reused from the cache.
+    CACHEABLE = True
+
+    # Don't keep hold of more output than this in order to cache it.
+    MAX_CACHED_OUTPUT = 2 ** 24  # 16 MiB
+
     def __init__(self, path):
         self._path = path
+        self._process = None
+        self._cache_key = None
+        self._cached = None
 
     def start(self):
         logger.debug(
             "Executing %s", ' '.join([shlex.quote(x) for x in self.cmdline()])
         )
 
+        if self.CACHEABLE:
+            self._cache_key = command_key(self)
+        if self._cache_key is not None:
+            try:
+                self._cached = load_command(self._cache_key, self.path)
+                logger.debug("Using cached output")
+                return
+            except KeyError:
+                pass
+
         self._stdin = self.stdin()
         # "stdin" used to be a feeder but we didn't need the functionality so
         # it was simplified into the current form. it can be recovered from git
@@ -43,17 +69,32 @@ class Command(object, metaclass=abc.ABCMeta):
         # consider using a shell pipeline ("sh -ec $script") to implement what
         # you need, because that involves much less code - like it or not (I
         # don't) shell is still the most readable option for composing processes
-        self._process = subprocess.run(
+        #
+        # The process is not waited for here; its output is streamed through
+        # the stdout property so that both sides of a comparison run
+        # concurrently and we never hold a tool's entire output in memory.
+        self._process = subprocess.Popen(
             self.cmdline(),
             shell=False,
             close_fds=True,
             env=self.env(),
             stdin=self._stdin,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.STDOUT if self.MERGE_STDERR else subprocess.PIPE,
         )
-
-        self.stderr = self._read_stderr()
+        if hasattr(self._stdin, 'close'):
+            # The child has its own copy now
+            self._stdin.close()
+
+        # Drain stderr in the background so that the process cannot block on
+        # a full pipe whilst we are only reading its stdout.
+        self._stderr = ""
+        self._stderr_reader = None
+        if not self.MERGE_STDERR:
+            self._stderr_reader = threading.Thread(
+                target=self._read_stderr, daemon=True
+            )
+            self._stderr_reader.start()
 
     @property
     def path(self):
@@ -85,28 +126,79 @@ class Command(object, metaclass=abc.ABCMeta):
         pass
 
     def terminate(self):
-        pass
+        """
+        Kill the process if it is still running, eg. because its output was
+        not consumed in its entirety.
+        """
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
 
     def _read_stderr(self):
         buf = ""
-        lines = self._process.stderr.splitlines(True)
+        extra = 0
 
-        for index, line in enumerate(lines):
+        for index, line in enumerate(self._process.stderr):
             if index >= Command.MAX_STDERR_LINES:
-                break
+                extra += 1
+                continue
             buf += line.decode('utf-8', errors='replace')
 
-        if len(lines) > Command.MAX_STDERR_LINES:
-            buf += '[ {} lines ignored ]\n'.format(
-                len(lines) - Command.MAX_STDERR_LINES
-            )
+        if extra:
+            buf += '[ {} lines ignored ]\n'.format(extra)
+
+        self._process.stderr.close()
+        self._stderr = buf
 
-        return buf
+    def wait(self):
+        if self._cached is not None:
+            return
+        self._process.wait()
+        if self._stderr_reader is not None:
+            self._stderr_reader.join()
+
+    @property
+    def stderr(self):
+        if self._cached is not None:
+            return self._cached[1]
+        self.wait()
+        return self._stderr
 
     @property
     def returncode(self):
+        if self._cached is not None:
+            return self._cached[2]
+        self.wait()
         return self._process.returncode
 
     @property
     def stdout(self):
-        return self._process.stdout.splitlines(True)
+        if self._cached is not None:
+            yield from self._cached[0].splitlines(True)
+            return
+
+        output = [] if self._cache_key is not None else None
+        size = 0
+
+        with self._process.stdout as f:
+            for line in f:
+                if output is not None:
+                    output.append(line)
+                    size += len(line)
+                    if size > self.MAX_CACHED_OUTPUT:
+                        output = None
+                # Split on the same boundaries as bytes.splitlines, which we
+                # historically used on the buffered output.
+                yield from line.splitlines(True)
+
+        # Only cache complete output from processes that were not killed.
+        if output is not None and self.returncode >= 0:
+            store_command(
+                self._cache_key,
+                self.path,
+                b''.join(output),
+                self.stderr,
+                self.returncode,
+            )
@@ -23,6 +23,12 @@ import sys
 import logging
 import binascii
 
+from diffoscope.cache import (
+    comparison_key,
+    load_comparison,
+    share_command_output,
+    store_comparison,
+)
 from diffoscope.tools import tool_required
 from diffoscope.exc import RequiredToolNotFound
 from diffoscope.config import Config
@@ -50,36 +56,59 @@ class Xxd(Command):
 
 
 def compare_root_paths(path1, path2):
-    from ..directory import (
-        FilesystemDirectory,
-        FilesystemFile,
-        compare_directories,
-        compare_meta,
-    )
-
-    if not Config().new_file:
-        bail_if_non_existing(path1, path2)
-    if any_excluded(path1, path2):
-        return None
-
-    if os.path.isdir(path1) and os.path.isdir(path2):
-        return compare_directories(path1, path2)
-
-    container1 = FilesystemDirectory(os.path.dirname(path1)).as_container
-    file1 = specialize(FilesystemFile(path1, container=container1))
-    container2 = FilesystemDirectory(os.path.dirname(path2)).as_container
-    file2 = specialize(FilesystemFile(path2, container=container2))
-    difference = compare_files(file1, file2)
-
-    if Config().exclude_directory_metadata in ('no', 'recursive'):
-        meta = compare_meta(path1, path2)
-        if meta:
-            # Create an "empty" difference so we have something to attach file
-            # metadata to.
-            if difference is None:
-                difference = Difference(None, file1.name, file2.name)
-            difference.add_details(meta)
-    return difference
+    return next(compare_root_paths_against(path1, [path2]))
+
+
+def compare_root_paths_against(path1, paths):
+    """
+    Compare `path1` against each of `paths` in turn, yielding a difference
+    (or None) for each.
+
+    When comparing against several paths, everything derived from `path1`
+    (its recognised type, containers, extracted members, etc.) is retained
+    and reused for each comparison rather than being recomputed.
+    """
+
+    from ..directory import FilesystemDirectory, FilesystemFile, compare_meta
+
+    shared = len(paths) > 1
+    reference = {}
+
+    for path2 in paths:
+        if not Config().new_file:
+            bail_if_non_existing(path1, path2)
+        if any_excluded(path1, path2):
+            yield None
+            continue
+
+        if os.path.isdir(path1) and os.path.isdir(path2):
+            if 'directory' not in reference:
+                directory = FilesystemDirectory(path1)
+                directory.as_container.shared = shared
+                reference['directory'] = directory
+            yield reference['directory'].compare(FilesystemDirectory(path2))
+            continue
+
+        if 'file' not in reference:
+            container1 = FilesystemDirectory(os.path.dirname(path1))
+            container1.as_container.shared = shared
+            reference['file'] = specialize(
+                FilesystemFile(path1, container=container1.as_container)
+            )
+        file1 = reference['file']
+        container2 = FilesystemDirectory(os.path.dirname(path2)).as_container
+        file2 = specialize(FilesystemFile(path2, container=container2))
+        difference = compare_files(file1, file2)
+
+        if Config().exclude_directory_metadata in ('no', 'recursive'):
+            meta = compare_meta(path1, path2)
+            if meta:
+                # Create an "empty" difference so we have something to attach
+                # file metadata to.
+                if difference is None:
+                    difference = Difference(None, file1.name, file2.name)
+                difference.add_details(meta)
+        yield difference
 
 
 def compare_files(file1, file2, source=None, diff_content_only=False):
@@ -112,6 +141,9 @@ def compare_files(file1, file2, source=None, diff_content_only=False):
 
     specialize(file1)
     specialize(file2)
+    for x in (file1, file2):
+        if is_shared(x):
+            share_command_output(x.path)
     if isinstance(file1, MissingFile):
         file1.other_file = file2
     elif isinstance(file2, MissingFile):
@@ -119,9 +151,45 @@ def compare_files(file1, file2, source=None, diff_content_only=False):
     elif (file1.__class__.__name__ != file2.__class__.__name__) and (
         file1.as_container is None or file2.as_container is None
     ):
-        return file1.compare_bytes(file2, source)
+        return cached_compare(file1.compare_bytes, file1, file2, source)
     with profile('compare_files (cumulative)', file1):
-        return file1.compare(file2, source)
+        return cached_compare(file1.compare, file1, file2, source)
+
+
+def cached_compare(fn, file1, file2, source):
+    key = None
+    if is_cacheable(file1) and is_cacheable(file2):
+        key = comparison_key(file1, file2, source)
+
+    if key is None:
+        return fn(file2, source)
+
+    try:
+        return load_comparison(key)
+    except KeyError:
+        pass
+
+    difference = fn(file2, source)
+    store_comparison(key, difference)
+
+    return difference
+
+
+def is_cacheable(file):
+    return not (
+        isinstance(file, MissingFile)
+        or file.is_directory()
+        or file.is_symlink()
+        or file.is_device()
+    )
+
+
+def is_shared(file):
+    return (
+        is_cacheable(file)
+        and file.container is not None
+        and file.container.shared
+    )
 
 
 def bail_if_non_existing(*paths):
@@ -22,6 +22,9 @@ import uuid
 import os.path
 import logging
 import itertools
+import threading
+import collections
+import concurrent.futures
 from collections import OrderedDict
 
 from diffoscope.config import Config
@@ -32,7 +35,7 @@ from diffoscope.progress import Progress
 from ..missing_file import MissingFile
 
 from .file import path_apparent_size
-from .fuzzy import perform_fuzzy_matching
+from .fuzzy import perform_exact_matching, perform_fuzzy_matching
 
 NO_COMMENT = None
 
@@ -42,6 +45,12 @@ logger = logging.getLogger(__name__)
 class Container(object, metaclass=abc.ABCMeta):
     auto_diff_metadata = True
 
+    # Whether this container will be compared against several others, in
+    # which case its members (along with their recognised types, nested
+    # containers, extracted contents, etc.) are retained between comparisons.
+    # Nested containers inherit this from their parent.
+    shared = False
+
     def __new__(cls, source):
         if isinstance(source, MissingFile):
             new = super(Container, MissingContainer).__new__(MissingContainer)
@@ -57,6 +66,7 @@ class Container(object, metaclass=abc.ABCMeta):
         self.depth = 0
         if hasattr(source, 'container') and source.container is not None:
             self.depth = source.container.depth + 1
+            self.shared = source.container.shared
 
     @property
     def source(self):
@@ -120,13 +130,30 @@ class Container(object, metaclass=abc.ABCMeta):
         return container.lookup_file(*remainings)
 
     def get_adjusted_members_sizes(self):
+        if not self.shared:
+            return self._get_adjusted_members_sizes()
+
+        if not hasattr(self, '_adjusted_members_sizes'):
+            self._adjusted_members_sizes = list(
+                self._get_adjusted_members_sizes()
+            )
+        return iter(self._adjusted_members_sizes)
+
+    def _get_adjusted_members_sizes(self):
         for name, member in self.get_adjusted_members():
             if member.is_directory():
                 size = 4096  # default "size" of a directory
             else:
-                size = path_apparent_size(member.path)
+                size = self.get_member_size(member)
             yield name, (member, size)
 
+    def get_member_size(self, member):
+        """
+        Returns the size of `member` for reporting progress. Override this if
+        it can be determined without extracting the member first.
+        """
+        return path_apparent_size(member.path)
+
     def comparisons(self, other):
         my_members = OrderedDict(self.get_adjusted_members_sizes())
         other_members = OrderedDict(other.get_adjusted_members_sizes())
@@ -163,16 +190,19 @@ class Container(object, metaclass=abc.ABCMeta):
             for name in both_names:
                 yield prep_yield(name, name)
 
-            for my_name, other_name, score in self.perform_fuzzy_matching(
-                my_members, other_members
-            ):
-                comment = (
-                    "Files similar despite different names"
-                    " (score: {}, lower is more similar)".format(score)
-                )
-                if score == 0:
-                    comment = "Files identical despite different names"
-                yield prep_yield(my_name, other_name, comment)
+            # Only fall back to fuzzy matching for what remains after pairing
+            # up members that were simply renamed.
+            for fn in (perform_exact_matching, self.perform_fuzzy_matching):
+                for my_name, other_name, score in fn(
+                    my_members, other_members
+                ):
+                    comment = (
+                        "Files similar despite different names"
+                        " (score: {}, lower is more similar)".format(score)
+                    )
+                    if score == 0:
+                        comment = "Files identical despite different names"
+                    yield prep_yield(my_name, other_name, comment)
 
             if Config().new_file:
                 for my_member, my_size in my_members.values():
@@ -194,6 +224,8 @@ class Container(object, metaclass=abc.ABCMeta):
             difference = compare_files(
                 file1, file2, source=None, diff_content_only=no_recurse
             )
+            file1.release()
+            file2.release()
             if comment:
                 if difference is None:
                     difference = Difference(None, file1.name, file2.name)
@@ -201,10 +233,79 @@ class Container(object, metaclass=abc.ABCMeta):
             return difference
 
         return filter(
-            None, itertools.starmap(compare_pair, self.comparisons(other))
+            None, starmap_jobs(compare_pair, self.comparisons(other))
         )
 
 
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the thread pool shared by comparisons at every depth along with
+    a semaphore counting its free workers. The calling thread does its share
+    of the work, so --jobs N means N - 1 additional workers.
+    """
+    global _EXECUTOR
+
+    jobs = Config().jobs
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR[0] != jobs:
+            _EXECUTOR = (
+                jobs,
+                concurrent.futures.ThreadPoolExecutor(max_workers=jobs - 1),
+                threading.BoundedSemaphore(jobs - 1),
+            )
+        return _EXECUTOR[1:]
+
+
+def starmap_jobs(fn, iterable):
+    """
+    Like itertools.starmap, but with --jobs calls `fn` in a pool of threads.
+
+    Results are yielded in the same order as `iterable`. Items are only taken
+    from `iterable` as workers become free so that progress reporting stays
+    meaningful and memory usage is bounded.
+
+    Nested containers share the same pool, so members of (say) the
+    data.tar.xz inside a .deb are compared in parallel too. When every worker
+    is busy, the calling thread calls `fn` itself rather than waiting for one
+    to become free; this bounds the number of threads to --jobs at any depth
+    and means that a worker never waits on work that cannot be started.
+    """
+    jobs = Config().jobs
+    if jobs <= 1:
+        yield from itertools.starmap(fn, iterable)
+        return
+
+    executor, workers = get_executor()
+
+    def run(args):
+        try:
+            return fn(*args)
+        finally:
+            workers.release()
+
+    pending = collections.deque()
+    for args in iterable:
+        if workers.acquire(blocking=False):
+            pending.append(executor.submit(run, args))
+        else:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            pending.append(future)
+
+        while pending and (pending[0].done() or len(pending) >= jobs * 2):
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
 class MissingContainer(Container):
     def get_member_names(self):
         return self.source.other_file.as_container.get_member_names()
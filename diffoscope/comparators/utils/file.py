@@ -20,8 +20,11 @@
 import os
 import re
 import abc
+import stat
 import magic
+import hashlib
 import logging
+import threading
 import subprocess
 
 from diffoscope.exc import (
@@ -39,7 +42,17 @@ try:
 except ImportError:  # noqa
     tlsh = None
 
+try:
+    import mmap
+except ImportError:  # noqa
+    mmap = None
+
 SMALL_FILE_THRESHOLD = 65536  # 64 kiB
+# Larger chunks are slower to compare as they no longer fit in the CPU cache
+CMP_CHUNK_SIZE = 65536  # 64 kiB
+
+# libmagic handles are not safe to share between threads (see --jobs)
+_MAGIC_LOCK = threading.RLock()
 
 logger = logging.getLogger(__name__)
 
@@ -68,34 +81,65 @@ class File(object, metaclass=abc.ABCMeta):
     if hasattr(magic, 'open'):  # use Magic-file-extensions from file
 
         @classmethod
-        def guess_file_type(self, path):
-            if not hasattr(self, '_mimedb'):
-                self._mimedb = magic.open(magic.NONE)
-                self._mimedb.load()
-            return self._mimedb.file(
-                path.encode('utf-8', errors='surrogateescape')
-            )
+        def guess_file_type(self, path, fd=None):
+            with _MAGIC_LOCK:
+                if not hasattr(self, '_mimedb'):
+                    self._mimedb = magic.open(magic.NONE)
+                    self._mimedb.load()
+                if fd is not None:
+                    return self._mimedb.descriptor(fd)
+                return self._mimedb.file(
+                    path.encode('utf-8', errors='surrogateescape')
+                )
+
+        @classmethod
+        def guess_buffer_type(self, buf):
+            with _MAGIC_LOCK:
+                if not hasattr(self, '_mimedb'):
+                    self._mimedb = magic.open(magic.NONE)
+                    self._mimedb.load()
+                return self._mimedb.buffer(buf)
 
         @classmethod
         def guess_encoding(self, path):
-            if not hasattr(self, '_mimedb_encoding'):
-                self._mimedb_encoding = magic.open(magic.MAGIC_MIME_ENCODING)
-                self._mimedb_encoding.load()
-            return self._mimedb_encoding.file(path)
+            with _MAGIC_LOCK:
+                if not hasattr(self, '_mimedb_encoding'):
+                    self._mimedb_encoding = magic.open(
+                        magic.MAGIC_MIME_ENCODING
+                    )
+                    self._mimedb_encoding.load()
+                return self._mimedb_encoding.file(path)
 
     else:  # use python-magic
 
         @classmethod
-        def guess_file_type(self, path):
-            if not hasattr(self, '_mimedb'):
-                self._mimedb = magic.Magic()
-            return maybe_decode(self._mimedb.from_file(path))
+        def guess_file_type(self, path, fd=None):
+            with _MAGIC_LOCK:
+                if not hasattr(self, '_mimedb'):
+                    self._mimedb = magic.Magic()
+                # from_descriptor() is only available in python-magic 0.4.21+
+                if fd is not None and hasattr(self._mimedb, 'from_descriptor'):
+                    return maybe_decode(self._mimedb.from_descriptor(fd))
+                if path is None:
+                    # Eg. a pipe (see DecompressedMember)
+                    with open(fd, 'rb', closefd=False) as f:
+                        buf = f.read(2 ** 20)
+                    return maybe_decode(self._mimedb.from_buffer(buf))
+                return maybe_decode(self._mimedb.from_file(path))
+
+        @classmethod
+        def guess_buffer_type(self, buf):
+            with _MAGIC_LOCK:
+                if not hasattr(self, '_mimedb'):
+                    self._mimedb = magic.Magic()
+                return maybe_decode(self._mimedb.from_buffer(buf))
 
         @classmethod
         def guess_encoding(self, path):
-            if not hasattr(self, '_mimedb_encoding'):
-                self._mimedb_encoding = magic.Magic(mime_encoding=True)
-            return maybe_decode(self._mimedb_encoding.from_file(path))
+            with _MAGIC_LOCK:
+                if not hasattr(self, '_mimedb_encoding'):
+                    self._mimedb_encoding = magic.Magic(mime_encoding=True)
+                return maybe_decode(self._mimedb_encoding.from_file(path))
 
     def __init__(self, container=None):
         self._container = container
@@ -118,10 +162,24 @@ class File(object, metaclass=abc.ABCMeta):
     def __del__(self):
         self.cleanup()
 
+    # Called once we have been compared. Unless we will be compared again
+    # (see Container.shared) there is no need to wait until we are garbage
+    # collected to remove our temporary data, including that of any nested
+    # containers.
+    def release(self):
+        if self.container is None or not self.container.shared:
+            self.cleanup()
+
     FILE_EXTENSION_SUFFIX = None
     FILE_TYPE_RE = None
     FILE_TYPE_HEADER_PREFIX = None
 
+    # Set this if you override recognizes() but it only ever returns True for
+    # files that the default test below would also match. This lets
+    # ComparatorManager rule out your class without importing it (see
+    # diffoscope/comparators/utils/manifest.py).
+    DEFAULT_RECOGNIZES_IS_NECESSARY = False
+
     @classmethod
     def recognizes(cls, file):
         """Check if a file's type matches the one represented by this class.
@@ -258,16 +316,84 @@ class File(object, metaclass=abc.ABCMeta):
     @property
     def magic_file_type(self):
         if not hasattr(self, '_magic_file_type'):
-            self._magic_file_type = File.guess_file_type(self.path)
+            self._identify()
         return self._magic_file_type
 
     @property
     def file_header(self):
         if not hasattr(self, '_file_header'):
-            with open(self.path, 'rb') as f:
-                self._file_header = f.read(16)
+            self._file_header = self.read_header(16)
         return self._file_header
 
+    def read_header(self, size):
+        """
+        Returns (up to) the first `size` bytes of the file.
+        """
+
+        with open(self.path, 'rb') as f:
+            return f.read(size)
+
+    @property
+    def digest(self):
+        if not hasattr(self, '_digest'):
+            self._hash()
+        return self._digest
+
+    def _identify(self):
+        """
+        Determine the file(1) type of a regular file using the same open()
+        that we read its header from, rather than having libmagic open it
+        again.
+        """
+
+        try:
+            regular = stat.S_ISREG(os.lstat(self.path).st_mode)
+        except OSError:
+            regular = False
+
+        if not regular:
+            self._magic_file_type = File.guess_file_type(self.path)
+            return
+
+        with open(self.path, 'rb') as f:
+            self._magic_file_type = File.guess_file_type(self.path, f.fileno())
+
+            # libmagic leaves the descriptor wherever it finished reading.
+            f.seek(0)
+            self._file_header = f.read(16)
+
+    def _hash(self):
+        """
+        Calculate the SHA256 digest and (if available) the fuzzy hash of the
+        file in a single pass.
+        """
+
+        with open(self.path, 'rb') as f:
+            self._hash_file(f)
+
+    def _hash_file(self, f):
+        size = 0
+        h = hashlib.sha256()
+        fuzzy = tlsh.Tlsh() if tlsh else None
+
+        for buf in iter(lambda: f.read(32768), b''):
+            size += len(buf)
+            h.update(buf)
+            if fuzzy:
+                fuzzy.update(buf)
+
+        self._digest = h.hexdigest()
+
+        # tlsh is not meaningful with files smaller than 512 bytes
+        self._fuzzy_hash = None
+        if fuzzy and size >= 512:
+            fuzzy.final()
+            try:
+                self._fuzzy_hash = fuzzy.hexdigest()
+            except ValueError:
+                # File must contain a certain amount of randomness.
+                pass
+
     @property
     def file_type(self):
         for x, y in (
@@ -285,20 +411,7 @@ class File(object, metaclass=abc.ABCMeta):
         @property
         def fuzzy_hash(self):
             if not hasattr(self, '_fuzzy_hash'):
-                # tlsh is not meaningful with files smaller than 512 bytes
-                if os.stat(self.path).st_size >= 512:
-                    h = tlsh.Tlsh()
-                    with open(self.path, 'rb') as f:
-                        for buf in iter(lambda: f.read(32768), b''):
-                            h.update(buf)
-                    h.final()
-                    try:
-                        self._fuzzy_hash = h.hexdigest()
-                    except ValueError:
-                        # File must contain a certain amount of randomness.
-                        self._fuzzy_hash = None
-                else:
-                    self._fuzzy_hash = None
+                self._hash()
             return self._fuzzy_hash
 
     @abc.abstractmethod
@@ -386,7 +499,12 @@ class File(object, metaclass=abc.ABCMeta):
             # files not readable (e.g. broken symlinks) or something else,
             # just assume they are different
             return False
-        if my_size == other_size and my_size <= SMALL_FILE_THRESHOLD:
+        if my_size != other_size:
+            return False
+        # reuse the digests if we have already read both files
+        if hasattr(self, '_digest') and hasattr(other, '_digest'):
+            return self._digest == other._digest
+        if my_size <= SMALL_FILE_THRESHOLD:
             try:
                 with profile('command', 'cmp (internal)'):
                     with open(self.path, 'rb') as file1, open(
@@ -398,6 +516,14 @@ class File(object, metaclass=abc.ABCMeta):
                 # assume they are different
                 return False
 
+        try:
+            with profile('command', 'cmp (mmap)'):
+                same = cmp_mmap(self.path, other.path)
+        except OSError:
+            return False
+        if same is not None:
+            return same
+
         return self.cmp_external(other)
 
     @tool_required('cmp')
@@ -483,6 +609,47 @@ class File(object, metaclass=abc.ABCMeta):
         return self.compare_bytes(other, source)
 
 
+def cmp_mmap(path1, path2):
+    """
+    Compare the contents of two files a chunk at a time without reading them
+    into memory first. Returns None if this is not possible, eg. if mmap is
+    not available or the files cannot be mapped.
+    """
+
+    if mmap is None:
+        return None
+
+    with open(path1, 'rb') as file1, open(path2, 'rb') as file2:
+        try:
+            map1 = mmap.mmap(file1.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            map2 = mmap.mmap(file2.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            map1.close()
+            return None
+
+        with map1, map2:
+            if len(map1) != len(map2):
+                return False
+
+            for f, m in ((file1, map1), (file2, map2)):
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(
+                        f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL
+                    )
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    m.madvise(mmap.MADV_SEQUENTIAL)
+
+            for x in range(0, len(map1), CMP_CHUNK_SIZE):
+                y = x + CMP_CHUNK_SIZE
+                if map1[x:y] != map2[x:y]:
+                    return False
+
+    return True
+
+
 def maybe_decode(s):
     """
     Helper function to convert to bytes if necessary.
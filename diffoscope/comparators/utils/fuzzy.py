@@ -18,7 +18,7 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import logging
-import operator
+import collections
 
 from diffoscope.config import Config
 
@@ -30,36 +30,173 @@ except ImportError:  # noqa
 logger = logging.getLogger(__name__)
 
 
+def perform_exact_matching(members1, members2):
+    """
+    Pair up members that have merely been renamed by their digests. This is
+    much cheaper than fuzzy matching, and also works for files that are too
+    small to have a fuzzy hash.
+    """
+
+    if Config().fuzzy_threshold == 0:
+        return
+
+    def digest(file):
+        if file.is_directory() or file.is_symlink() or file.is_device():
+            return None
+        try:
+            return file.digest
+        except OSError:
+            return None
+
+    # Create local copies because they will be modified by consumer
+    members1 = dict(members1)
+    members2 = dict(members2)
+
+    names2 = collections.defaultdict(collections.deque)
+    for name2, (file2, _) in members2.items():
+        x = digest(file2)
+        if x is not None:
+            names2[x].append(name2)
+
+    if not names2:
+        return
+
+    for name1, (file1, _) in members1.items():
+        x = digest(file1)
+        if names2.get(x):
+            yield name1, names2[x].popleft(), 0
+
+
 def perform_fuzzy_matching(members1, members2):
     if tlsh is None or Config().fuzzy_threshold == 0:
         return
-    already_compared = set()
+    index = None
     # Create local copies because they will be modified by consumer
     members1 = dict(members1)
     members2 = dict(members2)
     for name1, (file1, _) in members1.items():
         if file1.is_directory() or not file1.fuzzy_hash:
             continue
-        comparisons = []
-        for name2, (file2, _) in members2.items():
-            if (
-                name2 in already_compared
-                or file2.is_directory()
-                or not file2.fuzzy_hash
-            ):
-                continue
-            comparisons.append(
-                (tlsh.diff(file1.fuzzy_hash, file2.fuzzy_hash), name2)
-            )
-        if comparisons:
-            comparisons.sort(key=operator.itemgetter(0))
-            score, name2 = comparisons[0]
-            logger.debug(
-                'fuzzy top match %s %s: %d difference score',
-                name1,
-                name2,
-                score,
+        if index is None:
+            index = FuzzyIndex(
+                (name2, file2.fuzzy_hash)
+                for name2, (file2, _) in members2.items()
+                if not file2.is_directory() and file2.fuzzy_hash
             )
-            if score < Config().fuzzy_threshold:
-                yield name1, name2, score
-                already_compared.add(name2)
+        match = index.nearest(file1.fuzzy_hash, Config().fuzzy_threshold)
+        if match is None:
+            continue
+        score, name2 = match
+        logger.debug(
+            'fuzzy top match %s %s: %d difference score', name1, name2, score
+        )
+        yield name1, name2, score
+        index.remove(name2)
+
+
+class FuzzyIndex(object):
+    """
+    Finds the closest of a number of TLSH hashes to another without
+    calculating the distance to each of them.
+
+    The distance between two hashes is the sum of a distance between their
+    headers (which encode the length of the input and the ratios between its
+    quartiles) and one between their bodies. It is not a metric (ie. it does
+    not satisfy the triangle inequality) so a VP-tree or similar would not
+    find the closest hash. Instead, hashes are grouped by their header so
+    that we only need to consider those whose header is close enough.
+    """
+
+    def __init__(self, hashes):
+        self.groups = collections.defaultdict(
+            lambda: collections.defaultdict(list)
+        )
+        self.removed = set()
+
+        for idx, (name, x) in enumerate(hashes):
+            header = parse_header(x)
+            if header is None:
+                continue
+            length, ratios = header
+            self.groups[length][ratios].append((idx, name, x))
+
+    def remove(self, name):
+        self.removed.add(name)
+
+    def nearest(self, x, threshold):
+        """
+        Returns the (distance, name) of the hash closest to `x` if that is
+        less than `threshold`, or None. Ties are broken in favour of the hash
+        that was added first.
+        """
+
+        header = parse_header(x)
+        if header is None:
+            return None
+        length, ratios = header
+
+        best = None
+        limit = threshold
+
+        for diff in range(128 + 1):
+            lower = length_distance(diff)
+            if lower >= limit:
+                break
+
+            for length2 in {(length + diff) % 256, (length - diff) % 256}:
+                for ratios2, xs in self.groups.get(length2, {}).items():
+                    if lower + ratios_distance(ratios, ratios2) >= limit:
+                        continue
+
+                    for idx, name, y in xs:
+                        if name in self.removed:
+                            continue
+
+                        score = tlsh.diff(x, y)
+                        if score < limit and (
+                            best is None or (score, idx) < best
+                        ):
+                            best = score, idx, name
+                            # Only a closer match, or one that is as close
+                            # but was added earlier, can now beat this one.
+                            limit = score + 1
+
+        if best is None:
+            return None
+
+        return best[0], best[2]
+
+
+def parse_header(x):
+    """
+    Returns the (length, quartile ratios) from the header of a TLSH hash, or
+    None if `x` is not one.
+    """
+
+    if len(x) == 72 and x.startswith('T1'):
+        x = x[2:]
+
+    if len(x) != 70:
+        return None
+
+    try:
+        # The checksum comes first, then the nibble-swapped length.
+        length = int(x[3] + x[2], 16)
+        ratios = int(x[4:6], 16)
+    except ValueError:
+        return None
+
+    return length, (ratios & 0xF, ratios >> 4)
+
+
+def length_distance(diff):
+    return diff if diff <= 1 else diff * 12
+
+
+def ratios_distance(ratios1, ratios2):
+    result = 0
+    for x, y in zip(ratios1, ratios2):
+        diff = abs(x - y)
+        diff = min(diff, 16 - diff)
+        result += diff if diff <= 1 else (diff - 1) * 12
+    return result
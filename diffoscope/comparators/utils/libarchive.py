@@ -22,19 +22,24 @@ import time
 import os.path
 import ctypes
 import logging
+import threading
 import libarchive
 import collections
 
 from diffoscope.exc import ContainerExtractionError
 from diffoscope.config import Config
 from diffoscope.excludes import any_excluded
-from diffoscope.tempfiles import get_temporary_directory
+from diffoscope.profiling import profile
+from diffoscope.tempfiles import (
+    get_temporary_file_path,
+    release_temporary_file,
+)
 
 from ..device import Device
 from ..symlink import Symlink
 from ..directory import Directory
 
-from .archive import Archive, ArchiveMember
+from .archive import Archive, ArchiveMember, DecompressedMember
 
 logger = logging.getLogger(__name__)
 
@@ -122,60 +127,116 @@ def list_libarchive(path, ignore_errors=False):
     try:
         with libarchive.file_reader(path) as archive:
             for entry in archive:
-                name_and_link = entry.name
-                if entry.issym:
-                    name_and_link = '{entry.name} -> {entry.linkname}'.format(
-                        entry=entry
-                    )
-                if Config().exclude_directory_metadata == 'recursive':
-                    yield '{name_and_link}\n'.format(
-                        name_and_link=name_and_link
-                    )
-                    continue
-                if entry.isblk or entry.ischr:
-                    size_or_dev = '{major:>3},{minor:>3}'.format(
-                        major=entry.rdevmajor, minor=entry.rdevminor
-                    )
-                else:
-                    size_or_dev = entry.size
-                mtime = time.strftime(
-                    '%Y-%m-%d %H:%M:%S', time.gmtime(entry.mtime)
-                ) + '.{:06d}'.format(entry.mtime_nsec // 1000)
-                if entry.uname:
-                    user = '{user:<8} {uid:>7}'.format(
-                        user=entry.uname.decode(
-                            'utf-8', errors='surrogateescape'
-                        ),
-                        uid='({})'.format(entry.uid),
-                    )
-                else:
-                    user = entry.uid
-                if entry.gname:
-                    group = '{group:<8} {gid:>7}'.format(
-                        group=entry.gname.decode(
-                            'utf-8', errors='surrogateescape'
-                        ),
-                        gid='({})'.format(entry.gid),
-                    )
-                else:
-                    group = entry.gid
-                yield '{strmode} {entry.nlink:>3} {user:>8} {group:>8} {size_or_dev:>8} {mtime:>8} {name_and_link}\n'.format(
-                    strmode=entry.strmode.decode('us-ascii'),
-                    entry=entry,
-                    user=user,
-                    group=group,
-                    size_or_dev=size_or_dev,
-                    mtime=mtime,
-                    name_and_link=name_and_link,
-                )
+                yield format_entry(entry)
     except libarchive.exception.ArchiveError:
         if not ignore_errors:
             raise
 
 
+def format_entry(entry):
+    name_and_link = entry.name
+    if entry.issym:
+        name_and_link = '{entry.name} -> {entry.linkname}'.format(entry=entry)
+    if Config().exclude_directory_metadata == 'recursive':
+        return '{name_and_link}\n'.format(name_and_link=name_and_link)
+    if entry.isblk or entry.ischr:
+        size_or_dev = '{major:>3},{minor:>3}'.format(
+            major=entry.rdevmajor, minor=entry.rdevminor
+        )
+    else:
+        size_or_dev = entry.size
+    mtime = time.strftime(
+        '%Y-%m-%d %H:%M:%S', time.gmtime(entry.mtime)
+    ) + '.{:06d}'.format(entry.mtime_nsec // 1000)
+    if entry.uname:
+        user = '{user:<8} {uid:>7}'.format(
+            user=entry.uname.decode('utf-8', errors='surrogateescape'),
+            uid='({})'.format(entry.uid),
+        )
+    else:
+        user = entry.uid
+    if entry.gname:
+        group = '{group:<8} {gid:>7}'.format(
+            group=entry.gname.decode('utf-8', errors='surrogateescape'),
+            gid='({})'.format(entry.gid),
+        )
+    else:
+        group = entry.gid
+    return '{strmode} {entry.nlink:>3} {user:>8} {group:>8} {size_or_dev:>8} {mtime:>8} {name_and_link}\n'.format(
+        strmode=entry.strmode.decode('us-ascii'),
+        entry=entry,
+        user=user,
+        group=group,
+        size_or_dev=size_or_dev,
+        mtime=mtime,
+        name_and_link=name_and_link,
+    )
+
+
+def list_members(file, ignore_errors=False):
+    """
+    Like list_libarchive(file.path) but, if `file` is being compared as a
+    LibarchiveContainer, from the index that it has (or will have) read.
+    """
+
+    container = file.as_container
+    if isinstance(container, LibarchiveContainer):
+        return container.list_entries(ignore_errors)
+    return list_libarchive(file.path, ignore_errors)
+
+
+class LibarchiveEntry(object):
+    """
+    What we need to know about an entry in an archive once libarchive has
+    moved on to the next one.
+    """
+
+    ATTRIBUTES = (
+        'name',
+        'pathname',
+        'isdir',
+        'issym',
+        'isblk',
+        'ischr',
+        'size',
+        'mode',
+        'strmode',
+        'nlink',
+        'uid',
+        'gid',
+        'uname',
+        'gname',
+        'mtime',
+        'mtime_nsec',
+        'linkpath',
+        'rdevmajor',
+        'rdevminor',
+    )
+
+    def __init__(self, entry):
+        for x in self.ATTRIBUTES:
+            setattr(self, x, getattr(entry, x))
+        self.linkname = self.linkpath
+
+
 class LibarchiveMember(ArchiveMember):
     def __init__(self, archive, entry):
         super().__init__(archive, entry.pathname)
+        self._size = entry.size
+
+    @property
+    def path(self):
+        # Use the container's extracted copy rather than creating a temporary
+        # directory per-file in ArchiveMember.path.
+        if self._path is None:
+            with profile('container_extract', self.container):
+                self._path = self.container.extract(self._name, None)
+        return self._path
+
+    def cleanup(self):
+        if self._path is not None:
+            self.container.release_member(self._name)
+        super().cleanup()
 
     def is_directory(self):
         return False
@@ -243,37 +304,77 @@ class LibarchiveDevice(Device, LibarchiveMember):
 class LibarchiveContainer(Archive):
     def open_archive(self):
         # libarchive is very very stream oriented an not for random access
-        # so we are going to reopen the archive everytime
-        # not nice, but it'll work
+        # so we index the archive's entries in one pass (see read_index) and
+        # then only extract members as they are needed, in a single forward
+        # pass wherever possible (see extract).
+        self._lock = threading.RLock()
+        self._reader = None
+        self._extract_all = False
+        self._members = {}
+        self._extracted = set()
+        self._references = collections.Counter()
         return True
 
     def close_archive(self):
-        pass
+        self.close_reader()
+
+        # Remove anything that was extracted but never released by its member,
+        # eg. as it was extracted along with others in extract_until().
+        for x in self._members.values():
+            release_temporary_file(x)
 
     def get_member_names(self):
-        self.ensure_unpacked()
-        return self._members.keys()
+        self.read_index()
+        return self._positions.keys()
 
     def get_member(self, member_name):
-        with libarchive.file_reader(self.source.path) as archive:
-            for entry in archive:
-                if entry.pathname == member_name:
-                    return self.get_subclass(entry)
+        self.read_index()
+        try:
+            return self.get_subclass(self._index[member_name])
+        except KeyError:
+            if self._error is not None:
+                raise self._error
         raise KeyError('%s not found in archive', member_name)
 
     def get_filtered_members(self):
-        try:
-            with libarchive.file_reader(self.source.path) as archive:
-                for entry in archive:
-                    if any_excluded(entry.pathname):
-                        continue
-                    yield entry.pathname, self.get_subclass(entry)
-        except libarchive.exception.ArchiveError:
-            pass
+        self.read_index()
+        for entry in self._entries:
+            if any_excluded(entry.pathname):
+                continue
+            yield entry.pathname, self.get_subclass(entry)
+
+    def list_entries(self, ignore_errors=False):
+        # Index the archive now rather than on the first call to next() as
+        # the listings of both sides are read concurrently.
+        self.read_index()
+
+        def fn():
+            for entry in self._entries:
+                yield format_entry(entry)
+            if self._error is not None and not ignore_errors:
+                raise self._error
+
+        return fn()
 
     def extract(self, member_name, dest_dir):
-        self.ensure_unpacked()
-        return self._members[member_name]
+        with self._lock:
+            self.read_index()
+
+            if member_name not in self._members:
+                try:
+                    position = self._positions[member_name]
+                except KeyError:
+                    if self._error is not None:
+                        raise self._error
+                    raise
+                self.extract_until(position)
+
+            self._references[member_name] += 1
+            return self._members[member_name]
+
+    def get_member_size(self, member):
+        # Avoid unpacking the entire archive before comparing anything.
+        return member._size
 
     def get_subclass(self, entry):
         if entry.isdir:
@@ -285,50 +386,151 @@ class LibarchiveContainer(Archive):
 
         return LibarchiveMember(self, entry)
 
-    def ensure_unpacked(self):
-        if hasattr(self, '_members'):
-            return
+    def read_index(self):
+        """
+        Read through the archive (skipping over the contents of its members),
+        recording each entry in order in _entries, by name in _index and,
+        for those that could be extracted, its position in _positions.
+
+        Errors are saved in _error rather than raised so that whatever could
+        be read can still be listed.
+        """
+
+        with self._lock:
+            if hasattr(self, '_entries'):
+                return
+
+            # Let libarchive decompress eg. foo.tar.xz itself rather than
+            # writing out foo.tar first.
+            if (
+                isinstance(self.source, DecompressedMember)
+                and not self.source.is_extracted()
+            ):
+                self._archive_path = self.source.compressed_path
+                self._read_index()
+                if self._error is None:
+                    return
+
+                # Perhaps libarchive was built without support for this
+                # compression format.
+                logger.debug(
+                    "Unable to read %s directly: %s",
+                    self._archive_path,
+                    self._error,
+                )
 
-        tmpdir = get_temporary_directory().name
-        self._members = collections.OrderedDict()
+            self._archive_path = self.source.path
+            self._read_index()
 
-        logger.debug("Extracting %s to %s", self.source.path, tmpdir)
+    def _read_index(self):
+        self._entries = []
+        self._index = {}
+        self._positions = collections.OrderedDict()
+        self._error = None
 
-        with libarchive.file_reader(self.source.path) as archive:
-            for idx, entry in enumerate(archive):
-                # Always skip directories
-                if entry.isdir:
-                    continue
+        try:
+            with libarchive.file_reader(self._archive_path) as archive:
+                for idx, entry in enumerate(archive):
+                    x = LibarchiveEntry(entry)
+                    self._entries.append(x)
+                    self._index.setdefault(x.pathname, x)
+
+                    # Always skip directories and save extracting excluded
+                    # files
+                    if not x.isdir and not any_excluded(x.pathname):
+                        self._positions[x.pathname] = idx
+        except libarchive.exception.ArchiveError as e:
+            self._error = e
+
+    def extract_until(self, position):
+        """
+        Extract the member at `position`, continuing on from where we got to
+        last time if it is further on in the archive, skipping the contents
+        of the members in between.
+
+        Members are typically compared in the order in which they appear in
+        the archive, so this usually reads the archive once, only extracting
+        what is needed. Otherwise, starting again would be quadratic in the
+        worst case, so we extract everything else we come across from then
+        on.
+        """
+
+        if self._reader is not None and self._reader_position > position:
+            self.close_reader()
+            self._extract_all = True
+
+        if self._reader is None:
+            logger.debug("Extracting from %s", self._archive_path)
+            self._reader_context = libarchive.file_reader(self._archive_path)
+            self._reader = enumerate(self._reader_context.__enter__())
+            self._reader_position = 0
 
-                # Save extracting excluded files
-                if any_excluded(entry.pathname):
+        try:
+            for idx, entry in self._reader:
+                self._reader_position = idx + 1
+
+                name = entry.pathname
+                if self._positions.get(name) != idx or name in self._members:
                     continue
 
-                # Keep directory sizes small. could be improved but should be
-                # good enough for "ordinary" large archives.
-                dst = os.path.join(tmpdir, str(idx // 4096), str(idx % 4096))
-                root, ext = os.path.splitext(entry.pathname)
-                dst += ext
-                # Maintain a mapping of archive path to the extracted path,
-                # avoiding the need to sanitise filenames.
-                self._members[entry.pathname] = dst
+                if idx == position or (
+                    self._extract_all and name not in self._extracted
+                ):
+                    self.extract_entry(idx, entry)
 
-                logger.debug("Extracting %s to %s", entry.pathname, dst)
+                if idx == position and not self._extract_all:
+                    return
+        except BaseException:
+            self.close_reader()
+            raise
 
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                try:
-                    with open(dst, 'wb') as f:
-                        for block in entry.get_blocks():
-                            f.write(block)
-                except Exception as e:
-                    raise ContainerExtractionError(entry.pathname, e)
-
-        logger.debug(
-            "Extracted %d entries from %s to %s",
-            len(self._members),
-            self.source.path,
-            tmpdir,
-        )
+        self.close_reader()
+
+    def extract_entry(self, idx, entry):
+        root, ext = os.path.splitext(entry.pathname)
+        dst = get_temporary_file_path(entry.size, suffix=ext)
+
+        logger.debug("Extracting %s to %s", entry.pathname, dst)
+
+        try:
+            with open(dst, 'wb') as f:
+                for block in entry.get_blocks():
+                    f.write(block)
+        except Exception as e:
+            release_temporary_file(dst)
+            raise ContainerExtractionError(entry.pathname, e)
+
+        # Maintain a mapping of archive path to the extracted path, avoiding
+        # the need to sanitise filenames.
+        self._members[entry.pathname] = dst
+        self._extracted.add(entry.pathname)
+
+    def release_member(self, member_name):
+        """
+        Drop a reference to the extracted copy of `member_name`, removing it
+        once no member refers to it. It is extracted again if needed, but
+        only on its own.
+
+        Shared containers (eg. with --against) keep everything until they are
+        closed as the same members are compared again.
+        """
+
+        with self._lock:
+            self._references[member_name] -= 1
+            if self._references[member_name] > 0 or self.shared:
+                return
+            del self._references[member_name]
+            path = self._members.pop(member_name, None)
+
+        if path is not None:
+            release_temporary_file(path)
+
+    def close_reader(self):
+        if self._reader is None:
+            return
+
+        self._reader = None
+        self._reader_context.__exit__(None, None, None)
 
     def comparisons(self, other):
         def hide_trivial_dirs(item):
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Importing every comparator (and their dependencies, many of which are heavy)
+just to find the one or two that recognise the files we were given makes
+startup needlessly slow. Instead, diffoscope/comparators/manifest.py records
+the class attributes that File.recognizes() and File.fallback_recognizes()
+use for each comparator so that they can be ruled out (see Index, below)
+without importing their modules.
+
+To regenerate the manifest after adding or changing a comparator, run:
+
+    $ python3 -m diffoscope.comparators.utils.manifest
+
+ideally with all of diffoscope's optional dependencies installed; any
+comparator that cannot be imported is simply imported at runtime whenever
+it needs to be tried.
+"""
+
+import re
+import os
+import sys
+import logging
+import functools
+import importlib
+import collections
+
+from .file import File
+
+# The attributes that are used by the default recognizes() and
+# fallback_recognizes().
+ATTRIBUTES = (
+    'FILE_EXTENSION_SUFFIX',
+    'FILE_TYPE_RE',
+    'FILE_TYPE_HEADER_PREFIX',
+    'ENABLE_FALLBACK_RECOGONIZES',
+    'FALLBACK_FILE_EXTENSION_SUFFIX',
+    'FALLBACK_FILE_TYPE_HEADER_PREFIX',
+)
+
+logger = logging.getLogger(__name__)
+
+
+def describe(cls):
+    """
+    Returns the DESCRIPTION of `cls` and the non-default values of
+    ATTRIBUTES, or None (instead of the latter) if `cls` must be imported to
+    tell which files it recognises.
+    """
+
+    description = getattr(cls, 'DESCRIPTION', None)
+
+    if not issubclass(cls, File):
+        return description, None
+
+    overridden = not is_default(cls, 'recognizes')
+    if overridden and not cls.DEFAULT_RECOGNIZES_IS_NECESSARY:
+        return description, None
+
+    if not is_default(cls, 'fallback_recognizes'):
+        return description, None
+
+    attrs = {}
+    for x in ATTRIBUTES:
+        val = getattr(cls, x)
+        if val == getattr(File, x):
+            continue
+        if isinstance(val, re.Pattern):
+            val = (val.pattern, int(val.flags & ~re.UNICODE))
+        attrs[x] = val
+
+    # An overridden recognizes() disables the default fallback_recognizes()
+    if overridden:
+        attrs['ENABLE_FALLBACK_RECOGONIZES'] = False
+
+    return description, attrs
+
+
+class Index(object):
+    """
+    Determines which of a number of comparators could recognise a file with
+    a few dictionary lookups and a single regular expression search rather
+    than by calling each of their recognizes() in turn.
+
+    `gates` maps a key to a list of attribute dicts as returned by describe()
+    (any of which may match) or to None if the comparator must be asked
+    itself.
+    """
+
+    def __init__(self, gates):
+        self.gates = {}
+        self.suffixes = collections.defaultdict(dict)
+        self.prefixes = collections.defaultdict(dict)
+        self.needs_suffix = set()
+        self.needs_re = set()
+        self.needs_header = set()
+        self.fallbacks = {}
+
+        patterns = []
+
+        for key, xs in gates.items():
+            if xs is None:
+                self.gates[key] = None
+                continue
+
+            self.gates[key] = []
+            for attrs in xs:
+                gate = len(self.fallbacks)
+                self.gates[key].append(gate)
+                self.fallbacks[gate] = fallback_tests(attrs)
+
+                suffix = attrs.get('FILE_EXTENSION_SUFFIX')
+                if suffix:
+                    self.needs_suffix.add(gate)
+                    self.suffixes[len(suffix)].setdefault(suffix, set()).add(
+                        gate
+                    )
+
+                prefix = attrs.get('FILE_TYPE_HEADER_PREFIX')
+                if prefix:
+                    self.needs_header.add(gate)
+                    self.prefixes[len(prefix)].setdefault(prefix, set()).add(
+                        gate
+                    )
+
+                if attrs.get('FILE_TYPE_RE'):
+                    self.needs_re.add(gate)
+                    patterns.append((gate, attrs['FILE_TYPE_RE']))
+
+        # Each pattern is tried in a lookahead that always succeeds so that
+        # we learn which of them would have been found by .search().
+        self.regex = re.compile(
+            ''.join(
+                '(?:(?=(?s:.*?)(?P<g{}>(?{}:{})))|)'.format(
+                    gate, flags_to_str(flags), pattern
+                )
+                for gate, (pattern, flags) in patterns
+            )
+        )
+
+        # There are far fewer distinct file(1) types than files.
+        self.search = functools.lru_cache(maxsize=1024)(self._search)
+
+        # Skip comparators that could never match, eg. that do not define any
+        # of the attributes used by the default recognizes().
+        def possible(tests):
+            return [
+                k
+                for k, v in sorted(self.gates.items())
+                if v is None or any(tests(x) for x in v)
+            ]
+
+        tested = self.needs_suffix | self.needs_re | self.needs_header
+        self.possible = possible(lambda x: x in tested)
+        self.fallback_possible = possible(lambda x: self.fallbacks[x])
+
+    def _search(self, magic_file_type):
+        m = self.regex.match(magic_file_type)
+
+        return frozenset(
+            int(k[1:]) for k, v in m.groupdict().items() if v is not None
+        )
+
+    def lookup(self, file):
+        return Lookup(self, file)
+
+
+class Lookup(object):
+    """
+    The comparators in an Index that could recognise a particular file. The
+    file's name, header and file(1) type are only used if needed, and in the
+    same order that File.recognizes() would.
+    """
+
+    def __init__(self, index, file):
+        self.index = index
+        self.file = file
+
+    @property
+    def suffix_hits(self):
+        if not hasattr(self, '_suffix_hits'):
+            self._suffix_hits = hits(self.index.suffixes, self.file.name, -1)
+        return self._suffix_hits
+
+    @property
+    def type_re_hits(self):
+        if not hasattr(self, '_type_re_hits'):
+            self._type_re_hits = self.index.search(self.file.magic_file_type)
+        return self._type_re_hits
+
+    @property
+    def header_hits(self):
+        if not hasattr(self, '_header_hits'):
+            self._header_hits = hits(
+                self.index.prefixes, self.file.file_header, 1
+            )
+        return self._header_hits
+
+    def candidates(self, fallback=False):
+        """
+        Yield, in order, the keys of the comparators whose recognizes() (or
+        fallback_recognizes()) could return True for our file.
+        """
+
+        if fallback:
+            keys, passes = self.index.fallback_possible, self.fallback_passes
+        else:
+            keys, passes = self.index.possible, self.passes
+
+        for key in keys:
+            gates = self.index.gates[key]
+            if gates is None or any(passes(x) for x in gates):
+                yield key
+
+    def fallback_passes(self, gate):
+        tests = self.index.fallbacks[gate]
+
+        return tests and all(fn(self, x) for fn, x in tests)
+
+    def passes(self, gate):
+        needs_suffix = gate in self.index.needs_suffix
+        needs_re = gate in self.index.needs_re
+        needs_header = gate in self.index.needs_header
+
+        if needs_suffix and gate not in self.suffix_hits:
+            return False
+
+        if needs_re and gate in self.type_re_hits:
+            return True
+
+        if needs_header and gate in self.header_hits:
+            return True
+
+        # With no tests at all, File.recognizes() returns False.
+        return needs_suffix and not (needs_re or needs_header)
+
+
+def hits(table, val, direction):
+    """
+    Returns the union of the values of `table` (keyed by length, then by
+    prefix or suffix) that are keyed by a prefix (direction == 1) or suffix
+    (direction == -1) of `val`.
+    """
+
+    result = set()
+    for length, xs in table.items():
+        x = val[-length:] if direction < 0 else val[:length]
+        result.update(xs.get(x, ()))
+    return result
+
+
+def fallback_tests(attrs):
+    """
+    Returns the tests that File.fallback_recognizes() would make for a
+    comparator with `attrs`.
+    """
+
+    if not attrs.get('ENABLE_FALLBACK_RECOGONIZES', True):
+        return []
+
+    return [
+        (fn, x)
+        for fn, x in (
+            (
+                lambda self, x: self.file.name.endswith(x),
+                attrs.get('FALLBACK_FILE_EXTENSION_SUFFIX'),
+            ),
+            (
+                lambda self, x: self.file.name.endswith(x),
+                attrs.get('FILE_EXTENSION_SUFFIX'),
+            ),
+            (
+                lambda self, x: self.file.file_header.startswith(x),
+                attrs.get('FALLBACK_FILE_TYPE_HEADER_PREFIX'),
+            ),
+            (
+                lambda self, x: self.file.file_header.startswith(x),
+                attrs.get('FILE_TYPE_HEADER_PREFIX'),
+            ),
+        )
+        if x
+    ]
+
+
+def is_default(cls, name):
+    fn = getattr(cls, name)
+    return getattr(fn, '__func__', fn) is getattr(File, name).__func__
+
+
+def flags_to_str(flags):
+    return ''.join(
+        y
+        for x, y in ((re.I, 'i'), (re.M, 'm'), (re.S, 's'), (re.X, 'x'))
+        if flags & x
+    )
+
+
+def generate(comparators):
+    lines = [
+        "# Generated by diffoscope.comparators.utils.manifest; do not edit.",
+        "",
+        "MANIFEST = {",
+    ]
+
+    for xs in comparators:
+        for x in xs:
+            package, klass_name = x.rsplit('.', 1)
+
+            try:
+                mod = importlib.import_module(
+                    'diffoscope.comparators.{}'.format(package)
+                )
+            except ImportError as e:
+                logger.warning("Omitting %s from manifest: %s", x, e)
+                continue
+
+            description, attrs = describe(getattr(mod, klass_name))
+
+            lines.append("    {!r}: (".format(x))
+            lines.append("        {!r},".format(description))
+            if attrs:
+                lines.append("        {")
+                for k, v in sorted(attrs.items()):
+                    line = "            {!r}: {!r},".format(k, v)
+                    if len(line) > 79 and isinstance(v, tuple):
+                        lines.append("            {!r}: (".format(k))
+                        lines.extend(
+                            "                {!r},".format(y) for y in v
+                        )
+                        lines.append("            ),")
+                    else:
+                        lines.append(line)
+                lines.append("        },")
+            else:
+                lines.append("        {!r},".format(attrs))
+            lines.append("    ),")
+
+    lines.append("}")
+
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    from .. import ComparatorManager
+
+    logging.basicConfig(format='%(levelname)s: %(message)s')
+
+    filename = os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'manifest.py'
+    )
+    with open(filename, 'w') as f:
+        f.write(generate(ComparatorManager.COMPARATORS))
+
+    print("Wrote {}".format(filename), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,9 @@ from .. import ComparatorManager
 
 logger = logging.getLogger(__name__)
 
+# The classes created by try_recognize(), keyed by comparator and base class.
+_SPECIALIZED = {}
+
 
 def try_recognize(file, cls, recognizes):
     if isinstance(file, cls):
@@ -38,18 +41,22 @@ def try_recognize(file, cls, recognizes):
 
     # Found a match; perform type magic
     logger.debug("Using %s for %s", cls.__name__, file.name)
-    new_cls = type(cls.__name__, (cls, type(file)), {})
+    key = (cls, type(file))
+    try:
+        new_cls = _SPECIALIZED[key]
+    except KeyError:
+        new_cls = _SPECIALIZED.setdefault(key, type(cls.__name__, key, {}))
     file.__class__ = new_cls
 
     return True
 
 
 def specialize(file):
-    for cls in ComparatorManager().classes:
+    for cls in ComparatorManager().get_classes(file):
         if try_recognize(file, cls, cls.recognizes):
             return file
 
-    for cls in ComparatorManager().classes:
+    for cls in ComparatorManager().get_classes(file, fallback=True):
         if try_recognize(file, cls, cls.fallback_recognizes):
             logger.debug(
                 "File recognized by fallback. Magic says: %s",
@@ -70,6 +77,7 @@ def is_direct_instance(file, cls):
     # is_direct_instance(<IpkFile>, GzipFile) == False
     if not isinstance(file, cls):
         return False
+    # Comparators that have not been imported cannot have any instances.
     for c in ComparatorManager().classes:
         if c is not cls and isinstance(file, c):
             return False
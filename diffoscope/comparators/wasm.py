@@ -35,6 +35,7 @@ class Wasm2Wat(Command):
 class WasmFile(File):
     DESCRIPTION = "WebAssembly binary module"
     FILE_EXTENSION_SUFFIX = '.wasm'
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
 
     @classmethod
     def recognizes(cls, file):
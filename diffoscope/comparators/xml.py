@@ -74,6 +74,7 @@ class XMLFile(File):
 
     DESCRIPTION = "XML files"
     FILE_EXTENSION_SUFFIX = '.xml'
+    DEFAULT_RECOGNIZES_IS_NECESSARY = True
 
     @classmethod
     def recognizes(cls, file):
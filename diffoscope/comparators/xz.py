@@ -18,39 +18,33 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
+import lzma
 import os.path
 import logging
-import subprocess
 
 from diffoscope.tools import tool_required
 
 from .utils.file import File
-from .utils.archive import Archive
+from .utils.archive import CompressedContainer
 
 logger = logging.getLogger(__name__)
 
 
-class XzContainer(Archive):
-    def open_archive(self):
-        return self
-
-    def close_archive(self):
-        pass
-
+class XzContainer(CompressedContainer):
     def get_member_names(self):
         return [self.get_compressed_content_name('.xz')]
 
     @tool_required('xz')
+    def decompress_cmdline(self):
+        return ["xz", "--decompress", "--stdout", self.source.path]
+
+    def open_decompressed(self):
+        return lzma.open(self.source.path)
+
     def extract(self, member_name, dest_dir):
         dest_path = os.path.join(dest_dir, member_name)
         logger.debug('xz extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["xz", "--decompress", "--stdout", self.source.path],
-                shell=False,
-                stdout=fp,
-                stderr=None,
-            )
+        self.decompress_to(dest_path)
         return dest_path
 
 
@@ -158,6 +158,9 @@ class ZipContainer(Archive):
             return ZipDirectory(self, member_name)
         return ArchiveMember(self, member_name)
 
+    def get_member_size(self, member):
+        return self.archive.getinfo(member.name).file_size
+
 
 class ZipFile(File):
     CONTAINER_CLASS = ZipContainer
@@ -65,6 +65,14 @@ class Config(object):
         self.max_container_depth = 50
         self.use_dbgsym = 'auto'
         self.force_details = False
+        self.jobs = 1
+        self.prune_identical_subtrees = False
+        self.diff_engine = 'auto'
+        self.cache_dir = None
+        self.cache_max_size = 2 ** 30  # 1 GiB
+        self.cache_max_age = 30 * 24 * 60 * 60  # 30 days
+        self.tmpfs_dir = 'auto'
+        self.max_temp_size = 0
 
     def __setattr__(self, k, v):
         super(Config, self).__setattr__(k, v)
@@ -20,8 +20,6 @@
 import re
 import io
 import os
-import errno
-import fcntl
 import hashlib
 import logging
 import threading
@@ -29,13 +27,23 @@ import subprocess
 
 from multiprocessing.dummy import Queue
 
-from diffoscope.tempfiles import get_temporary_directory
-
 from .tools import get_tool_name, tool_required
 from .config import Config
+from .diffseq import TooManyLines, unified_diff
+from .profiling import count, profile
 
 DIFF_CHUNK = 4096
 
+# Feeder output up to this size is kept in memory, and compared with the
+# other side as it is produced; any more and both are streamed into diff(1).
+SPOOL_MAX_SIZE = 2 ** 20  # 1 MiB
+
+# With --diff-engine=auto, inputs up to this size are diffed in-process rather
+# than by forking diff(1), as long as no more than INTERNAL_DIFF_MAX_LINES
+# remain to be compared once any common prefix and suffix are stripped.
+INTERNAL_DIFF_MAX_SIZE = 2 ** 16  # 64 KiB
+INTERNAL_DIFF_MAX_LINES = 1000
+
 logger = logging.getLogger(__name__)
 re_diff_change = re.compile(r'^([+-@]).*', re.MULTILINE)
 
@@ -170,13 +178,17 @@ class DiffParser(object):
 
 
 @tool_required('diff')
-def run_diff(fifo1, fifo2, end_nl_q1, end_nl_q2):
-    cmd = [get_tool_name('diff'), '-aU7', fifo1, fifo2]
+def run_diff(fd1, fd2, end_nl_q1, end_nl_q2):
+    cmd = [get_tool_name('diff'), '-aU7', fd_path(fd1), fd_path(fd2)]
 
     logger.debug("Running %s", ' '.join(cmd))
 
     p = subprocess.run(
-        cmd, bufsize=1, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        cmd,
+        bufsize=1,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        pass_fds=(fd1, fd2),
     )
 
     parser = DiffParser(p.stdout, end_nl_q1, end_nl_q2)
@@ -198,55 +210,117 @@ def run_diff(fifo1, fifo2, end_nl_q1, end_nl_q2):
     return parser.diff
 
 
-class FIFOFeeder(threading.Thread):
-    def __init__(self, feeder, fifo_path, end_nl_q=None, daemon=True, *args):
-        os.mkfifo(fifo_path)
-        super().__init__(daemon=daemon)
-        self.feeder = feeder
-        self.fifo_path = fifo_path
-        self.end_nl_q = Queue() if end_nl_q is None else end_nl_q
-        self._exception = None
-        self._want_join = threading.Event()
+def run_internal_diff(feeder1, feeder2, max_lines=float('inf')):
+    output = unified_diff(
+        feeder1.getvalue(), feeder2.getvalue(), max_lines=max_lines
+    )
+    if not output:
+        return None
 
-    def __enter__(self):
-        self.start()
-        return self
+    parser = DiffParser(output, feeder1.end_nl_q, feeder2.end_nl_q)
+    parser.parse()
 
-    def __exit__(self, exc_type, exc_value, exc_tb):
-        self.join()
+    return parser.diff
 
-    def run(self):
-        try:
-            # Try to open the FIFO nonblocking, so we can periodically check
-            # if the main thread wants us to wind down.  If it does, there's no
-            # more need for the FIFO, so stop the thread.
-            while True:
-                try:
-                    fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
-                except OSError as e:
-                    if e.errno != errno.ENXIO:
-                        raise
-                    elif self._want_join.is_set():
-                        return
-                else:
-                    break
 
-            # Now clear the fd's nonblocking flag to let writes block normally.
-            fcntl.fcntl(fd, fcntl.F_SETFL, 0)
+def fd_path(fd):
+    return '/dev/fd/{}'.format(fd)
 
-            with open(fd, 'wb') as fifo:
-                # The queue works around a unified diff limitation: if there's
-                # no newlines in both don't make it a difference
-                end_nl = self.feeder(fifo)
-                self.end_nl_q.put(end_nl)
-        except Exception as error:
-            self._exception = error
 
-    def join(self):
-        self._want_join.set()
-        super().join()
-        if self._exception is not None:
-            raise self._exception
+class BufferedFeeder(threading.Thread):
+    """
+    Run a feeder, keeping its output in memory until told to write it (and
+    the rest of the output as it is produced) into an anonymous pipe with
+    divert(). The read end of the pipe (`fd`) is intended to be passed to a
+    subprocess as /dev/fd/N.
+
+    The feeder is paused once more than `max_size` bytes are waiting. All
+    changes of state are signalled via `cond`, which is shared with the
+    other side of the comparison.
+    """
+
+    def __init__(self, feeder, cond, max_size, daemon=True):
+        super().__init__(daemon=daemon)
+        self.feeder = feeder
+        self.cond = cond
+        self.max_size = max_size
+        self.buf = bytearray()
+        self.done = False
+        self.fd = None
+        self.end_nl_q = Queue()
+        self.exception = None
+        self._pipe = None
+        self._closed = False
+
+    def run(self):
+        end_nl = False
+        try:
+            end_nl = self.feeder(self)
+        except Exception as error:
+            self.exception = error
+
+        # The queue works around a unified diff limitation: if there's no
+        # newlines in both don't make it a difference
+        self.end_nl_q.put(end_nl)
+
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+            while self._pipe is None and not self._closed:
+                self.cond.wait()
+
+        if self._pipe is not None:
+            try:
+                self._flush()
+            except OSError:
+                # The reader went away early
+                pass
+            self._pipe.close()
+
+    def write(self, buf):
+        with self.cond:
+            while (
+                self._pipe is None
+                and not self._closed
+                and len(self.buf) > self.max_size
+            ):
+                self.cond.wait()
+            if self._closed:
+                raise BrokenPipeError()
+            if self._pipe is None:
+                self.buf += buf
+                self.cond.notify_all()
+                return
+
+        self._flush()
+        self._pipe.write(buf)
+
+    def flush(self):
+        pass
+
+    def _flush(self):
+        if self.buf:
+            self._pipe.write(self.buf)
+            self.buf = bytearray()
+
+    def getvalue(self):
+        return bytes(self.buf)
+
+    def divert(self):
+        self.fd, write_fd = os.pipe()
+        with self.cond:
+            self._pipe = open(write_fd, 'wb')
+            self.cond.notify_all()
+
+    def close(self):
+        # Closing our copy of the read end means that, should the reader
+        # have gone away early, the feeder gets EPIPE rather than blocking.
+        with self.cond:
+            self._closed = True
+            self.cond.notify_all()
+        if self.fd is not None:
+            os.close(self.fd)
+        self.join()
 
 
 class _Feeder:
@@ -320,15 +394,111 @@ def make_feeder_from_raw_reader(in_file, filter=None):
     return feeder
 
 
+def diverged(feeder1, feeder2, offset):
+    """
+    Returns whether the output of the two feeders differs (from `offset`
+    onwards, as what came before is already known to be identical), along
+    with how much of their output has now been compared.
+    """
+
+    buf1, buf2 = feeder1.buf, feeder2.buf
+    end = min(len(buf1), len(buf2))
+    if buf1[offset:end] != buf2[offset:end]:
+        return True, end
+
+    if (feeder1.done and len(buf2) > end) or (
+        feeder2.done and len(buf1) > end
+    ):
+        return True, end
+
+    return False, end
+
+
 def diff(feeder1, feeder2):
-    tmpdir = get_temporary_directory().name
-
-    fifo1_path = os.path.join(tmpdir, 'fifo1')
-    fifo2_path = os.path.join(tmpdir, 'fifo2')
-    with FIFOFeeder(feeder1, fifo1_path) as fifo1, FIFOFeeder(
-        feeder2, fifo2_path
-    ) as fifo2:
-        return run_diff(fifo1_path, fifo2_path, fifo1.end_nl_q, fifo2.end_nl_q)
+    # Most of what we compare is identical, so compare the output of both
+    # feeders as it is produced rather than setting up pipes and forking
+    # diff(1) just to be told so. As soon as they differ, or are too large to
+    # keep in memory, stream them into diff(1) instead. The internal engine
+    # needs both in their entirety regardless.
+    engine = Config().diff_engine
+    max_size = SPOOL_MAX_SIZE
+    if engine == 'internal':
+        max_size = float('inf')
+
+    cond = threading.Condition()
+    feeders = (
+        BufferedFeeder(feeder1, cond, max_size),
+        BufferedFeeder(feeder2, cond, max_size),
+    )
+    for x in feeders:
+        x.start()
+
+    try:
+        with profile('diff', 'comparing input'), cond:
+            offset, is_diverged = 0, False
+            while True:
+                if not is_diverged:
+                    is_diverged, offset = diverged(*feeders, offset)
+                finished = all(x.done for x in feeders)
+                size = max(len(x.buf) for x in feeders)
+
+                # Once they differ, only wait for output that is small enough
+                # to be diffed in-process.
+                limit = max_size
+                if is_diverged and engine == 'auto':
+                    limit = INTERNAL_DIFF_MAX_SIZE
+                elif is_diverged and engine != 'internal':
+                    limit = 0
+
+                if (
+                    finished
+                    or size > limit
+                    or any(x.exception for x in feeders)
+                ):
+                    break
+
+                cond.wait()
+
+        for x in feeders:
+            if x.exception is not None:
+                raise x.exception
+
+        if finished and not is_diverged:
+            count('diff', 'skipped (identical input)')
+            return None
+
+        if finished and (
+            engine == 'internal'
+            or (engine == 'auto' and size <= INTERNAL_DIFF_MAX_SIZE)
+        ):
+            max_lines = INTERNAL_DIFF_MAX_LINES
+            if engine == 'internal':
+                max_lines = float('inf')
+            try:
+                with profile('diff', 'internal'):
+                    return run_internal_diff(*feeders, max_lines)
+            except TooManyLines:
+                pass
+
+        for x in feeders:
+            x.divert()
+
+        with profile('diff', 'diff(1)'):
+            result = run_diff(
+                feeders[0].fd,
+                feeders[1].fd,
+                feeders[0].end_nl_q,
+                feeders[1].end_nl_q,
+            )
+    finally:
+        for x in feeders:
+            x.close()
+
+    for x in feeders:
+        if x.exception is not None:
+            raise x.exception
+
+    return result
 
 
 def diff_split_lines(diff, keepends=True):
@@ -270,7 +270,6 @@ class Difference(object):
                 feeder = feeders.from_command(command)
                 if command_excluded(command.shell_cmdline()):
                     return None, None, True
-                command.start()
             return feeder, command, False
 
         feeder1, command1, excluded1 = command_and_feeder(path1)
@@ -283,9 +282,18 @@ class Difference(object):
             source_cmd = command1 or command2
             kwargs['source'] = source_cmd.shell_cmdline()
 
-        difference = Difference.from_feeder(
-            feeder1, feeder2, path1, path2, *args, **kwargs
-        )
+        # Start both commands before feeding anything to diff so that they
+        # run concurrently; their output is streamed rather than buffered.
+        commands = [x for x in (command1, command2) if x is not None]
+        try:
+            for command in commands:
+                command.start()
+            difference = Difference.from_feeder(
+                feeder1, feeder2, path1, path2, *args, **kwargs
+            )
+        finally:
+            for command in commands:
+                command.terminate()
         if not difference:
             return None, False
 
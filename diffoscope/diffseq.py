@@ -0,0 +1,626 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+In-process replacement for running `diff -aU7`.
+
+This is a port of the relevant parts of GNU diffutils (io.c, analyze.c and
+context.c) and gnulib's diffseq.h so that, for the same input, we produce
+exactly the same hunks as GNU diff would. It is only really suitable for
+small inputs where the cost of forking diff(1) dominates.
+"""
+
+NL = ord('\n')
+
+NO_NEWLINE = b'\\ No newline at end of file\n'
+
+
+class TooManyLines(Exception):
+    pass
+
+
+def unified_diff(buf0, buf1, context=7, max_lines=float('inf')):
+    """
+    Returns the hunks (ie. without the ---/+++ headers) that `diff -aU7`
+    would output when comparing `buf0` and `buf1`, or b'' if they are
+    identical.
+
+    Raises TooManyLines if, after stripping any identical prefix and suffix,
+    more than `max_lines` lines would need to be compared.
+    """
+
+    if buf0 == buf1:
+        return b''
+
+    files = [_File(buf0), _File(buf1)]
+    _find_identical_ends(files, context)
+
+    if sum(len(x.equivs) for x in files) > max_lines:
+        raise TooManyLines()
+
+    _hash_lines(files)
+    _discard_confusing_lines(files)
+    _compareseq(files)
+    _shift_boundaries(files)
+
+    return b''.join(_print_hunks(files, _build_script(files), context))
+
+
+class _File(object):
+    def __init__(self, buf):
+        # Mirror prepare_text(); the buffer always ends in a newline and we
+        # remember whether we had to add one.
+        self.missing_newline = bool(buf) and buf[-1] != NL
+        if self.missing_newline:
+            buf += b'\n'
+        self.buf = buf
+        self.lines = buf.split(b'\n')[:-1]
+        self.prefix_lines = 0
+        self.equivs = []
+        self.changed = []
+
+    def is_incomplete(self, idx):
+        return self.missing_newline and idx == len(self.lines) - 1
+
+
+def _common_prefix_len(a, b):
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_len(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid : len(a) - lo] == b[len(b) - mid : len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _find_identical_ends(files, horizon_lines):
+    b0, b1 = files[0].buf, files[1].buf
+    n0, n1 = len(b0), len(b1)
+
+    p = _common_prefix_len(b0, b1)
+
+    # Don't mistakenly count missing newline as part of prefix.
+    if (n0 - files[0].missing_newline < p) != (
+        n1 - files[1].missing_newline < p
+    ):
+        p -= 1
+
+    # Skip back to last line-beginning in the prefix, and then discard up to
+    # HORIZON_LINES lines from the prefix.
+    i = horizon_lines
+    while p:
+        if b0[p - 1] == NL:
+            if not i:
+                break
+            i -= 1
+        p -= 1
+    prefix_end = p
+
+    suffix_begin0, suffix_begin1 = n0, n1
+    if files[0].missing_newline == files[1].missing_newline:
+        suffix = _common_suffix_len(b0, b1, min(n0, n1) - prefix_end)
+        p0, p1 = n0 - suffix, n1 - suffix
+        beg0 = p0
+
+        # Are we at a line-beginning in both files? If not, add the rest of
+        # this line to the main body. Discard up to HORIZON_LINES lines from
+        # the identical suffix.
+        i = horizon_lines + (
+            not (
+                (p0 == 0 or b0[p0 - 1] == NL)
+                and (p1 == 0 or b1[p1 - 1] == NL)
+            )
+        )
+        while i and p0 != n0:
+            i -= 1
+            p0 = b0.index(b'\n', p0) + 1
+        suffix_begin0, suffix_begin1 = p0, p1 + p0 - beg0
+
+    prefix_lines = b0.count(b'\n', 0, prefix_end)
+    for f, suffix_begin in zip(files, (suffix_begin0, suffix_begin1)):
+        f.prefix_lines = prefix_lines
+        f.equivs = [0] * f.buf.count(b'\n', prefix_end, suffix_begin)
+
+
+def _hash_lines(files):
+    # Equivalence classes start at 1. An incomplete last line can only
+    # compare equal to the other file's incomplete last line.
+    classes = {}
+    for f in files:
+        for i in range(len(f.equivs)):
+            idx = f.prefix_lines + i
+            key = f.lines[idx]
+            if f.is_incomplete(idx):
+                key = (key,)
+            f.equivs[i] = classes.setdefault(key, len(classes) + 1)
+        # Allow for a sentinel at either end
+        f.changed = [0] * (len(f.equivs) + 2)
+
+
+def _discard_confusing_lines(files):
+    equiv_count = []
+    for f in files:
+        counts = {}
+        for x in f.equivs:
+            counts[x] = counts.get(x, 0) + 1
+        equiv_count.append(counts)
+
+    # Mark to be discarded each line that matches no line of the other file.
+    # If a line matches many lines, mark it as provisionally discardable.
+    discarded = []
+    for f, counts in zip(files, reversed(equiv_count)):
+        end = len(f.equivs)
+        discards = [0] * end
+        many = 5
+        tem = end // 64
+        # Multiply MANY by approximate square root of number of lines.
+        tem >>= 2
+        while tem > 0:
+            many *= 2
+            tem >>= 2
+        for i, x in enumerate(f.equivs):
+            nmatch = counts.get(x, 0)
+            if nmatch == 0:
+                discards[i] = 1
+            elif nmatch > many:
+                discards[i] = 2
+        discarded.append(discards)
+
+    # Don't really discard the provisional lines except when they occur in a
+    # run of discardables, with nonprovisionals at the beginning and end.
+    for discards in discarded:
+        end = len(discards)
+        i = 0
+        while i < end:
+            if discards[i] == 2:
+                discards[i] = 0
+            elif discards[i] != 0:
+                provisional = 0
+                j = i
+                while j < end:
+                    if discards[j] == 0:
+                        break
+                    if discards[j] == 2:
+                        provisional += 1
+                    j += 1
+
+                # Cancel provisional discards at end, and shrink the run.
+                while j > i and discards[j - 1] == 2:
+                    j -= 1
+                    discards[j] = 0
+                    provisional -= 1
+
+                length = j - i
+
+                # If 1/4 of the lines in the run are provisional, cancel
+                # discarding of all provisional lines in the run.
+                if provisional * 4 > length:
+                    while j > i:
+                        j -= 1
+                        if discards[j] == 2:
+                            discards[j] = 0
+                else:
+                    # MINIMUM is approximate square root of LENGTH/4.
+                    minimum = 1
+                    tem = length >> 2
+                    tem >>= 2
+                    while tem > 0:
+                        minimum <<= 1
+                        tem >>= 2
+                    minimum += 1
+
+                    # Cancel any subrun of MINIMUM or more provisionals
+                    # within the larger run.
+                    j = consec = 0
+                    while j < length:
+                        if discards[i + j] != 2:
+                            consec = 0
+                        else:
+                            consec += 1
+                            if minimum == consec:
+                                # Back up to start of subrun, to cancel it.
+                                j -= consec
+                            elif minimum < consec:
+                                discards[i + j] = 0
+                        j += 1
+
+                    # Scan from beginning of run until we find 3 or more
+                    # nonprovisionals in a row or until the first
+                    # nonprovisional at least 8 lines in. Until that point,
+                    # cancel any provisionals.
+                    consec = 0
+                    for j in range(length):
+                        if j >= 8 and discards[i + j] == 1:
+                            break
+                        if discards[i + j] == 2:
+                            consec = 0
+                            discards[i + j] = 0
+                        elif discards[i + j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+
+                    # I advances to the last line of the run.
+                    i += length - 1
+
+                    # Same thing, from end.
+                    consec = 0
+                    for j in range(length):
+                        if j >= 8 and discards[i - j] == 1:
+                            break
+                        if discards[i - j] == 2:
+                            consec = 0
+                            discards[i - j] = 0
+                        elif discards[i - j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+            i += 1
+
+    # Actually discard the lines.
+    for f, discards in zip(files, discarded):
+        f.undiscarded = []
+        f.realindexes = []
+        for i, x in enumerate(f.equivs):
+            if discards[i] == 0:
+                f.undiscarded.append(x)
+                f.realindexes.append(i)
+            else:
+                f.changed[i + 1] = 1
+
+
+def _compareseq(files):
+    xv, yv = files[0].undiscarded, files[1].undiscarded
+    xchanged, ychanged = files[0].changed, files[1].changed
+    xreal, yreal = files[0].realindexes, files[1].realindexes
+
+    diags = len(xv) + len(yv) + 3
+    too_expensive = 1
+    while diags:
+        too_expensive <<= 1
+        diags >>= 2
+    too_expensive = max(4096, too_expensive)
+
+    # Diagonals range from -(len(yv) + 1) to len(xv) + 1 inclusive.
+    offset = len(yv) + 1
+    fd = [0] * (len(xv) + len(yv) + 3)
+    bd = [0] * (len(xv) + len(yv) + 3)
+
+    def diag(xoff, xlim, yoff, ylim, find_minimal):
+        dmin = xoff - ylim
+        dmax = xlim - yoff
+        fmid = xoff - yoff
+        bmid = xlim - ylim
+        fmin = fmax = fmid
+        bmin = bmax = bmid
+        odd = (fmid - bmid) & 1
+
+        fd[offset + fmid] = xoff
+        bd[offset + bmid] = xlim
+
+        c = 0
+        while True:
+            c += 1
+
+            # Extend the top-down search by an edit step in each diagonal.
+            if fmin > dmin:
+                fmin -= 1
+                fd[offset + fmin - 1] = -1
+            else:
+                fmin += 1
+            if fmax < dmax:
+                fmax += 1
+                fd[offset + fmax + 1] = -1
+            else:
+                fmax -= 1
+            for d in range(fmax, fmin - 1, -2):
+                tlo = fd[offset + d - 1]
+                thi = fd[offset + d + 1]
+                x = thi if tlo < thi else tlo + 1
+                y = x - d
+                while x < xlim and y < ylim and xv[x] == yv[y]:
+                    x += 1
+                    y += 1
+                fd[offset + d] = x
+                if odd and bmin <= d <= bmax and bd[offset + d] <= x:
+                    return x, y, True, True
+
+            # Similarly extend the bottom-up search.
+            if bmin > dmin:
+                bmin -= 1
+                bd[offset + bmin - 1] = float('inf')
+            else:
+                bmin += 1
+            if bmax < dmax:
+                bmax += 1
+                bd[offset + bmax + 1] = float('inf')
+            else:
+                bmax -= 1
+            for d in range(bmax, bmin - 1, -2):
+                tlo = bd[offset + d - 1]
+                thi = bd[offset + d + 1]
+                x = tlo if tlo < thi else thi - 1
+                y = x - d
+                while xoff < x and yoff < y and xv[x - 1] == yv[y - 1]:
+                    x -= 1
+                    y -= 1
+                bd[offset + d] = x
+                if not odd and fmin <= d <= fmax and x <= fd[offset + d]:
+                    return x, y, True, True
+
+            if find_minimal:
+                continue
+
+            # Heuristic: if we've gone well beyond the call of duty, give up
+            # and report halfway between our best results so far.
+            if c >= too_expensive:
+                # Find forward diagonal that maximizes X + Y.
+                fxybest = -1
+                for d in range(fmax, fmin - 1, -2):
+                    x = min(fd[offset + d], xlim)
+                    y = x - d
+                    if ylim < y:
+                        x = ylim + d
+                        y = ylim
+                    if fxybest < x + y:
+                        fxybest = x + y
+                        fxbest = x
+
+                # Find backward diagonal that minimizes X + Y.
+                bxybest = float('inf')
+                for d in range(bmax, bmin - 1, -2):
+                    x = max(xoff, bd[offset + d])
+                    y = x - d
+                    if y < yoff:
+                        x = yoff + d
+                        y = yoff
+                    if x + y < bxybest:
+                        bxybest = x + y
+                        bxbest = x
+
+                # Use the better of the two diagonals.
+                if (xlim + ylim) - bxybest < fxybest - (xoff + yoff):
+                    return fxbest, fxybest - fxbest, True, False
+                return bxbest, bxybest - bxbest, False, True
+
+    stack = [(0, len(xv), 0, len(yv), False)]
+    while stack:
+        xoff, xlim, yoff, ylim, find_minimal = stack.pop()
+
+        # Slide down the bottom initial diagonal.
+        while xoff < xlim and yoff < ylim and xv[xoff] == yv[yoff]:
+            xoff += 1
+            yoff += 1
+
+        # Slide up the top initial diagonal.
+        while xoff < xlim and yoff < ylim and xv[xlim - 1] == yv[ylim - 1]:
+            xlim -= 1
+            ylim -= 1
+
+        # Handle simple cases.
+        if xoff == xlim:
+            for y in range(yoff, ylim):
+                ychanged[yreal[y] + 1] = 1
+        elif yoff == ylim:
+            for x in range(xoff, xlim):
+                xchanged[xreal[x] + 1] = 1
+        else:
+            # Find a point of correspondence in the middle of the vectors and
+            # use it to split this problem into subproblems.
+            xmid, ymid, lo_minimal, hi_minimal = diag(
+                xoff, xlim, yoff, ylim, find_minimal
+            )
+            stack.append((xmid, xlim, ymid, ylim, hi_minimal))
+            stack.append((xoff, xmid, yoff, ymid, lo_minimal))
+
+
+def _shift_boundaries(files):
+    # Note that `changed` is offset by one so that changed[0] and
+    # changed[len + 1] are sentinels.
+    for f in range(2):
+        changed = files[f].changed
+        other_changed = files[1 - f].changed
+        equivs = files[f].equivs
+        i = j = 0
+        i_end = len(equivs)
+
+        while True:
+            # Scan forwards to find beginning of another run of changes. Also
+            # keep track of the corresponding point in the other file.
+            while i < i_end and not changed[i + 1]:
+                while other_changed[j + 1]:
+                    j += 1
+                j += 1
+                i += 1
+
+            if i == i_end:
+                break
+
+            start = i
+
+            # Find the end of this run of changes.
+            i += 1
+            while changed[i + 1]:
+                i += 1
+            while other_changed[j + 1]:
+                j += 1
+
+            while True:
+                # Record the length of this run of changes, so that we can
+                # later determine whether the run has grown.
+                runlength = i - start
+
+                # Move the changed region back, so long as the previous
+                # unchanged line matches the last changed one. This merges
+                # with previous changed regions.
+                while start and equivs[start - 1] == equivs[i - 1]:
+                    start -= 1
+                    changed[start + 1] = 1
+                    i -= 1
+                    changed[i + 1] = 0
+                    while changed[start]:
+                        start -= 1
+                    j -= 1
+                    while other_changed[j + 1]:
+                        j -= 1
+
+                # Set CORRESPONDING to the end of the changed run, at the
+                # last point where it corresponds to a changed run in the
+                # other file. CORRESPONDING == I_END means no such point has
+                # been found.
+                corresponding = i if other_changed[j] else i_end
+
+                # Move the changed region forward, so long as the first
+                # changed line matches the following unchanged one. This
+                # merges with following changed regions.
+                while i != i_end and equivs[start] == equivs[i]:
+                    changed[start + 1] = 0
+                    start += 1
+                    changed[i + 1] = 1
+                    i += 1
+                    while changed[i + 1]:
+                        i += 1
+                    j += 1
+                    while other_changed[j + 1]:
+                        j += 1
+                        corresponding = i
+
+                if runlength == i - start:
+                    break
+
+            # If possible, move the fully-merged run of changes back to a
+            # corresponding run in the other file.
+            while corresponding < i:
+                start -= 1
+                changed[start + 1] = 1
+                i -= 1
+                changed[i + 1] = 0
+                j -= 1
+                while other_changed[j + 1]:
+                    j -= 1
+
+
+def _build_script(files):
+    changed0, changed1 = files[0].changed, files[1].changed
+    i0, i1 = len(files[0].equivs), len(files[1].equivs)
+    pre = files[0].prefix_lines
+
+    script = []
+    while i0 >= 0 or i1 >= 0:
+        if changed0[i0] or changed1[i1]:
+            line0, line1 = i0, i1
+
+            # Find # lines changed here in each file.
+            while changed0[i0]:
+                i0 -= 1
+            while changed1[i1]:
+                i1 -= 1
+
+            script.append((pre + i0, pre + i1, line0 - i0, line1 - i1))
+
+        # We have reached lines in the two files that match each other.
+        i0 -= 1
+        i1 -= 1
+
+    script.reverse()
+    return script
+
+
+def _number_range(a, b):
+    # We can have B < A in the case of a range of no lines. In this case, we
+    # print the line number before the range, which is B.
+    a, b = a + 1, b + 1
+    if b < a:
+        return b'%d,0' % b
+    if b == a:
+        return b'%d' % b
+    return b'%d,%d' % (a, b - a + 1)
+
+
+def _print_hunks(files, script, context):
+    f0, f1 = files
+
+    def line(prefix, f, idx):
+        if f.is_incomplete(idx):
+            return prefix + f.lines[idx] + b'\n' + NO_NEWLINE
+        return prefix + f.lines[idx] + b'\n'
+
+    start = 0
+    while start < len(script):
+        # Changes less than 2 * CONTEXT + 1 lines apart share a hunk.
+        end = start
+        while end + 1 < len(script):
+            top0 = script[end][0] + script[end][2]
+            if script[end + 1][0] - top0 >= 2 * context + 1:
+                break
+            end += 1
+        hunk = script[start : end + 1]
+        start = end + 1
+
+        first0, first1 = hunk[0][0], hunk[0][1]
+        last0 = hunk[-1][0] + hunk[-1][2] - 1
+        last1 = hunk[-1][1] + hunk[-1][3] - 1
+
+        # Include a context's width before and after.
+        first0 = max(first0 - context, 0)
+        first1 = max(first1 - context, 0)
+        last0 = min(last0 + context, len(f0.lines) - 1)
+        last1 = min(last1 + context, len(f1.lines) - 1)
+
+        yield b'@@ -%s +%s @@\n' % (
+            _number_range(first0, last0),
+            _number_range(first1, last1),
+        )
+
+        i, j = first0, first1
+        changes = iter(hunk)
+        change = next(changes, None)
+        while i <= last0 or j <= last1:
+            if change is None or i < change[0]:
+                yield line(b' ', f0, i)
+                i += 1
+                j += 1
+                continue
+
+            # For each difference, first output the deleted part and then
+            # the inserted part.
+            for _ in range(change[2]):
+                yield line(b'-', f0, i)
+                i += 1
+            for _ in range(change[3]):
+                yield line(b'+', f1, j)
+                j += 1
+
+            change = next(changes, None)
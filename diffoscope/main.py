@@ -49,8 +49,12 @@ from .difference import Difference
 from .comparators import ComparatorManager
 from .external_tools import EXTERNAL_TOOLS
 from .presenters.html import JQUERY_SYSTEM_LOCATIONS
+from .presenters.utils import make_printer
 from .presenters.formats import PresenterManager
-from .comparators.utils.compare import compare_root_paths
+from .comparators.utils.compare import (
+    compare_root_paths,
+    compare_root_paths_against,
+)
 from .readers import load_diff, load_diff_from_path
 
 logger = logging.getLogger(__name__)
@@ -87,6 +91,7 @@ def create_parser():
     )
     parser.add_argument(
         'path1',
+        nargs='?',
         help='First file or directory to compare. Specify "-" to read a '
         'diffoscope diff from stdin.',
     )
@@ -98,6 +103,41 @@ def create_parser():
         'diffoscope diff from path1 and will output this in the formats '
         'specified by the rest of the command line.',
     )
+    parser.add_argument(
+        'paths',
+        metavar='path3',
+        nargs='*',
+        help='Further files or directories to compare path1 against. See '
+        '--against.',
+    )
+    parser.add_argument(
+        '--against',
+        metavar='PATH',
+        action='append',
+        default=[],
+        help='Compare path1 against PATH, which may be specified multiple '
+        'times. path1 is only unpacked and analysed once, a separate report '
+        'is written for each PATH (the outputs are numbered, eg. '
+        'report.1.html) followed by a summary of which of them differ.',
+    )
+    parser.add_argument(
+        '--summary',
+        metavar='OUTPUT_FILE',
+        dest='summary_output',
+        default='-',
+        help='When comparing path1 against several paths, write the summary '
+        'to the given file (use - for stdout, default: %(default)s)',
+    )
+    parser.add_argument(
+        '--serve',
+        metavar='SOCKET',
+        help='Instead of comparing files, listen on the Unix domain socket '
+        'SOCKET for comparison jobs and run them in a pool of --jobs worker '
+        'processes. Each job is a line of JSON such as {"id": 1, "path1": '
+        '"a", "path2": "b", "options": ["--exclude", "*.txt"]}; the result '
+        'is sent back as a line of JSON with the same id, the exit status '
+        'and the difference in --json format.',
+    )
     parser.add_argument(
         '--debug',
         action='store_true',
@@ -388,6 +428,76 @@ def create_parser():
         'useful for debugging diffoscope. Default: %(default)s',
     )
 
+    group3.add_argument(
+        '--jobs',
+        '-j',
+        metavar='N',
+        type=int,
+        help='Compare up to N members of a container in parallel. '
+        'Output is identical to running with a single job. '
+        '(default: %(default)s)',
+        default=Config().jobs,
+    )
+    group3.add_argument(
+        '--prune-identical-subtrees',
+        action='store_true',
+        help='When comparing directories, first hash everything in them '
+        '(and their metadata, unless it is excluded) and skip any files and '
+        'subdirectories that are identical. Much faster for large, mostly '
+        'identical trees; the output is unchanged. (default: %(default)s)',
+        default=Config().prune_identical_subtrees,
+    )
+    group3.add_argument(
+        '--diff-engine',
+        metavar='ENGINE',
+        choices=('auto', 'internal', 'gnu'),
+        help='How to calculate line-based diffs. ENGINE is one of '
+        '{%(choices)s}. "gnu" always runs diff(1), "internal" never does '
+        'and "auto" only runs diff(1) for large inputs. The output is '
+        'identical in all cases. (default: %(default)s)',
+        default=Config().diff_engine,
+    )
+    group3.add_argument(
+        '--cache-dir',
+        metavar='DIR',
+        help='Store the results of comparisons and of running external '
+        'tools in DIR and reuse them when the same input is seen again, even '
+        'in a later run. (default: no caching)',
+        default=Config().cache_dir,
+    )
+    group3.add_argument(
+        '--cache-max-size',
+        metavar='BYTES',
+        type=int,
+        help='Remove the least recently used entries from --cache-dir once '
+        'it grows beyond BYTES. (default: %(default)s)',
+        default=Config().cache_max_size,
+    )
+    group3.add_argument(
+        '--cache-max-age',
+        metavar='DAYS',
+        type=int,
+        help='Remove entries from --cache-dir that have not been used for '
+        'DAYS days. (default: %(default)s)',
+        default=Config().cache_max_age // (24 * 60 * 60),
+    )
+    group3.add_argument(
+        '--tmpfs-dir',
+        metavar='DIR',
+        help='Extract small archive members to DIR, which should be on a '
+        'memory-backed filesystem, rather than to the temporary directory on '
+        'disk. Use "" to disable. (default: /dev/shm if it is a tmpfs)',
+        default=Config().tmpfs_dir,
+    )
+    group3.add_argument(
+        '--max-temp-size',
+        metavar='BYTES',
+        type=int,
+        help='Fail rather than use more than BYTES for extracted archive '
+        'members. (0 to disable, default: %(default)s)',
+        default=Config().max_temp_size,
+    )
+
     group4 = parser.add_argument_group('information commands')
     group4.add_argument(
         '--help', '-h', action='help', help="Show this help and exit"
@@ -447,7 +557,11 @@ def create_parser():
         sys.exit(1)
 
     def post_parse(parsed_args):
-        if parsed_args.path2 is None:
+        if parsed_args.serve is not None:
+            return
+        if parsed_args.path1 is None:
+            parser.error('the following arguments are required: path1')
+        if parsed_args.path2 is None and not parsed_args.against:
             # warn about unusual flags in this mode
             ineffective_flags = [
                 f
@@ -521,7 +635,7 @@ class ListToolsAction(argparse.Action):
     def __call__(self, parser, namespace, os_override, option_string=None):
         # Ensure all comparators are imported so tool_required.all is
         # populated.
-        ComparatorManager().reload()
+        ComparatorManager().load_all()
 
         external_tools = sorted(tool_required.all)
         if self.only_missing:
@@ -562,12 +676,13 @@ class ListDebianSubstvarsAction(argparse._StoreTrueAction):
     def __call__(self, *args, **kwargs):
         # Attempt to import all comparators so tool_required.all is as
         # populated as possible...
-        ComparatorManager().reload()
+        ComparatorManager().load_all()
 
         # ... however for the generated substvar to be effective/deterministic
         # regardless of the currently installed packages we special-case some
         # tools (NB. not package names) as their modules may not have been
-        # imported by the `ComparatorManager().reload()` call above. (#908072)
+        # imported by the `ComparatorManager().load_all()` call above.
+        # (#908072)
         tools = set(
             ('gpg', 'rpm2cpio')  # comparators/debian.py  # comparators/rpm.py
         )
@@ -605,6 +720,50 @@ def run_diffoscope(parsed_args):
         logger.warning(
             'Fuzzy-matching is currently disabled as the "tlsh" module is unavailable.'
         )
+    if parsed_args.serve is not None:
+        from .server import serve
+
+        return serve(parsed_args)
+    configure(parsed_args)
+    path1, path2 = parsed_args.path1, parsed_args.path2
+    if parsed_args.paths or parsed_args.against:
+        paths = [path2] if path2 is not None else []
+        return run_against(
+            parsed_args, path1, paths + parsed_args.paths + parsed_args.against
+        )
+    if path2 is None:
+        logger.debug("Loading diff from stdin")
+        if path1 == '-':
+            difference = load_diff(sys.stdin, "stdin")
+        else:
+            try:
+                difference = load_diff_from_path(path1)
+            except json.JSONDecodeError:
+                traceback.print_exc()
+                print(
+                    "E: Could not parse diff from '{}'. (Are you sure you"
+                    "only meant to specify a single file?)".format(path1),
+                    file=sys.stderr,
+                )
+                return 1
+    else:
+        set_exclude_directory_metadata(path1, path2)
+
+        logger.debug('Starting comparison')
+        with Progress():
+            with profile('main', 'outputs'):
+                difference = compare_root_paths(path1, path2)
+        ProgressManager().finish()
+    # Generate an empty, dummy diff to write, saving the exit code first.
+    has_differences = bool(difference is not None)
+    if difference is None and parsed_args.output_empty:
+        difference = Difference(None, path1, path2)
+    with profile('main', 'outputs'):
+        PresenterManager().output(difference, parsed_args, has_differences)
+    return 1 if has_differences else 0
+
+
+def configure(parsed_args):
     maybe_set_limit(Config(), parsed_args, "max_report_size")
     maybe_set_limit(Config(), parsed_args, "max_text_report_size")
     maybe_set_limit(Config(), parsed_args, "max_diff_block_lines")
@@ -634,6 +793,14 @@ def run_diffoscope(parsed_args):
     Config().max_container_depth = parsed_args.max_container_depth
     Config().use_dbgsym = parsed_args.use_dbgsym
     Config().force_details = parsed_args.force_details
+    Config().jobs = max(1, parsed_args.jobs)
+    Config().prune_identical_subtrees = parsed_args.prune_identical_subtrees
+    Config().diff_engine = parsed_args.diff_engine
+    Config().cache_dir = parsed_args.cache_dir
+    Config().cache_max_size = parsed_args.cache_max_size
+    Config().cache_max_age = parsed_args.cache_max_age * 24 * 60 * 60
+    Config().tmpfs_dir = parsed_args.tmpfs_dir
+    Config().max_temp_size = parsed_args.max_temp_size
     Config().fuzzy_threshold = parsed_args.fuzzy_threshold
     Config().new_file = parsed_args.new_file
     Config().excludes = parsed_args.excludes
@@ -649,42 +816,52 @@ def run_diffoscope(parsed_args):
     )
     set_path()
     set_locale()
-    path1, path2 = parsed_args.path1, parsed_args.path2
-    if path2 is None:
-        logger.debug("Loading diff from stdin")
-        if path1 == '-':
-            difference = load_diff(sys.stdin, "stdin")
-        else:
-            try:
-                difference = load_diff_from_path(path1)
-            except json.JSONDecodeError:
-                traceback.print_exc()
-                print(
-                    "E: Could not parse diff from '{}'. (Are you sure you"
-                    "only meant to specify a single file?)".format(path1),
-                    file=sys.stderr,
-                )
-                return 1
-    else:
-        if Config().exclude_directory_metadata in ('auto', None):
-            # Default to ignoring metadata directory...
-            Config().exclude_directory_metadata = 'yes'
-            if os.path.isdir(path1) and os.path.isdir(path2):
-                # ... except if we passed two directories.
-                Config().exclude_directory_metadata = 'no'
 
-        logger.debug('Starting comparison')
+
+def set_exclude_directory_metadata(*paths):
+    if Config().exclude_directory_metadata in ('auto', None):
+        # Default to ignoring metadata directory...
+        Config().exclude_directory_metadata = 'yes'
+        if all(os.path.isdir(x) for x in paths):
+            # ... except if we only passed directories.
+            Config().exclude_directory_metadata = 'no'
+
+
+def run_against(parsed_args, path1, paths):
+    set_exclude_directory_metadata(path1, *paths)
+
+    logger.debug('Starting comparison against %d paths', len(paths))
+    results = []
+    differences = compare_root_paths_against(path1, paths)
+    for idx, path2 in enumerate(paths, 1):
         with Progress():
             with profile('main', 'outputs'):
-                difference = compare_root_paths(path1, path2)
+                difference = next(differences)
         ProgressManager().finish()
-    # Generate an empty, dummy diff to write, saving the exit code first.
-    has_differences = bool(difference is not None)
-    if difference is None and parsed_args.output_empty:
-        difference = Difference(None, path1, path2)
-    with profile('main', 'outputs'):
-        PresenterManager().output(difference, parsed_args, has_differences)
-    return 1 if has_differences else 0
+
+        has_differences = difference is not None
+        if difference is None and parsed_args.output_empty:
+            difference = Difference(None, path1, path2)
+        with profile('main', 'outputs'):
+            PresenterManager().output(
+                difference, parsed_args, has_differences, idx
+            )
+        results.append((path2, has_differences))
+
+    with make_printer(parsed_args.summary_output) as fn:
+        fn(
+            "{} of {} paths differ from {}".format(
+                sum(x for _, x in results), len(results), path1
+            )
+        )
+        for idx, (path2, has_differences) in enumerate(results, 1):
+            fn(
+                "  {}. {}: {}".format(
+                    idx, path2, "differs" if has_differences else "identical"
+                )
+            )
+
+    return 1 if any(x for _, x in results) else 0
 
 
 def sigterm_handler(signo, stack_frame):
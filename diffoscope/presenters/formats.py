@@ -17,6 +17,7 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import os
 import logging
 
 from ..profiling import profile
@@ -84,11 +85,21 @@ class PresenterManager(object):
             ", ".join(self.config.keys()),
         )
 
-    def output(self, difference, parsed_args, has_differences):
+    def output(self, difference, parsed_args, has_differences, index=None):
+        """
+        If `index` is specified, it is inserted into the name of each output
+        file (eg. report.html becomes report.1.html) so that the reports of
+        several comparisons can be written in the same run.
+        """
+
         if difference is None:
             return
 
         for name, data in self.config.items():
+            if index is not None and data['target'] != '-':
+                root, ext = os.path.splitext(data['target'])
+                data = dict(data, target='{}.{}{}'.format(root, index, ext))
+
             logger.debug("Generating %r output at %r", name, data['target'])
 
             # As a special case for text format, write an empty file instead of
@@ -19,6 +19,7 @@
 
 import sys
 import time
+import threading
 import contextlib
 import collections
 
@@ -34,6 +35,25 @@ def profile(namespace, key):
         ProfileManager().increment(start, namespace, key)
 
 
+def count(namespace, key):
+    """
+    Record that an event happened, eg. that some work could be skipped.
+    """
+
+    if _ENABLED:
+        ProfileManager().increment(time.time(), namespace, key)
+
+
+def maximum(namespace, key, value):
+    """
+    Record the highest value of something, eg. the space used by temporary
+    files.
+    """
+
+    if _ENABLED:
+        ProfileManager().maximum(namespace, key, value)
+
+
 class ProfileManager(object):
     _singleton = {}
 
@@ -46,6 +66,8 @@ class ProfileManager(object):
                     lambda: {'time': 0.0, 'count': 0}
                 )
             )
+            self.maxima = collections.defaultdict(dict)
+            self.lock = threading.Lock()
 
     def setup(self, parsed_args):
         global _ENABLED
@@ -57,8 +79,14 @@ class ProfileManager(object):
                 key.__class__.__module__, key.__class__.__name__
             )
 
-        self.data[namespace][key]['time'] += time.time() - start
-        self.data[namespace][key]['count'] += 1
+        with self.lock:
+            self.data[namespace][key]['time'] += time.time() - start
+            self.data[namespace][key]['count'] += 1
+
+    def maximum(self, namespace, key, value):
+        with self.lock:
+            keys = self.maxima[namespace]
+            keys[key] = max(keys.get(key, value), value)
 
     def finish(self, parsed_args):
         from .presenters.utils import make_printer
@@ -93,3 +121,9 @@ class ProfileManager(object):
                         value,
                     )
                 )
+
+        for namespace, keys in sorted(self.maxima.items()):
+            print_fn("\n## {} (maximum)".format(namespace))
+
+            for name, value in sorted(keys.items()):
+                print_fn("  {:>18d}    {}".format(value, name))
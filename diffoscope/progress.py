@@ -23,6 +23,7 @@ import sys
 import json
 import signal
 import logging
+import threading
 
 from .logging import line_eraser
 
@@ -92,6 +93,11 @@ class ProgressManager(object):
         self.stack.append(progress)
 
     def pop(self, progress):
+        # A comparison that was abandoned before reset() (eg. by an
+        # interrupted test) is only finalised when it is garbage collected.
+        if progress not in self.stack:
+            return
+
         x = self.stack.pop()
         assert x is progress
         if self.stack:
@@ -120,6 +126,9 @@ class ProgressManager(object):
 
 class Progress(object):
     def __init__(self, total=None):
+        # Progress is only tracked for the main thread; comparisons running
+        # in a --jobs worker thread are accounted for by their parent step.
+        self.tracked = threading.current_thread() is threading.main_thread()
         self.done = []
         self.current_steps = None
         self.current_child_steps_done = None
@@ -130,10 +139,13 @@ class Progress(object):
             self.begin_step(1)
 
     def __enter__(self):
-        ProgressManager().push(self)
+        if self.tracked:
+            ProgressManager().push(self)
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
+        if not self.tracked:
+            return
         self.maybe_end()
         ProgressManager().pop(self)
 
@@ -182,7 +194,8 @@ class Progress(object):
             self.done += [(self.current_steps, self.current_child_steps_done)]
             self.current_steps = None
             self.current_child_steps_done = None
-            ProgressManager().update(msg)
+            if self.tracked:
+                ProgressManager().update(msg)
 
     def begin_step(self, step, msg=""):
         assert step is not None
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Run comparison jobs submitted over a Unix domain socket.
+
+Each line sent to the socket is a JSON object describing a job:
+
+    {"id": 1, "path1": "a.deb", "path2": "b.deb", "options": ["--jobs", "2"]}
+
+and, as each job completes, a line of JSON is sent back:
+
+    {"id": 1, "status": 1, "diff": {...}}
+
+where "status" is what the exit code of `diffoscope [options] path1 path2`
+would be and "diff" is the difference in --json format (or null if there are
+no differences). If the job failed, "status" is 2 and "error" describes why.
+
+Jobs are run in a pool of worker processes that are forked once all the
+comparators, libmagic, etc. have been loaded, so each job only pays for the
+comparison itself.
+"""
+
+import io
+import os
+import json
+import stat
+import signal
+import logging
+import threading
+import traceback
+import socketserver
+import multiprocessing
+
+from .tools import tool_check_installed, tool_required
+from .config import Config
+from .tempfiles import clean_all_temp_files
+from .comparators import ComparatorManager
+from .external_tools import REMAPPED_TOOL_NAMES
+from .presenters.json import JSONPresenter
+from .comparators.utils.file import File
+from .comparators.utils.compare import compare_root_paths
+
+logger = logging.getLogger(__name__)
+
+# The parser is created before the workers are forked.
+_PARSER = None
+
+
+def serve(parsed_args):
+    global _PARSER
+
+    from .main import create_parser
+
+    _PARSER, _ = create_parser()
+    warm_up()
+
+    path = parsed_args.serve
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+
+    # Don't let the workers inherit (and then remove) any temporary
+    # directories of ours.
+    clean_all_temp_files()
+
+    pool = multiprocessing.get_context('fork').Pool(
+        processes=max(1, parsed_args.jobs)
+    )
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lock = threading.Lock()
+            results = []
+
+            def send(response):
+                with lock:
+                    try:
+                        self.wfile.write(
+                            json.dumps(response).encode('utf-8') + b'\n'
+                        )
+                        self.wfile.flush()
+                    except OSError:
+                        pass
+
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    job = json.loads(line.decode('utf-8'))
+                    if not isinstance(job, dict):
+                        raise ValueError("Job is not a JSON object")
+                except ValueError as e:
+                    send({'id': None, 'status': 2, 'error': str(e)})
+                    continue
+                results.append(
+                    pool.apply_async(run_job, (job,), callback=send)
+                )
+
+            for x in results:
+                x.wait()
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    def sigterm_handler(signo, stack_frame):
+        raise SystemExit(0)
+
+    # Shut down cleanly (ie. in the finally block below) when terminated.
+    # The workers have already been forked and keep the usual handler.
+    signal.signal(signal.SIGTERM, sigterm_handler)
+
+    logger.info("Listening on %s", path)
+
+    try:
+        with Server(path, Handler) as server:
+            server.serve_forever()
+    finally:
+        pool.terminate()
+        pool.join()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    return 0
+
+
+def warm_up():
+    """
+    Do everything we can once, before forking the workers.
+    """
+
+    ComparatorManager().load_all()
+
+    File.guess_file_type(__file__)
+    File.guess_encoding(__file__)
+
+    for x in getattr(tool_required, 'all', ()):
+        tool_check_installed(x)
+
+
+def run_job(job):
+    from .main import configure, set_exclude_directory_metadata
+
+    response = {'id': job.get('id')}
+    remapped_tool_names = dict(REMAPPED_TOOL_NAMES)
+
+    try:
+        parsed_args = parse_job(job)
+        configure(parsed_args)
+        set_exclude_directory_metadata(parsed_args.path1, parsed_args.path2)
+
+        difference = compare_root_paths(parsed_args.path1, parsed_args.path2)
+
+        response['status'] = 1 if difference is not None else 0
+        response['diff'] = None
+        if difference is not None:
+            output = io.StringIO()
+            JSONPresenter(lambda x: output.write(x)).start(difference)
+            response['diff'] = json.loads(output.getvalue())
+    except Exception as e:
+        logger.debug("Job %r failed", job, exc_info=True)
+        response['status'] = 2
+        response['error'] = ''.join(
+            traceback.format_exception_only(type(e), e)
+        ).strip()
+    except SystemExit:
+        # Invalid options or non-existent paths; the reason has been written
+        # to the stderr of the server.
+        response['status'] = 2
+        response['error'] = "Unable to run job {!r}".format(job.get('id'))
+    finally:
+        Config().reset()
+        REMAPPED_TOOL_NAMES.clear()
+        REMAPPED_TOOL_NAMES.update(remapped_tool_names)
+        clean_all_temp_files()
+
+    return response
+
+
+def parse_job(job):
+    options = job.get('options', [])
+    if not isinstance(options, list) or not all(
+        isinstance(x, str) for x in options
+    ):
+        raise ValueError("options must be a list of strings")
+
+    for x in ('path1', 'path2'):
+        if not isinstance(job.get(x), str):
+            raise ValueError("{} must be a string".format(x))
+
+    return _PARSER.parse_args(options + ['--', job['path1'], job['path2']])
@@ -19,10 +19,30 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import errno
 import logging
 import tempfile
+import threading
 
-_DIRS, _FILES = [], []
+from .config import Config
+from .profiling import maximum
+
+_DIRS, _FILES = [], set()
+_BASE_LOCK = threading.Lock()
+
+# Extracted files that are accounted for by get_temporary_file_path() or
+# track_temporary_file(), mapping their paths to their size and whether they
+# are on tmpfs.
+_SIZES = {}
+_USAGE = {'total': 0, 'tmpfs': 0}
+_TMPFS = {}
+_STORAGE_LOCK = threading.RLock()
+
+# Files up to this size are placed on tmpfs (see Config().tmpfs_dir)...
+TMPFS_MAX_FILE_SIZE = 4 * 2 ** 20  # 4 MiB
+# ... as long as they use no more than this in total, or half of its free
+# space if that is less.
+TMPFS_MAX_SIZE = 256 * 2 ** 20  # 256 MiB
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +51,7 @@ def get_named_temporary_file(*args, **kwargs):
     kwargs['dir'] = kwargs.pop('dir', _get_base_temporary_directory())
 
     f = tempfile.NamedTemporaryFile(*args, **kwargs)
-    _FILES.append(f.name)
+    _FILES.add(f.name)
 
     return f
 
@@ -45,6 +65,126 @@ def get_temporary_directory(*args, **kwargs):
     return d
 
 
+def get_temporary_file_path(size, suffix=''):
+    """
+    Returns the path of a new, empty file in which to store `size` bytes of
+    extracted data. Small files are put on tmpfs where possible, and larger
+    ones on disk.
+
+    The file counts towards --max-temp-size until it is removed with
+    release_temporary_file().
+    """
+
+    with _STORAGE_LOCK:
+        _reserve(size)
+
+        directory = None
+        if size <= TMPFS_MAX_FILE_SIZE:
+            directory = _get_tmpfs_temporary_directory()
+            if _USAGE['tmpfs'] + size > _TMPFS.get('max_size', 0):
+                directory = None
+
+        fd, path = tempfile.mkstemp(
+            suffix=suffix, dir=directory or _get_base_temporary_directory()
+        )
+        os.close(fd)
+
+        _charge(path, size, directory is not None)
+
+    return path
+
+
+def track_temporary_file(path):
+    """
+    Count `path`, a file that has already been extracted elsewhere, towards
+    the space used by temporary files until release_temporary_file().
+
+    Should that exceed --max-temp-size, `path` is deleted and OSError (with
+    ENOSPC) is raised, as if we had run out of space whilst extracting it.
+    """
+
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+
+    with _STORAGE_LOCK:
+        if path in _SIZES:
+            return
+        try:
+            _reserve(size)
+        except OSError:
+            _unlink(path)
+            raise
+        _charge(path, size, False)
+
+
+def release_temporary_file(path):
+    """
+    Delete `path`, a file from get_temporary_file_path(),
+    track_temporary_file() or get_named_temporary_file(delete=False).
+    """
+
+    with _STORAGE_LOCK:
+        _FILES.discard(path)
+        size, tmpfs = _SIZES.pop(path, (0, False))
+        _USAGE['total'] -= size
+        if tmpfs:
+            _USAGE['tmpfs'] -= size
+
+    _unlink(path)
+
+
+def release_temporary_directory(d):
+    """
+    Delete `d`, a directory from get_temporary_directory(), and everything in
+    it. Any files in it from track_temporary_file() should be released first.
+    """
+
+    with _BASE_LOCK:
+        try:
+            _DIRS.remove(d)
+        except ValueError:
+            pass
+
+    _cleanup_directory(d)
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _charge(path, size, tmpfs):
+    _SIZES[path] = (size, tmpfs)
+    _USAGE['total'] += size
+    if tmpfs:
+        _USAGE['tmpfs'] += size
+
+    maximum('temporary files', 'peak usage (bytes)', _USAGE['total'])
+    if tmpfs:
+        maximum(
+            'temporary files', 'peak usage on tmpfs (bytes)', _USAGE['tmpfs']
+        )
+
+
+def _reserve(size):
+    max_size = Config().max_temp_size
+    if not max_size:
+        return
+
+    if _USAGE['total'] + size > max_size:
+        logger.error(
+            "Unable to extract %d more bytes within --max-temp-size (%d "
+            "bytes in use)",
+            size,
+            _USAGE['total'],
+        )
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+
 def clean_all_temp_files():
     logger.debug("Cleaning %d temp files", len(_FILES))
 
@@ -61,32 +201,93 @@ def clean_all_temp_files():
 
     # Reverse so we delete the top-level directory last.
     for x in reversed(_DIRS):
-        try:
-            x.cleanup()
-        except PermissionError:
-            # Recursively reset the permissions of temporary directories prior
-            # to deletion to ensure that non-writable permissions such as 0555
-            # are removed and do not cause a traceback. (#891363)
-            for dirpath, ys, _ in os.walk(x.name):
-                for y in ys:
-                    os.chmod(os.path.join(dirpath, y), 0o777)
-            # try removing it again now
-            x.cleanup()
-        except FileNotFoundError:
-            pass
-        except:
-            logger.exception("Unable to delete %s", x)
+        _cleanup_directory(x)
     _DIRS.clear()
 
+    with _STORAGE_LOCK:
+        _SIZES.clear()
+        _USAGE.update(total=0, tmpfs=0)
+        _TMPFS.clear()
+
+
+def _cleanup_directory(x):
+    try:
+        x.cleanup()
+    except PermissionError:
+        # Recursively reset the permissions of temporary directories prior
+        # to deletion to ensure that non-writable permissions such as 0555
+        # are removed and do not cause a traceback. (#891363)
+        for dirpath, ys, _ in os.walk(x.name):
+            for y in ys:
+                os.chmod(os.path.join(dirpath, y), 0o777)
+        # try removing it again now
+        x.cleanup()
+    except FileNotFoundError:
+        pass
+    except:
+        logger.exception("Unable to delete %s", x)
+
+
+def _get_tmpfs_temporary_directory():
+    """
+    Returns a directory on tmpfs (or None) for small extracted files, setting
+    _TMPFS['max_size'] to how much we may put there.
+    """
+
+    if 'name' in _TMPFS:
+        return _TMPFS['name']
+
+    _TMPFS['name'] = None
+    _TMPFS['max_size'] = 0
+
+    path = Config().tmpfs_dir
+    if path == 'auto':
+        path = '/dev/shm' if is_tmpfs('/dev/shm') else None
+    if not path:
+        return None
+
+    # Ensure the top-level directory is created (and so cleaned up) first.
+    _get_base_temporary_directory()
+
+    try:
+        d = tempfile.TemporaryDirectory(dir=path, prefix='diffoscope_')
+        st = os.statvfs(d.name)
+    except OSError as e:
+        logger.debug("Not using %s for temporary files: %s", path, e)
+        return None
+
+    logger.debug("Created temporary directory on tmpfs: %s", d.name)
+    _DIRS.append(d)
+
+    _TMPFS['name'] = d.name
+    _TMPFS['max_size'] = min(TMPFS_MAX_SIZE, st.f_bavail * st.f_frsize // 2)
+
+    return d.name
+
+
+def is_tmpfs(path):
+    try:
+        with open('/proc/self/mounts') as f:
+            mounts = [x.split() for x in f]
+    except OSError:
+        return False
+
+    return any(
+        x[1] == path and x[2] == 'tmpfs' and os.access(path, os.W_OK)
+        for x in mounts
+        if len(x) > 2
+    )
+
 
 def _get_base_temporary_directory():
-    if not _DIRS:
-        d = tempfile.TemporaryDirectory(
-            dir=tempfile.gettempdir(), prefix='diffoscope_'
-        )
+    with _BASE_LOCK:
+        if not _DIRS:
+            d = tempfile.TemporaryDirectory(
+                dir=tempfile.gettempdir(), prefix='diffoscope_'
+            )
 
-        logger.debug("Created top-level temporary directory: %s", d.name)
+            logger.debug("Created top-level temporary directory: %s", d.name)
 
-        _DIRS.append(d)
+            _DIRS.append(d)
 
     return _DIRS[0].name
@@ -60,6 +60,7 @@ setup(
             'defusedxml',
             'guestfs',
             'jsondiff',
+            'lz4',
             'python-debian',
             'pypdf2',
             'pyxattr',
@@ -17,6 +17,7 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import os
 import os.path
 import pytest
 import subprocess
@@ -55,6 +56,21 @@ def test_not_same_content(binary1, binary2):
     assert binary1.has_same_content_as(binary2) is False
 
 
+def test_same_content_large(monkeypatch, tmpdir):
+    monkeypatch.setattr(
+        File, 'cmp_external', lambda *args: pytest.fail("cmp_external")
+    )
+
+    content = os.urandom(1000000)
+    for x, y in (('a', content), ('b', content), ('c', content[:-1] + b'!')):
+        with open(str(tmpdir.join(x)), 'wb') as f:
+            f.write(y)
+    a, b, c = (FilesystemFile(str(tmpdir.join(x))) for x in 'abc')
+
+    assert a.has_same_content_as(b) is True
+    assert a.has_same_content_as(c) is False
+
+
 def test_guess_file_type():
     assert File.guess_file_type(TEST_FILE1_PATH) == 'data'
 
@@ -26,6 +26,10 @@ from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
 from ..utils.tools import skip_unless_tools_exist
+from ..utils.decompress import (
+    assert_decompress_fallback,
+    assert_decompressed_in_process,
+)
 from ..utils.nonexisting import assert_non_existing
 
 
@@ -75,3 +79,16 @@ def test_content_diff(differences):
 @skip_unless_tools_exist('bzip2')
 def test_compare_non_existing(monkeypatch, bzip1):
     assert_non_existing(monkeypatch, bzip1)
+
+
+def test_decompress_in_process(monkeypatch, bzip1):
+    assert_decompressed_in_process(
+        monkeypatch, bzip1, get_data('text_ascii1').encode('utf-8')
+    )
+
+
+@skip_unless_tools_exist('bzip2')
+def test_decompress_fallback(monkeypatch, bzip1):
+    assert_decompress_fallback(
+        monkeypatch, bzip1, get_data('text_ascii1').encode('utf-8')
+    )
@@ -20,6 +20,10 @@
 import pytest
 
 import itertools
+import threading
+
+from diffoscope.config import Config
+from diffoscope.comparators.utils.container import starmap_jobs
 
 from ..utils.data import load_fixture, get_data
 from ..utils.tools import (
@@ -97,3 +101,18 @@ def test_different(set1, set2):
             ), "{} {}".format(x, y)
             assert differences[1].unified_diff == expected_type_diff(x, y)
             assert differences[2].details[1].unified_diff == expected_diff
+
+
+def test_starmap_jobs_nested(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 3)
+    barrier = threading.Barrier(2, timeout=10)
+
+    def inner(x, y):
+        # Only returns if both members are compared at the same time.
+        barrier.wait()
+        return x + y
+
+    def outer(x):
+        return list(starmap_jobs(inner, ((x, y) for y in 'ab')))
+
+    assert list(starmap_jobs(outer, [('x',)])) == [['xa', 'xb']]
@@ -21,12 +21,24 @@
 import os
 import shutil
 import pytest
+import subprocess
 
+from diffoscope.config import Config
 from diffoscope.comparators.binary import FilesystemFile
-from diffoscope.comparators.directory import compare_directories
+from diffoscope.comparators.directory import (
+    Stat,
+    NATIVE_METADATA,
+    compare_directories,
+    lsattr,
+    native_getfacl,
+    native_lsattr,
+    native_stat,
+)
+from diffoscope.comparators.utils import compare as utils_compare
 from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import data, get_data
+from ..utils.tools import skip_unless_tools_exist
 
 
 TEST_FILE1_PATH = data('text_ascii1')
@@ -114,3 +126,125 @@ def test_compare_to_dangling_symlink(tmpdir):
     b = specialize(FilesystemFile(path))
 
     assert a.compare(b).unified_diff == get_data('test_directory_symlink_diff')
+
+
+def test_scan_each_directory_once(monkeypatch, tmpdir):
+    for x in ('a', 'b'):
+        tmpdir.mkdir(x).mkdir('dir').mkdir('subdir').join('text').write(x)
+
+    scanned = []
+    scandir = os.scandir
+
+    def fake_scandir(path):
+        scanned.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', fake_scandir)
+
+    difference = compare_directories(
+        str(tmpdir.join('a')), str(tmpdir.join('b'))
+    )
+
+    assert difference is not None
+    assert len(scanned) == len(set(scanned)) == 6
+
+
+@skip_unless_tools_exist('stat', 'lsattr')
+@pytest.mark.skipif(not NATIVE_METADATA, reason="requires Linux")
+def test_native_metadata(tmpdir):
+    tmpdir.mkdir('dir')
+    tmpdir.join('empty').write('')
+    tmpdir.join('text').write('text')
+    os.symlink('text', str(tmpdir.join('symlink')))
+
+    for x in ('dir', 'empty', 'text', 'symlink'):
+        path = str(tmpdir.join(x))
+        output = subprocess.check_output(['stat', path])
+        expected = b''.join(
+            Stat(path).filter(y) for y in output.splitlines(True)
+        ).decode('utf-8')
+
+        assert native_stat(path) == expected
+        if x != 'symlink':
+            assert native_lsattr(path) == lsattr(path)
+
+
+
+@skip_unless_tools_exist('getfacl', 'setfacl')
+@pytest.mark.skipif(not NATIVE_METADATA, reason="requires Linux")
+def test_native_getfacl(tmpdir):
+    path = str(tmpdir.mkdir('dir'))
+
+    # Named entries are given out of order, and the mask withholds some of
+    # their permissions so that getfacl(1) adds #effective: comments.
+    subprocess.check_call(
+        [
+            'setfacl',
+            '-n',
+            '-m',
+            'u:54321:rwx,u:0:rw,g:54321:r,g:0:rwx,m::r',
+            path,
+        ]
+    )
+    subprocess.check_call(
+        [
+            'setfacl',
+            '-d',
+            '-m',
+            'u::rwx,u:54321:rx,g::rx,g:0:rwx,m::rx,o::-',
+            path,
+        ]
+    )
+
+    expected = subprocess.check_output(['getfacl', '-p', '-c', path])
+    assert native_getfacl(path) == expected.decode('utf-8')
+
+    # The named user and group entries are sorted by id.
+    entries = [x.split(':')[:2] for x in native_getfacl(path).splitlines()]
+    assert entries.index(['user', 'root']) < entries.index(['user', '54321'])
+    assert entries.index(['group', 'root']) < entries.index(['group', '54321'])
+
+    # Without an ACL, the permission bits are described instead.
+    tmpdir.join('text').write('text')
+    path = str(tmpdir.join('text'))
+    expected = subprocess.check_output(['getfacl', '-p', '-c', path])
+    assert native_getfacl(path) == expected.decode('utf-8')
+
+@pytest.mark.parametrize('exclude_directory_metadata', ('no', 'yes'))
+def test_prune_identical_subtrees(
+    monkeypatch, tmpdir, exclude_directory_metadata
+):
+    for x in ('a', 'b'):
+        tmpdir.mkdir(x).mkdir('same').join('text').write('same')
+        tmpdir.join(x).mkdir('differ').join('text').write(x)
+        for y in ('same', 'same/text', 'differ', 'differ/text', ''):
+            os.utime(str(tmpdir.join(x, y)), (0, 0))
+
+    monkeypatch.setattr(
+        Config(), 'exclude_directory_metadata', exclude_directory_metadata
+    )
+
+    def compare():
+        return compare_directories(
+            str(tmpdir.join('a')), str(tmpdir.join('b'))
+        )
+
+    expected = compare()
+
+    compared = []
+    compare_files = utils_compare.compare_files
+
+    def fake_compare_files(file1, file2, *args, **kwargs):
+        compared.append(file1.name)
+        return compare_files(file1, file2, *args, **kwargs)
+
+    monkeypatch.setattr(utils_compare, 'compare_files', fake_compare_files)
+    monkeypatch.setattr(Config(), 'prune_identical_subtrees', True)
+
+    difference = compare()
+
+    assert difference.unified_diff == expected.unified_diff
+    assert [x.source1 for x in difference.details] == [
+        x.source1 for x in expected.details
+    ]
+    assert [os.path.basename(x) for x in compared] == ['differ', 'text']
@@ -17,11 +17,13 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import io
 import shutil
 import pytest
+import tarfile
 
 from diffoscope.config import Config
-from diffoscope.comparators.gzip import GzipFile
+from diffoscope.comparators.gzip import GzipContainer, GzipFile
 from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.missing_file import MissingFile
 from diffoscope.comparators.utils.specialize import (
@@ -30,7 +32,14 @@ from diffoscope.comparators.utils.specialize import (
 )
 
 from ..utils.data import load_fixture, get_data
-from ..utils.tools import skip_unless_file_version_is_at_least
+from ..utils.decompress import (
+    assert_decompress_fallback,
+    assert_decompressed_in_process,
+)
+from ..utils.tools import (
+    skip_unless_file_version_is_at_least,
+    skip_unless_tools_exist,
+)
 
 
 gzip1 = load_fixture('test1.gz')
@@ -96,3 +105,48 @@ def test_compare_non_existing(monkeypatch, gzip1):
     difference = gzip1.compare(MissingFile('/nonexisting', gzip1))
     assert difference.source2 == '/nonexisting'
     assert difference.details[-1].source2 == '/dev/null'
+
+
+def test_tar_gz_not_decompressed_to_disk(monkeypatch, tmpdir):
+    def extract(self, member_name, dest_dir):
+        raise AssertionError("{} was decompressed".format(member_name))
+
+    monkeypatch.setattr(GzipContainer, 'extract', extract)
+
+    calls = []
+    decompress = GzipContainer.decompress
+    monkeypatch.setattr(
+        GzipContainer,
+        'decompress',
+        lambda self: calls.append(self.source.name) or decompress(self),
+    )
+
+    files = []
+    for x in ('1', '2'):
+        path = str(tmpdir.join('test{}.tar.gz'.format(x)))
+        with tarfile.open(path, 'w:gz') as f:
+            info = tarfile.TarInfo('file')
+            info.size = 2
+            f.addfile(info, io.BytesIO(x.encode('ascii') + b'\n'))
+        files.append(specialize(FilesystemFile(path)))
+
+    tar = files[0].compare(files[1]).details[-1]
+    assert tar.source1 == 'test1.tar'
+    assert tar.details[-1].source1 == 'file'
+    assert tar.details[-1].unified_diff == '@@ -1 +1 @@\n-1\n+2\n'
+
+    # Each was hashed and identified in a single pass.
+    assert sorted(calls) == [x.name for x in files]
+
+
+def test_decompress_in_process(monkeypatch, gzip1):
+    assert_decompressed_in_process(
+        monkeypatch, gzip1, get_data('text_ascii1').encode('utf-8')
+    )
+
+
+@skip_unless_tools_exist('gzip')
+def test_decompress_fallback(monkeypatch, gzip1):
+    assert_decompress_fallback(
+        monkeypatch, gzip1, get_data('text_ascii1').encode('utf-8')
+    )
@@ -25,7 +25,11 @@ from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
-from ..utils.tools import skip_unless_tools_exist
+from ..utils.tools import skip_unless_tools_exist, skip_unless_module_exists
+from ..utils.decompress import (
+    assert_decompress_fallback,
+    assert_decompressed_in_process,
+)
 from ..utils.nonexisting import assert_non_existing
 
 lz41 = load_fixture('test1.lz4')
@@ -74,3 +78,18 @@ def test_content_diff(differences):
 @skip_unless_tools_exist('lz4')
 def test_compare_non_existing(monkeypatch, lz41):
     assert_non_existing(monkeypatch, lz41)
+
+
+@skip_unless_module_exists('lz4.frame')
+def test_decompress_in_process(monkeypatch, lz41):
+    assert_decompressed_in_process(
+        monkeypatch, lz41, get_data('text_ascii1').encode('utf-8')
+    )
+
+
+@skip_unless_module_exists('lz4.frame')
+@skip_unless_tools_exist('lz4')
+def test_decompress_fallback(monkeypatch, lz41):
+    assert_decompress_fallback(
+        monkeypatch, lz41, get_data('text_ascii1').encode('utf-8')
+    )
@@ -17,11 +17,19 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import gc
+import io
+import os
 import pytest
+import tarfile
+import libarchive
 
+from diffoscope import tempfiles
 from diffoscope.config import Config
 from diffoscope.comparators.tar import TarFile
+from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.missing_file import MissingFile
+from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
 from ..utils.nonexisting import assert_non_existing
@@ -80,3 +88,92 @@ def test_no_permissions_dir_in_tarball(monkeypatch, no_permissions_tar):
     # Comparing with non-existing file makes it easy to make sure all files are unpacked
     monkeypatch.setattr(Config(), 'new_file', True)
     no_permissions_tar.compare(MissingFile('/nonexistent', no_permissions_tar))
+
+
+def test_member_sizes_without_extracting(tar1):
+    container = tar1.as_container
+    sizes = {
+        name: size
+        for name, (_, size) in container.get_adjusted_members_sizes()
+    }
+
+    assert sizes['dir/text'] == 446
+    assert not container._members
+
+
+def test_read_archive_once(monkeypatch, tar1, tar2):
+    opened = []
+    file_reader = libarchive.file_reader
+
+    def fake_file_reader(path, *args, **kwargs):
+        opened.append(path)
+        return file_reader(path, *args, **kwargs)
+
+    monkeypatch.setattr(libarchive, 'file_reader', fake_file_reader)
+
+    tar1.compare(tar2)
+
+    # Once to list and index each archive and once to extract it.
+    assert sorted(opened) == sorted([tar1.path, tar2.path] * 2)
+
+
+def test_extract_lazily(tmpdir):
+    path = str(tmpdir.join('test.tar'))
+    with tarfile.open(path, 'w') as f:
+        for x in 'abcd':
+            info = tarfile.TarInfo(x)
+            info.size = 2
+            f.addfile(info, io.BytesIO(x.encode('ascii') + b'\n'))
+
+    container = specialize(FilesystemFile(path)).as_container
+
+    def extract(name):
+        with open(container.extract(name, None), 'rb') as f:
+            assert f.read() == name.encode('ascii') + b'\n'
+        return sorted(container._members)
+
+    # Only what is needed, continuing on from where we got to...
+    assert extract('b') == ['b']
+    assert extract('c') == ['b', 'c']
+    # ... until we need to go back.
+    assert extract('a') == ['a', 'b', 'c', 'd']
+
+
+def test_release_members_once_compared(tar1, tar2):
+    extracted = set(tempfiles._SIZES)
+    tar1.compare(tar2)
+
+    # Nothing that was extracted should remain.
+    for x in (tar1, tar2):
+        assert not x.as_container._members
+    assert set(tempfiles._SIZES) == extracted
+
+
+def test_release_member_shared_by_name(tar1):
+    container = tar1.as_container
+    first = container.get_member('dir/text')
+    second = container.get_member('dir/text')
+    path = first.path
+    assert second.path == path
+
+    # Another member of the same name is still using the extracted copy.
+    del first
+    gc.collect()
+    with open(second.path, 'rb') as f:
+        assert f.read()
+
+    second.release()
+    assert not os.path.exists(path)
+
+
+def test_keep_members_of_shared_container(tar1):
+    container = tar1.as_container
+    container.shared = True
+    member = container.get_member('dir/text')
+    path = member.path
+
+    # eg. comparing the same file again with --against.
+    member.release()
+    del member
+    gc.collect()
+    assert os.path.exists(path)
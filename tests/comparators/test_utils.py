@@ -17,14 +17,27 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import io
 import codecs
 import os
 import pytest
+import random
+import tarfile
+import hashlib
+import importlib
 import threading
 
 from diffoscope.config import Config
 from diffoscope.difference import Difference
+from diffoscope.comparators import ComparatorManager
+from diffoscope.comparators.text import TextFile
+from diffoscope.comparators.binary import FilesystemFile
+from diffoscope.comparators.manifest import MANIFEST
+from diffoscope.comparators.utils.file import File
+from diffoscope.comparators.utils.fuzzy import perform_fuzzy_matching
 from diffoscope.comparators.utils.command import Command
+from diffoscope.comparators.utils.manifest import describe
+from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import data, load_fixture
 from ..utils.tools import (
@@ -87,6 +100,70 @@ def test_fuzzy_matching_only_once(fuzzy_tar1, fuzzy_tar3):
     assert len(differences) == 2
 
 
+def test_exact_matching(tmpdir):
+    def tar(name, members):
+        path = str(tmpdir.join(name))
+        with tarfile.open(path, 'w') as f:
+            for x, content in members:
+                info = tarfile.TarInfo(x)
+                info.size = len(content)
+                f.addfile(info, io.BytesIO(content))
+        return specialize(FilesystemFile(path))
+
+    tar1 = tar('1.tar', [('a', b'small\n'), ('b', b'one\n')])
+    tar2 = tar('2.tar', [('b', b'two\n'), ('c', b'small\n')])
+
+    details = tar1.compare(tar2).details
+    assert [(x.source1, x.source2) for x in details] == [
+        ('file list', 'file list'),
+        ('b', 'b'),
+        ('a', 'c'),
+    ]
+    assert details[2].comment == "Files identical despite different names"
+
+
+@skip_unless_module_exists('tlsh')
+def test_fuzzy_matching_index():
+    import tlsh
+
+    class Member(object):
+        def __init__(self, content):
+            self.fuzzy_hash = tlsh.hash(content)
+
+        def is_directory(self):
+            return False
+
+    def brute_force(members1, members2):
+        matched = set()
+        for name1, (file1, _) in members1.items():
+            scores = sorted(
+                (tlsh.diff(file1.fuzzy_hash, file2.fuzzy_hash), idx, name2)
+                for idx, (name2, (file2, _)) in enumerate(members2.items())
+                if name2 not in matched
+            )
+            if scores and scores[0][0] < Config().fuzzy_threshold:
+                matched.add(scores[0][2])
+                yield name1, scores[0][2], scores[0][0]
+
+    rng = random.Random(0)
+    base = bytes(rng.randrange(256) for _ in range(4096))
+
+    def members(prefix):
+        result = {}
+        for x in range(200):
+            content = bytearray(base[: rng.randrange(1024, 4096)])
+            for _ in range(rng.randrange(200)):
+                content[rng.randrange(len(content))] = rng.randrange(64)
+            result['{}{}'.format(prefix, x)] = (Member(bytes(content)), 0)
+        return result
+
+    members1, members2 = members('a'), members('b')
+    expected = list(brute_force(members1, members2))
+
+    assert expected
+    assert list(perform_fuzzy_matching(members1, members2)) == expected
+
+
 fuzzy_tar_in_tar1 = load_fixture('fuzzy-tar-in-tar1.tar')
 fuzzy_tar_in_tar2 = load_fixture('fuzzy-tar-in-tar2.tar')
 
@@ -131,3 +208,126 @@ def test_trim_stderr_in_command():
 
     difference = Difference.from_command(FillStderr, 'dummy1', 'dummy2')
     assert '[ 1 lines ignored ]' in difference.comment
+
+
+@skip_unless_tools_exist('sh', 'seq')
+def test_stream_large_stdout_and_stderr_in_command():
+    class FillBoth(Command):
+        def cmdline(self):
+            # Both streams exceed the pipe buffer size, so this would block if
+            # stderr were not drained whilst stdout is being streamed.
+            return [
+                'sh',
+                '-c',
+                'seq 100000 >&2; seq 100000; echo {}'.format(self.path),
+            ]
+
+    difference = Difference.from_command(FillBoth, 'dummy1', 'dummy2')
+    assert '-dummy1' in difference.unified_diff
+    assert '+dummy2' in difference.unified_diff
+    assert '[ {} lines ignored ]'.format(
+        100000 - Command.MAX_STDERR_LINES
+    ) in difference.comment
+
+
+@skip_unless_tools_exist('sh')
+def test_cache_command_output(monkeypatch, tmpdir):
+    class EchoPathAndCat(Command):
+        def cmdline(self):
+            return ['sh', '-c', 'echo "$0"; cat "$0"', self.path]
+
+    def compare(dirname):
+        os.makedirs(str(tmpdir.join(dirname)))
+        paths = []
+        for x in ('a', 'b'):
+            path = str(tmpdir.join(dirname, x))
+            with open(path, 'w') as f:
+                f.write('{}\n'.format(x))
+            paths.append(path)
+        return Difference.from_command(EchoPathAndCat, *paths).unified_diff
+
+    monkeypatch.setattr(Config(), 'cache_dir', str(tmpdir.join('cache')))
+    expected = compare('first')
+
+    monkeypatch.setattr(
+        'subprocess.Popen', lambda *args, **kwargs: pytest.fail("Popen")
+    )
+    assert compare('second') == expected.replace('first', 'second')
+
+
+def test_comparator_manifest():
+    for x, val in MANIFEST.items():
+        package, klass_name = x.rsplit('.', 1)
+        try:
+            mod = importlib.import_module(
+                'diffoscope.comparators.{}'.format(package)
+            )
+        except ImportError:
+            continue
+        assert describe(getattr(mod, klass_name)) == val, (
+            "{} does not match manifest; regenerate it with `python3 -m "
+            "diffoscope.comparators.utils.manifest`".format(x)
+        )
+
+
+def test_lazy_comparators():
+    file = specialize(FilesystemFile(data('text_ascii1')))
+
+    assert isinstance(file, TextFile)
+    loaded = {x.__name__ for x in ComparatorManager().classes}
+    assert 'TextFile' in loaded
+    assert not loaded & {'ElfFile', 'PdfFile', 'ZipFile', 'GzipFile'}
+
+
+def test_specialize_index():
+    manager = ComparatorManager()
+    manager.load_all()
+
+    def expected(path):
+        file = FilesystemFile(path)
+        for name in ('recognizes', 'fallback_recognizes'):
+            for cls in manager.classes:
+                if getattr(cls, name)(file):
+                    return cls
+
+    for x in sorted(os.listdir(data(''))):
+        if os.path.isdir(data(x)):
+            continue
+        file = specialize(FilesystemFile(data(x)))
+        cls = expected(data(x))
+        if cls is None:
+            assert type(file) is FilesystemFile, x
+        else:
+            assert type(file).__bases__ == (cls, FilesystemFile), x
+
+    # Specialised classes are shared between files.
+    assert type(specialize(FilesystemFile(data('text_ascii1')))) is type(
+        specialize(FilesystemFile(data('text_ascii2')))
+    )
+
+
+def test_probe(monkeypatch):
+    opened = []
+    real_open = open
+
+    def fake_open(path, *args, **kwargs):
+        opened.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr('builtins.open', fake_open)
+
+    for x in ('text_ascii1', 'test1.gz', 'test1.mozzip'):
+        file = FilesystemFile(data(x))
+        with real_open(data(x), 'rb') as f:
+            content = f.read()
+
+        # Identifying the file only opens it once...
+        assert file.magic_file_type == File.guess_file_type(data(x))
+        assert file.file_header == content[:16]
+        assert opened == [data(x)], x
+
+        # ... as does hashing it.
+        assert file.digest == hashlib.sha256(content).hexdigest()
+        getattr(file, 'fuzzy_hash', None)
+        assert opened == [data(x)] * 2, x
+        opened.clear()
@@ -26,6 +26,10 @@ from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
 from ..utils.tools import skip_unless_tools_exist
+from ..utils.decompress import (
+    assert_decompress_fallback,
+    assert_decompressed_in_process,
+)
 from ..utils.nonexisting import assert_non_existing
 
 xz1 = load_fixture('test1.xz')
@@ -74,3 +78,16 @@ def test_content_diff(differences):
 @skip_unless_tools_exist('xz')
 def test_compare_non_existing(monkeypatch, xz1):
     assert_non_existing(monkeypatch, xz1)
+
+
+def test_decompress_in_process(monkeypatch, xz1):
+    assert_decompressed_in_process(
+        monkeypatch, xz1, get_data('text_ascii1').encode('utf-8')
+    )
+
+
+@skip_unless_tools_exist('xz')
+def test_decompress_fallback(monkeypatch, xz1):
+    assert_decompress_fallback(
+        monkeypatch, xz1, get_data('text_ascii1').encode('utf-8')
+    )
@@ -133,3 +133,17 @@ def comment_differences(test_comment1, test_comment2):
 def test_commented(comment_differences):
     expected_diff = get_data('comment_zipinfo_expected_diff')
     assert comment_differences[1].unified_diff == expected_diff
+
+
+def test_member_sizes_without_extracting(monkeypatch, zip1):
+    monkeypatch.setattr(
+        zip1.as_container,
+        'extract',
+        lambda *args: pytest.fail("Member was extracted"),
+    )
+    sizes = {
+        name: size
+        for name, (_, size) in zip1.as_container.get_adjusted_members_sizes()
+    }
+
+    assert sizes['dir/text'] == 446
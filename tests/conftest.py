@@ -30,6 +30,10 @@ def pytest_configure(config):
     # Ensure set_path fixture runs before all tests.
     set_path()
 
+    config.addinivalue_line(
+        'markers', "slow: benchmarks; deselect with -m 'not slow'"
+    )
+
 
 @pytest.fixture(autouse=True, scope='session')
 def locale():
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import zlib
+import pytest
+
+from diffoscope.main import main
+from diffoscope.cache import DiskCache, MemoryCache, comparison_key
+from diffoscope.config import Config
+from diffoscope.profiling import ProfileManager
+from diffoscope.comparators.binary import FilesystemFile
+from diffoscope.comparators.utils.specialize import specialize
+
+TEST_TAR1_PATH = os.path.join(os.path.dirname(__file__), 'data/test1.tar')
+TEST_TAR2_PATH = os.path.join(os.path.dirname(__file__), 'data/test2.tar')
+
+
+def run(capsys, *args):
+    with pytest.raises(SystemExit) as exc:
+        main(args)
+
+    out, err = capsys.readouterr()
+
+    return exc.value.code, out, err
+
+
+def test_comparison_cache(capsys, tmpdir, monkeypatch):
+    monkeypatch.setattr('diffoscope.profiling._ENABLED', True)
+    data = ProfileManager().data['cache']
+    hit, miss = data['comparison hit'], data['comparison miss']
+    args = (
+        '--cache-dir',
+        str(tmpdir),
+        '--profile',
+        os.devnull,
+        TEST_TAR1_PATH,
+        TEST_TAR2_PATH,
+    )
+
+    hits, misses = hit['count'], miss['count']
+    ret, out, _ = run(capsys, *args)
+    assert ret == 1
+    assert hit['count'] == hits
+    assert miss['count'] > misses
+
+    monkeypatch.setattr(
+        'diffoscope.comparators.tar.TarFile.compare',
+        lambda *args: pytest.fail("comparison was not cached"),
+    )
+    hits, misses = hit['count'], miss['count']
+    assert run(capsys, *args) == (ret, out, '')
+    assert hit['count'] == hits + 1
+    assert miss['count'] == misses
+
+
+def test_comparison_key_config(tmpdir, monkeypatch):
+    monkeypatch.setattr(Config(), 'cache_dir', str(tmpdir))
+    files = [
+        specialize(FilesystemFile(x)) for x in (TEST_TAR1_PATH, TEST_TAR2_PATH)
+    ]
+    key = comparison_key(*files)
+
+    # Options that do not change the result of a comparison...
+    monkeypatch.setattr(Config(), 'jobs', 4)
+    monkeypatch.setattr(Config(), 'max_report_size', 2 ** 10)
+    monkeypatch.setattr(Config(), 'max_temp_size', 2 ** 20)
+    assert comparison_key(*files) == key
+
+    # ... and those that do.
+    monkeypatch.setattr(Config(), 'fuzzy_threshold', 0)
+    assert comparison_key(*files) != key
+
+
+def test_cache_eviction(tmpdir):
+    size = len(zlib.compress(b'x' * 10))
+    cache = DiskCache(str(tmpdir), size * 3, 60)
+    now = time.time()
+
+    for x in range(3):
+        cache.set('{:02d}'.format(x) * 16, b'x' * 10)
+        os.utime(cache._path('{:02d}'.format(x) * 16), (now - 30 + x,) * 2)
+
+    # Using an entry makes it the most recently used one.
+    assert cache.get('00' * 16) == b'x' * 10
+    cache.set('03' * 16, b'x' * 10)
+
+    assert cache.get('00' * 16) == b'x' * 10
+    for x in ('01', '02'):
+        with pytest.raises(KeyError):
+            cache.get(x * 16)
+    assert cache.get('03' * 16) == b'x' * 10
+
+
+def test_cache_expiry(tmpdir):
+    cache = DiskCache(str(tmpdir), 2 ** 20, 60)
+    cache.set('00' * 16, b'x')
+    os.utime(cache._path('00' * 16), (time.time() - 61,) * 2)
+
+    with pytest.raises(KeyError):
+        cache.get('00' * 16)
+
+
+def test_memory_cache_size():
+    size = len(zlib.compress(b'x' * 10))
+    cache = MemoryCache(size * 2)
+
+    for x in range(3):
+        cache.set('{:02d}'.format(x) * 16, b'x' * 10)
+
+    # Once full, new entries are not stored rather than evicting others.
+    for x in ('00', '01'):
+        assert cache.get(x * 16) == b'x' * 10
+    with pytest.raises(KeyError):
+        cache.get('02' * 16)
@@ -18,12 +18,23 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import io
+import time
+import logging
 import itertools
+import threading
 import pytest
 
+import diffoscope.diff
+
+from diffoscope import tempfiles
 from diffoscope.config import Config
+from diffoscope.profiling import ProfileManager
 from diffoscope.difference import Difference
 
+from .utils.tools import skip_unless_tools_exist
+
+logger = logging.getLogger(__name__)
+
 
 def assert_size(diff, size):
     assert size == diff.size()
@@ -131,3 +142,144 @@ def test_non_str_arguments_to_source1_source2():
 
         with pytest.raises(TypeError):
             Difference.from_text_readers(a, b, *x)
+
+
+def test_identical_input_skips_diff(monkeypatch):
+    monkeypatch.setattr('diffoscope.profiling._ENABLED', True)
+    monkeypatch.setattr(
+        'diffoscope.diff.run_diff', lambda *args: pytest.fail("diff was run")
+    )
+    data = ProfileManager().data['diff']['skipped (identical input)']
+    before = data['count']
+
+    assert Difference.from_text('a\nb\n', 'a\nb\n', 'a', 'b') is None
+    assert data['count'] == before + 1
+
+
+def test_large_input_is_streamed(monkeypatch):
+    monkeypatch.setattr('diffoscope.diff.SPOOL_MAX_SIZE', 16)
+    difference = Difference.from_text('a\n' * 100, 'b\n' * 100, 'a', 'b')
+    assert difference.unified_diff.count('+b\n') == 100
+
+
+@skip_unless_tools_exist('diff')
+def test_large_identical_input_is_streamed(monkeypatch):
+    calls = []
+
+    def run_diff(*args):
+        calls.append(args)
+        return original(*args)
+
+    original = diffoscope.diff.run_diff
+    monkeypatch.setattr('diffoscope.diff.run_diff', run_diff)
+    monkeypatch.setattr('diffoscope.diff.SPOOL_MAX_SIZE', 16)
+
+    content = io.StringIO('a\n' * 100), io.StringIO('a\n' * 100)
+    assert Difference.from_text_readers(*content, 'a', 'b') is None
+    assert len(calls) == 1
+
+
+@skip_unless_tools_exist('diff')
+def test_diverging_input_is_streamed(monkeypatch):
+    monkeypatch.setattr(Config(), 'diff_engine', 'gnu')
+    started = threading.Event()
+
+    def run_diff(*args):
+        started.set()
+        return original(*args)
+
+    original = diffoscope.diff.run_diff
+    monkeypatch.setattr('diffoscope.diff.run_diff', run_diff)
+
+    def feeder(x):
+        def fn(out_file):
+            out_file.write(x)
+            # diff(1) should not wait for the rest of the output.
+            assert started.wait(10)
+            out_file.write(b'c\n')
+            return True
+
+        return fn
+
+    output = diffoscope.diff.diff(feeder(b'a\n'), feeder(b'b\n'))
+    assert output == '@@ -1,2 +1,2 @@\n-a\n+b\n c\n'
+
+
+@skip_unless_tools_exist('diff')
+@pytest.mark.parametrize(
+    'a,b',
+    [
+        ('a\nb\nc\n', 'a\nc\nd\n'),
+        ('a', 'b'),
+        ('a\nb', 'a\nb\n'),
+        ('', 'a\n' * 30),
+        (''.join('%d\n' % x for x in range(40)), 'x\n' * 3 + '2\n' * 40),
+        ('\n'.join('%d' % (x % 7) for x in range(100)), 'a\n1\n2\nb\n'),
+    ],
+)
+def test_internal_diff_engine_matches_gnu(monkeypatch, a, b):
+    monkeypatch.setattr(Config(), 'max_diff_block_lines_saved', 10)
+    monkeypatch.setattr(Config(), 'diff_engine', 'gnu')
+    expected = Difference.from_text(a, b, 'a', 'b').unified_diff
+
+    monkeypatch.setattr(Config(), 'diff_engine', 'internal')
+    monkeypatch.setattr(
+        'diffoscope.diff.run_diff', lambda *args: pytest.fail("diff was run")
+    )
+    assert Difference.from_text(a, b, 'a', 'b').unified_diff == expected
+
+
+def test_internal_diff_engine_falls_back_to_gnu(monkeypatch):
+    calls = []
+
+    def run_diff(*args):
+        calls.append(args)
+        return original(*args)
+
+    original = diffoscope.diff.run_diff
+    monkeypatch.setattr('diffoscope.diff.run_diff', run_diff)
+    monkeypatch.setattr('diffoscope.diff.INTERNAL_DIFF_MAX_LINES', 10)
+
+    difference = Difference.from_text('a\n' * 4, 'b\n' * 4, 'a', 'b')
+    assert difference.unified_diff.count('+b\n') == 4
+    assert not calls
+
+    difference = Difference.from_text('a\n' * 8, 'b\n' * 8, 'a', 'b')
+    assert difference.unified_diff.count('+b\n') == 8
+    assert len(calls) == 1
+
+
+@skip_unless_tools_exist('diff')
+def test_diff_no_temporary_directories(monkeypatch):
+    monkeypatch.setattr(Config(), 'diff_engine', 'gnu')
+    Difference.from_text('a', 'b', 'a', 'b')
+    num_dirs = len(tempfiles._DIRS)
+
+    for x in range(20):
+        difference = Difference.from_text(
+            'a\n%d\n' % x, 'b\n%d\n' % x, 'a', 'b'
+        )
+        assert difference.unified_diff == '@@ -1,2 +1,2 @@\n-a\n+b\n %d\n' % x
+
+    # No temporary directories or FIFOs should be created per diff.
+    assert len(tempfiles._DIRS) == num_dirs
+
+
+@pytest.mark.slow
+@skip_unless_tools_exist('diff')
+def test_diff_throughput(monkeypatch, record_property):
+    monkeypatch.setattr(Config(), 'diff_engine', 'gnu')
+    content = ''.join('line %d\n' % x for x in range(100))
+    n = 200
+
+    start = time.monotonic()
+    for x in range(n):
+        difference = Difference.from_text(
+            content + 'a%d\n' % x, content + 'b%d\n' % x, 'a', 'b'
+        )
+        assert difference is not None
+    rate = n / (time.monotonic() - start)
+
+    # Reported rather than asserted; timings vary too much between hosts.
+    record_property('diffs_per_second', rate)
+    logger.info("diff(1) throughput: %.1f diffs/s", rate)
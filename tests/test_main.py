@@ -23,6 +23,11 @@ import signal
 import tempfile
 
 from diffoscope.main import main
+from diffoscope.config import Config
+from diffoscope.comparators.utils import command
+from diffoscope.comparators.utils.container import Container
+
+from .utils.tools import skip_unless_tools_exist
 
 TEST_TAR1_PATH = os.path.join(os.path.dirname(__file__), 'data/test1.tar')
 TEST_TAR2_PATH = os.path.join(os.path.dirname(__file__), 'data/test2.tar')
@@ -173,3 +178,88 @@ def test_non_unicode_filename(capsys, tmpdir):
 
     assert ret == 0
     assert out == err == ''
+
+
+def test_jobs(capsys):
+    _, expected, _ = run(capsys, *TEST_TARS)
+    ret, out, err = run(capsys, '--jobs', '4', *TEST_TARS)
+
+    assert ret == 1
+    assert err == ''
+    assert out == expected
+
+
+def test_against(capsys, tmpdir, monkeypatch):
+    _, expected, _ = run(capsys, *TEST_TARS)
+
+    calls = []
+    original = Container._get_adjusted_members_sizes
+
+    def _get_adjusted_members_sizes(self):
+        calls.append(self.source.name)
+        return original(self)
+
+    monkeypatch.setattr(
+        Container, '_get_adjusted_members_sizes', _get_adjusted_members_sizes
+    )
+
+    report = str(tmpdir.join('report.txt'))
+    ret, out, err = run(
+        capsys,
+        TEST_TAR1_PATH,
+        TEST_TAR2_PATH,
+        TEST_TAR1_PATH,
+        '--against',
+        TEST_TAR2_PATH,
+        '--text',
+        report,
+    )
+
+    assert ret == 1
+    assert err == ''
+    assert out.splitlines() == [
+        "2 of 3 paths differ from {}".format(TEST_TAR1_PATH),
+        "  1. {}: differs".format(TEST_TAR2_PATH),
+        "  2. {}: identical".format(TEST_TAR1_PATH),
+        "  3. {}: differs".format(TEST_TAR2_PATH),
+    ]
+    for x in (1, 3):
+        with open(str(tmpdir.join('report.{}.txt'.format(x)))) as f:
+            assert f.read() == expected
+    assert not tmpdir.join('report.2.txt').exists()
+
+    # The members of the reference are only listed once.
+    assert calls.count(TEST_TAR1_PATH) == 1
+
+
+@skip_unless_tools_exist('zipinfo')
+def test_against_reuses_command_output(capsys, tmpdir, monkeypatch):
+    hits = []
+    original = command.load_command
+
+    def load_command(key, path):
+        result = original(key, path)
+        hits.append(path)
+        return result
+
+    monkeypatch.setattr(command, 'load_command', load_command)
+
+    zip1, zip2 = (
+        os.path.join(os.path.dirname(__file__), 'data', x)
+        for x in ('test1.zip', 'test2.zip')
+    )
+    ret, _, _ = run(
+        capsys,
+        zip1,
+        '--against',
+        zip2,
+        '--against',
+        zip2,
+        '--text',
+        str(tmpdir.join('report.txt')),
+    )
+
+    assert ret == 1
+    assert hits and set(hits) == {zip1}
+    # Without --cache-dir, nothing is cached on disk.
+    assert Config().cache_dir is None
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+import time
+import socket
+import signal
+import pytest
+import multiprocessing
+
+from diffoscope.main import main
+from diffoscope.presenters.json import JSON_FORMAT_MAGIC
+
+TEST_TAR1_PATH = os.path.join(os.path.dirname(__file__), 'data/test1.tar')
+TEST_TAR2_PATH = os.path.join(os.path.dirname(__file__), 'data/test2.tar')
+
+
+@pytest.fixture
+def server(tmpdir):
+    path = str(tmpdir.join('diffoscope.sock'))
+    process = multiprocessing.get_context('fork').Process(
+        target=main, args=(['--serve', path, '--jobs', '2'],)
+    )
+    process.start()
+
+    for _ in range(300):
+        if os.path.exists(path):
+            break
+        time.sleep(0.1)
+
+    yield path
+
+    os.kill(process.pid, signal.SIGTERM)
+    process.join()
+
+
+def submit(path, *jobs):
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        with sock.makefile('rwb') as f:
+            for x in jobs:
+                f.write(json.dumps(x).encode('utf-8') + b'\n')
+            f.flush()
+            sock.shutdown(socket.SHUT_WR)
+            results = [json.loads(x.decode('utf-8')) for x in f]
+
+    return {x['id']: x for x in results}
+
+
+def test_serve(server, tmpdir):
+    results = submit(
+        server,
+        {'id': 1, 'path1': TEST_TAR1_PATH, 'path2': TEST_TAR2_PATH},
+        {'id': 2, 'path1': TEST_TAR1_PATH, 'path2': TEST_TAR1_PATH},
+        {
+            'id': 3,
+            'path1': TEST_TAR1_PATH,
+            'path2': TEST_TAR2_PATH,
+            'options': ['--exclude', '*'],
+        },
+        {'id': 4, 'path1': TEST_TAR1_PATH, 'options': 'invalid'},
+    )
+
+    assert results[1]['status'] == 1, results[1]
+    diff = results[1]['diff']
+    assert diff[JSON_FORMAT_MAGIC] == 1
+    assert diff['source1'] == TEST_TAR1_PATH
+    assert diff['details']
+
+    assert results[2] == {'id': 2, 'status': 0, 'diff': None}
+    assert results[3] == {'id': 3, 'status': 0, 'diff': None}
+    assert results[4]['status'] == 2
+    assert 'error' in results[4]
+
+    # Each job is independent of the options of the previous ones.
+    results = submit(
+        server, {'id': 5, 'path1': TEST_TAR1_PATH, 'path2': TEST_TAR2_PATH}
+    )
+    assert results[5]['status'] == 1
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import errno
+import pytest
+
+from diffoscope import tempfiles
+from diffoscope.config import Config
+from diffoscope.profiling import ProfileManager
+from diffoscope.comparators.binary import FilesystemFile
+from diffoscope.comparators.utils.specialize import specialize
+from diffoscope.tempfiles import (
+    TMPFS_MAX_FILE_SIZE,
+    clean_all_temp_files,
+    get_named_temporary_file,
+    get_temporary_directory,
+    get_temporary_file_path,
+    release_temporary_directory,
+    release_temporary_file,
+    track_temporary_file,
+)
+
+from .utils.data import data
+
+
+@pytest.fixture
+def storage(tmpdir, monkeypatch):
+    clean_all_temp_files()
+    # Any directory will do; it need not actually be a tmpfs.
+    monkeypatch.setattr(Config(), 'tmpfs_dir', str(tmpdir))
+    yield str(tmpdir)
+    clean_all_temp_files()
+
+
+def test_tiers(storage):
+    small = get_temporary_file_path(10, suffix='.txt')
+    large = get_temporary_file_path(TMPFS_MAX_FILE_SIZE + 1)
+
+    assert small.startswith(storage)
+    assert small.endswith('.txt')
+    assert not large.startswith(storage)
+
+    for x in (small, large):
+        assert os.path.exists(x)
+        release_temporary_file(x)
+        assert not os.path.exists(x)
+
+
+def test_max_temp_size(storage, monkeypatch):
+    monkeypatch.setattr(Config(), 'max_temp_size', 100)
+
+    first = get_temporary_file_path(60)
+    get_temporary_file_path(30)
+
+    with pytest.raises(OSError) as exc:
+        get_temporary_file_path(20)
+    assert exc.value.errno == errno.ENOSPC
+
+    # Releasing a file makes room for others.
+    release_temporary_file(first)
+    get_temporary_file_path(70)
+
+
+@pytest.mark.parametrize(
+    'filename,member_name', [('test1.zip', 'dir/text'), ('test1.gz', 'test1')]
+)
+def test_max_temp_size_when_extracting(
+    storage, monkeypatch, filename, member_name
+):
+    monkeypatch.setattr(Config(), 'max_temp_size', 100)
+
+    container = specialize(FilesystemFile(data(filename))).as_container
+    member = container.get_member(member_name)
+
+    with pytest.raises(OSError) as exc:
+        member.path
+    assert exc.value.errno == errno.ENOSPC
+    assert not tempfiles._SIZES
+    assert member._temp_dir is None
+
+
+def test_registries_shrink(storage, monkeypatch):
+    monkeypatch.setattr('diffoscope.profiling._ENABLED', True)
+
+    d = get_temporary_directory()
+    path = os.path.join(d.name, 'member')
+    with open(path, 'wb') as f:
+        f.write(b'x' * 1000)
+    track_temporary_file(path)
+
+    placeholder = get_named_temporary_file(delete=False).name
+    num_dirs, num_files = len(tempfiles._DIRS), len(tempfiles._FILES)
+
+    release_temporary_file(path)
+    release_temporary_directory(d)
+    release_temporary_file(placeholder)
+
+    assert not os.path.exists(d.name)
+    assert not os.path.exists(placeholder)
+    assert len(tempfiles._DIRS) == num_dirs - 1
+    assert len(tempfiles._FILES) == num_files - 1
+
+    maxima = ProfileManager().maxima['temporary files']
+    assert maxima['peak usage (bytes)'] >= 1000
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+
+def decompress(fixture):
+    container = fixture.as_container
+    member = container.get_member(next(iter(container.get_member_names())))
+
+    with open(member.path, 'rb') as f:
+        return f.read()
+
+
+def assert_decompressed_in_process(monkeypatch, fixture, expected):
+    def decompress_cmdline(self):
+        raise AssertionError("{} was run".format(self.__class__.__name__))
+
+    monkeypatch.setattr(
+        type(fixture.as_container), 'decompress_cmdline', decompress_cmdline
+    )
+
+    assert decompress(fixture) == expected
+
+
+def assert_decompress_fallback(monkeypatch, fixture, expected, offset=4):
+    """
+    Check that we switch to the external tool, skipping over what we have
+    already read, should decompressing in-process fail after `offset` bytes.
+    """
+
+    class Reader(object):
+        def __init__(self, f):
+            self.f = f
+            self.offset = 0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self.f.close()
+
+        def read(self, size=-1):
+            if self.offset >= offset:
+                raise EOFError("Compressed file ended before the end")
+            buf = self.f.read(offset - self.offset)
+            self.offset += len(buf)
+            return buf
+
+    calls = []
+    klass = type(fixture.as_container)
+    open_decompressed = klass.open_decompressed
+    decompress_cmdline = klass.decompress_cmdline
+    monkeypatch.setattr(
+        klass,
+        'open_decompressed',
+        lambda self: Reader(open_decompressed(self)),
+    )
+    monkeypatch.setattr(
+        klass,
+        'decompress_cmdline',
+        lambda self: calls.append(self) or decompress_cmdline(self),
+    )
+
+    assert decompress(fixture) == expected
+    assert len(calls) == 1